@@ -0,0 +1,123 @@
+"""
+Segment analytics for the dashboard, computed once per dataset generation.
+
+A generation is the dataset file's identity (inode, size, mtime) plus the
+tombstone journal's: every append, delete, undo or compaction starts a new
+one. For a generation the score histogram, the risk-band distribution and
+per-segment statistics (users, mean score, band shares and mean features for
+each employment_type, income_range and city_tier) are computed in a few
+vectorized passes (factorize + bincount, no groupby-apply), then shared by
+every dashboard session until the data changes.
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from data_store import DATA_FILE, _file_key, load_tombstones
+from onnx_utils import INT_FEATURES, FLOAT_FEATURES
+from risk_bands import SHORT_BANDS, UNKNOWN_BAND, band_index, score_array
+from metrics import timed, inc
+
+SEGMENT_COLUMNS = ["employment_type", "income_range", "city_tier"]
+# Mean of every numeric model feature except the tier, which is itself a segment
+MEAN_FEATURES = [c for c in INT_FEATURES + FLOAT_FEATURES if c != "city_tier"]
+HISTOGRAM_BIN_WIDTH = 5
+SCORE_MAX = 100
+
+_BAND_COLUMNS = SHORT_BANDS + [UNKNOWN_BAND]
+
+
+class DatasetAnalytics:
+    """
+    Read-only aggregates of one dataset generation:
+    - bands:     users per band (Low / Medium / High / Unknown)
+    - histogram: users per HISTOGRAM_BIN_WIDTH-point score bin, one column per band
+    - segments:  {segment column: frame indexed by segment value}
+    """
+
+    def __init__(self, generation, total: int, bands: dict, histogram: pd.DataFrame, segments: dict):
+        self.generation = generation
+        self.total = total
+        self.bands = bands
+        self.histogram = histogram
+        self.segments = segments
+
+
+def _score_histogram(scores: np.ndarray, bands: np.ndarray) -> pd.DataFrame:
+    n_bins = SCORE_MAX // HISTOGRAM_BIN_WIDTH
+    known = ~np.isnan(scores)
+    bins = np.clip((scores[known] // HISTOGRAM_BIN_WIDTH).astype(np.int64), 0, n_bins - 1)
+    n_bands = len(SHORT_BANDS)
+    counts = np.bincount(bins * n_bands + bands[known], minlength=n_bins * n_bands).reshape(n_bins, n_bands)
+    index = pd.Index(np.arange(n_bins) * HISTOGRAM_BIN_WIDTH, name="score_bin")
+    # Low first so the stacked chart reads top-down like the header metrics
+    return pd.DataFrame(counts, index=index, columns=SHORT_BANDS)[SHORT_BANDS[::-1]]
+
+def _grouped_mean(codes: np.ndarray, k: int, values: np.ndarray) -> np.ndarray:
+    known = ~np.isnan(values)
+    sums = np.bincount(codes[known], weights=values[known], minlength=k)
+    counts = np.bincount(codes[known], minlength=k)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+def _segment_stats(df: pd.DataFrame, col: str, scores: np.ndarray, bands: np.ndarray) -> pd.DataFrame:
+    codes, uniques = pd.factorize(df[col], sort=True, use_na_sentinel=False)
+    k = len(uniques)
+    users = np.bincount(codes, minlength=k)
+    per_band = np.bincount(codes * len(_BAND_COLUMNS) + bands, minlength=k * len(_BAND_COLUMNS))
+    per_band = per_band.reshape(k, len(_BAND_COLUMNS))
+
+    stats = {
+        "users": users,
+        "share_pct": 100.0 * users / max(len(df), 1),
+        "mean_score": _grouped_mean(codes, k, scores),
+    }
+    for j, band in enumerate(SHORT_BANDS):
+        stats[f"{band.lower()}_pct"] = 100.0 * per_band[:, j] / np.maximum(users, 1)
+    for feature in MEAN_FEATURES:
+        if feature in df.columns:
+            stats[f"mean_{feature}"] = _grouped_mean(codes, k, score_array(df[feature].to_numpy()))
+    index = pd.Index(["(missing)" if pd.isna(u) else u for u in uniques], name=col)
+    return pd.DataFrame(stats, index=index)
+
+def compute_analytics(df: pd.DataFrame, score_col: str = "alt_credit_score", generation=None) -> DatasetAnalytics:
+    scores = score_array(df[score_col].to_numpy()) if score_col in df.columns else np.full(len(df), np.nan)
+    bands = band_index(scores)
+    counts = np.bincount(bands, minlength=len(_BAND_COLUMNS))
+    return DatasetAnalytics(
+        generation=generation,
+        total=len(df),
+        bands={band: int(c) for band, c in zip(_BAND_COLUMNS, counts)},
+        histogram=_score_histogram(scores, bands),
+        segments={col: _segment_stats(df, col, scores, bands) for col in SEGMENT_COLUMNS if col in df.columns},
+    )
+
+
+def dataset_generation(data_path: str = DATA_FILE):
+    """Identity of the dataset's current contents; take it before loading the frame."""
+    if not os.path.exists(data_path):
+        return None
+    return (_file_key(data_path), load_tombstones(data_path).key)
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+def get_analytics(df: pd.DataFrame, generation, score_col: str = "alt_credit_score") -> DatasetAnalytics:
+    """
+    Aggregates of df, reused while the dataset stays at `generation`.
+    Pass the generation read before df was loaded: if a write lands in
+    between, the next call simply recomputes.
+    """
+    key = (score_col, generation)
+    with _cache_lock:
+        cached = _cache.get(score_col)
+        if cached is not None and generation is not None and cached[0] == key:
+            inc("analytics.cache_hits")
+            return cached[1]
+    with timed("analytics.compute"):
+        result = compute_analytics(df, score_col, generation)
+    with _cache_lock:
+        _cache[score_col] = (key, result)
+    return result
@@ -0,0 +1,372 @@
+"""
+Benchmark suite for the scoring and persistence hot paths.
+
+Generates synthetic applicants shaped like data/dataset.csv (fixed seed, so
+runs are reproducible) and times:
+
+- input building:  build_onnx_inputs (single row) and build_onnx_inputs_batch
+- model calls:     each onnx_predict_* function, predict_all end to end,
+                   the pandas-free predict_features path and a what-if sweep
+- scoring mode:    single-row predict_all loop vs score_batch / fused ensemble
+- registration:    allocate_user_id + append_record, and the group-commit writer
+- dashboard prep:  snapshot load, summary rebuild, risk banding, score index
+                   build and a score-sorted page via query_users
+- report lookup:   user_id index rebuild and a single find_user
+
+Results are written as JSON. With --baseline the run is compared against a
+stored result file and any timing that got slower by more than --threshold
+percent is reported as a regression.
+
+Usage:
+    python bench.py --sizes 1k,100k --out bench_results.json
+    python bench.py --baseline bench_baseline.json --fail-on-regression
+    python bench.py --save-baseline bench_baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import onnxruntime as ort
+import pandas as pd
+
+from onnx_utils import (
+    MODELS_ONNX_DIR, build_onnx_inputs, build_onnx_inputs_batch, onnx_predict_regressor,
+    onnx_predict_classifier_label_and_proba, onnx_predict_ensemble, score_batch,
+    apply_ensemble_rule, predict_all, FeatureVector, predict_features,
+)
+from model_registry import ModelRegistry
+from preprocess import clean_features
+from analytics import compute_analytics
+from whatif import DEFAULT_POINTS, sweep_grid, sweep_feature
+from risk_bands import risk_styles
+from data_store import (
+    DATASET_COLUMNS, RegistrationWriter, allocate_user_id, append_record, rebuild_summary,
+    risk_level_labels, query_users, format_user_id, _full_snapshot, _file_key,
+    rebuild_user_index, find_user,
+)
+from score_index import _build as build_score_index
+
+SIZE_ALIASES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+DEFAULT_SIZES = "1k,100k,1m"
+SEED = 20240101
+
+# Category mix and numeric ranges of data/dataset.csv
+EMPLOYMENT_MIX = {
+    "salaried": 0.30, "self_employed": 0.28, "gig": 0.12,
+    "contract": 0.10, "unemployed": 0.10, "student": 0.10,
+}
+INCOME_MIX = {
+    "15000-30000": 0.26, "25000-80000": 0.20, "0-15000": 0.20,
+    "30000-50000": 0.14, "10000-30000": 0.12, "20000-100000": 0.08,
+}
+CITY_TIER_MIX = {1: 0.27, 2: 0.37, 3: 0.36}
+
+
+# -----------------------------
+# Synthetic data
+# -----------------------------
+def parse_sizes(text: str) -> list:
+    sizes = []
+    for token in text.split(","):
+        token = token.strip().lower()
+        if token:
+            sizes.append(SIZE_ALIASES.get(token) or int(token))
+    return sizes
+
+def _choice(rng, mix: dict, n: int) -> np.ndarray:
+    values = list(mix)
+    p = np.array(list(mix.values()), dtype=float)
+    return rng.choice(np.array(values, dtype=object), size=n, p=p / p.sum())
+
+def synthetic_applicants(n: int, seed: int = SEED) -> pd.DataFrame:
+    """n scored rows with the dataset's columns, identical for the same (n, seed)."""
+    rng = np.random.default_rng(seed)
+    xgb = rng.uniform(5, 95, n).round(2)
+    rf = np.clip(xgb + rng.normal(0, 8, n), 0, 100).round(2)
+    probs = rng.dirichlet([1.0, 1.0, 1.0], n).astype(np.float32)
+    lr_risk = np.array(["High Risk", "Low Risk", "Medium Risk"], dtype=object)[probs.argmax(axis=1)]
+    return pd.DataFrame({
+        "user_id": [format_user_id(i) for i in range(1, n + 1)],
+        "employment_type": _choice(rng, EMPLOYMENT_MIX, n),
+        "income_range": _choice(rng, INCOME_MIX, n),
+        "city_tier": _choice(rng, CITY_TIER_MIX, n).astype(np.int64),
+        "bank_account_age_months": rng.integers(1, 120, n),
+        "num_bank_accounts": rng.integers(1, 4, n),
+        "monthly_income": rng.lognormal(10.1, 0.5, n).round(2),
+        "rent_paid_on_time": rng.uniform(0, 1, n).round(4),
+        "utility_delay_days": rng.uniform(0, 30, n).round(2),
+        "upi_txn_count": rng.uniform(0, 120, n).round(2),
+        "avg_month_end_balance": rng.uniform(0, 22000, n).round(2),
+        "overdraft_event": rng.poisson(0.4, n),
+        "alt_credit_score": np.round((xgb + rf) / 2, 2),
+        "lr_risk": lr_risk,
+        "lr_score": pd.Series(lr_risk).map({"Low Risk": 85, "Medium Risk": 55, "High Risk": 25}).to_numpy(),
+        "lr_prob_high": probs[:, 0],
+        "lr_prob_low": probs[:, 1],
+        "lr_prob_medium": probs[:, 2],
+        "xgb_score": xgb,
+        "rf_score": rf,
+        "model_version": "bench",
+        "scored_at": "2024-01-01T00:00:00+00:00",
+    }, columns=DATASET_COLUMNS)
+
+
+# -----------------------------
+# Timing
+# -----------------------------
+def _measure(fn, repeat: int, setup=None) -> list:
+    if setup:
+        setup()
+    fn()  # warm-up, not recorded
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return times
+
+class Suite:
+    def __init__(self, repeat: int, only=None):
+        self.repeat = repeat
+        self.only = only
+        self.results = []
+
+    def run(self, name: str, size: int, fn, rows: int, repeat: int = None, setup=None) -> None:
+        """
+        Times fn (which processes `rows` rows per call) and records the result.
+        setup, if given, runs untimed before every call.
+        """
+        if self.only and not any(token in name for token in self.only):
+            return
+        times = _measure(fn, repeat or self.repeat, setup)
+        median = statistics.median(times)
+        result = {
+            "name": name,
+            "size": size,
+            "rows": rows,
+            "repeat": len(times),
+            "median_s": median,
+            "min_s": min(times),
+            "max_s": max(times),
+            "rows_per_s": rows / median if median > 0 else None,
+        }
+        self.results.append(result)
+        print(f"  {name:<34}{size:>10,}  median {median * 1000:10.3f} ms  "
+              f"({result['rows_per_s'] or 0:,.0f} rows/s)", file=sys.stderr)
+
+
+# -----------------------------
+# Benchmarks
+# -----------------------------
+def bench_scoring(suite: Suite, size: int, df: pd.DataFrame, models, single_rows: int) -> None:
+    lr, xgb, rf = models.sessions()
+    row = df.iloc[[0]]
+    sample = df.iloc[:min(single_rows, size)]
+    k = len(sample)
+
+    def per_row(fn):
+        return lambda: [fn(sample.iloc[[i]]) for i in range(k)]
+
+    # Single-row paths, looped over `k` rows
+    suite.run("build_onnx_inputs", size, per_row(build_onnx_inputs), k)
+    suite.run("onnx_predict_classifier", size, per_row(lambda r: onnx_predict_classifier_label_and_proba(lr, r)), k)
+    suite.run("onnx_predict_regressor.xgb", size, per_row(lambda r: onnx_predict_regressor(xgb, r)), k)
+    suite.run("onnx_predict_regressor.rf", size, per_row(lambda r: onnx_predict_regressor(rf, r)), k)
+    suite.run("predict_all.single_row", size, lambda: predict_all(row, lr, xgb, rf), 1, repeat=suite.repeat * 20)
+    suite.run("predict_all.loop", size, per_row(lambda r: predict_all(r, lr, xgb, rf)), k)
+    if models.ensemble is not None:
+        suite.run("predict_all.ensemble.loop", size,
+                  per_row(lambda r: predict_all(r, lr, xgb, rf, models.ensemble)), k)
+    vectors = [FeatureVector.from_mapping(r) for r in sample.to_dict("records")]
+    suite.run("predict_features.loop", size,
+              lambda: [predict_features(fv, lr, xgb, rf, models.ensemble) for fv in vectors], k)
+    # What-if panel: one applicant swept over a grid, scored as one batch
+    grid = sweep_grid(vectors[0], "utility_delay_days", 0.0, 30.0, DEFAULT_POINTS)
+    suite.run("whatif.sweep", size,
+              lambda: sweep_feature(vectors[0], "utility_delay_days", grid, lr, xgb, rf, models.ensemble), len(grid))
+
+    # Batched paths over the whole dataset
+    suite.run("clean_features", size, lambda: clean_features(df), size)
+    suite.run("build_onnx_inputs_batch", size, lambda: build_onnx_inputs_batch(df), size)
+    suite.run("score_batch+ensemble_rule", size, lambda: apply_ensemble_rule(score_batch(df, lr, xgb, rf)), size)
+    if models.ensemble is not None:
+        suite.run("onnx_predict_ensemble.batch", size, lambda: onnx_predict_ensemble(models.ensemble, df), size)
+
+def bench_registration(suite: Suite, size: int, csv_path: str, work_dir: str, appends: int) -> None:
+    data_path = os.path.join(work_dir, "dataset.csv")
+    counter_path = os.path.join(work_dir, "user_id_counter.txt")
+    record = synthetic_applicants(1, seed=SEED + 1).iloc[0].to_dict()
+
+    def reset():
+        # Fresh copy with an in-sync summary, as on a running deployment
+        shutil.copyfile(csv_path, data_path)
+        if os.path.exists(counter_path):
+            os.remove(counter_path)
+        rebuild_summary(data_path)
+
+    def append_loop():
+        for _ in range(appends):
+            append_record(dict(record, user_id=allocate_user_id(data_path, counter_path)), data_path)
+
+    writers = []
+
+    def writer_setup():
+        # Thread start and shutdown stay outside the timed call
+        reset()
+        if writers:
+            writers.pop().close()
+        writers.append(RegistrationWriter(data_path, counter_path))
+
+    def writer_batch():
+        futures = [writers[-1].submit(record) for _ in range(appends)]
+        for f in futures:
+            f.result()
+
+    suite.run("register.allocate+append", size, append_loop, appends, setup=reset)
+    suite.run("register.writer_group_commit", size, writer_batch, appends, setup=writer_setup)
+    if writers:
+        writers.pop().close()
+
+def bench_dashboard(suite: Suite, size: int, csv_path: str, page_size: int) -> None:
+    key = _file_key(csv_path)
+    frame = _full_snapshot(csv_path, key).frame
+    index = build_score_index(frame)
+    scores = frame["alt_credit_score"].to_numpy()
+
+    suite.run("dashboard.load_snapshot", size, lambda: _full_snapshot(csv_path, key), size)
+    suite.run("dashboard.rebuild_summary", size, lambda: rebuild_summary(csv_path), size)
+    suite.run("dashboard.risk_banding", size, lambda: risk_level_labels(scores), size)
+    suite.run("dashboard.segment_analytics", size, lambda: compute_analytics(frame), size)
+    suite.run("dashboard.score_index_build", size, lambda: build_score_index(frame), size)
+    suite.run("dashboard.sort_page", size,
+              lambda: query_users(frame, sort="score_desc", page_size=page_size), size)
+    suite.run("dashboard.sort_page.indexed", size,
+              lambda: query_users(frame, sort="score_desc", page_size=page_size, score_index=index), size)
+    suite.run("dashboard.filter_page", size,
+              lambda: query_users(frame, bands=["Low"], employment_types=["salaried"], page_size=page_size), size)
+    suite.run("dashboard.style_page", size,
+              lambda: _style_page(query_users(frame, page_size=page_size)[0]), page_size)
+
+    user_id = str(frame["user_id"].iloc[len(frame) // 2])
+    suite.run("report.user_index_rebuild", size, lambda: rebuild_user_index(csv_path), size)
+    suite.run("report.find_user", size, lambda: find_user(user_id, csv_path), 1)
+
+def _style_page(page: pd.DataFrame) -> str:
+    # The dashboard table's own styling, then render
+    return page.style.apply(risk_styles, subset=["risk_level"]).to_html()
+
+
+# -----------------------------
+# Baseline comparison
+# -----------------------------
+def _environment(models) -> dict:
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "onnxruntime": ort.__version__,
+        "model_version": models.version,
+    }
+
+def compare(results: list, baseline: list, threshold: float) -> list:
+    """
+    Matches results to the baseline by (name, size). Returns rows with the
+    relative change of the median; positive change_pct means slower.
+    """
+    base = {(r["name"], r["size"]): r for r in baseline}
+    rows = []
+    for r in results:
+        b = base.get((r["name"], r["size"]))
+        if b is None or not b["median_s"]:
+            continue
+        change = 100.0 * (r["median_s"] - b["median_s"]) / b["median_s"]
+        rows.append({
+            "name": r["name"],
+            "size": r["size"],
+            "baseline_s": b["median_s"],
+            "current_s": r["median_s"],
+            "change_pct": change,
+            "regression": change > threshold,
+        })
+    return rows
+
+def print_comparison(rows: list, threshold: float) -> None:
+    print(f"\nAgainst baseline (regression threshold {threshold:.0f}%):", file=sys.stderr)
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"  {row['name']:<34}{row['size']:>10,}  {row['baseline_s'] * 1000:10.3f} -> "
+              f"{row['current_s'] * 1000:10.3f} ms  {row['change_pct']:+7.1f}%{flag}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the AltScore scoring and persistence hot paths")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated row counts (1k, 100k, 1m or integers)")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per benchmark (after one warm-up)")
+    parser.add_argument("--single-rows", type=int, default=200, help="rows scored one at a time in the per-row loops")
+    parser.add_argument("--appends", type=int, default=100, help="registrations per registration benchmark")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--only", help="comma-separated substrings; run only matching benchmarks")
+    parser.add_argument("--models-dir", default=MODELS_ONNX_DIR)
+    parser.add_argument("--out", default="-", help="JSON results file, or - for stdout")
+    parser.add_argument("--baseline", help="JSON results file to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="slowdown in percent counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 on any regression")
+    parser.add_argument("--save-baseline", help="also write this run as the new baseline file")
+    args = parser.parse_args(argv)
+
+    models = ModelRegistry(args.models_dir).current()
+    suite = Suite(args.repeat, args.only.split(",") if args.only else None)
+
+    work_dir = tempfile.mkdtemp(prefix="altscore-bench-")
+    try:
+        for size in parse_sizes(args.sizes):
+            print(f"\n{size:,} rows", file=sys.stderr)
+            df = synthetic_applicants(size)
+            csv_path = os.path.join(work_dir, f"synthetic_{size}.csv")
+            df.to_csv(csv_path, index=False)
+
+            bench_scoring(suite, size, df, models, args.single_rows)
+            bench_registration(suite, size, csv_path, work_dir, args.appends)
+            bench_dashboard(suite, size, csv_path, args.page_size)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {"environment": _environment(models), "results": suite.results}
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        report["baseline"] = {"file": args.baseline, "environment": baseline.get("environment")}
+        report["comparison"] = compare(suite.results, baseline["results"], args.threshold)
+        print_comparison(report["comparison"], args.threshold)
+        regressions = [row for row in report["comparison"] if row["regression"]]
+
+    text = json.dumps(report, indent=2)
+    if args.out in (None, "-"):
+        print(text)
+    else:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
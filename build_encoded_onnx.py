@@ -0,0 +1,239 @@
+"""
+Build step: export the integer-encoded model variant (models_onnx/encoded/).
+
+The categorical inputs (employment_type, income_range) become int64 IDs into
+a fixed vocabulary taken from the models' own one-hot encoders and written to
+vocab.json. The LR label becomes the class index and its ZipMap is dropped,
+so every input and output is a numeric tensor (IO-bindable, no string
+tensors at all). The math is unchanged.
+
+With --quantize, an int8 dynamic-quantized copy is also attempted
+(models_onnx/quantized/). It is only written when ONNX Runtime actually finds
+operators to quantize.
+
+Each exported set is compared against the current models and parity.json
+records the result. The registry only loads a variant whose parity check
+passed against the exact model files it was built from.
+
+Usage:
+    python build_encoded_onnx.py [--models-dir models_onnx] [--quantize]
+"""
+import argparse
+import copy
+import json
+import os
+import shutil
+
+import numpy as np
+import onnx
+import onnxruntime as ort
+import pandas as pd
+from onnx import TensorProto, helper
+
+from onnx_utils import (
+    MODELS_ONNX_DIR, LR_CLASSES, CATEGORICAL_FEATURES, ENCODED_VOCAB_FILE, PARITY_FILE,
+    CategoricalEncoder, EncodedSession, score_batch, apply_ensemble_rule,
+)
+from model_registry import (
+    MODEL_NAMES, GOLDEN_ROWS, GOLDEN_TOLERANCE, ENCODED_DIR_NAME, QUANTIZED_DIR_NAME, file_digest,
+)
+from data_store import DATA_FILE
+
+# Encoding is exact: outputs may differ only by float noise
+ENCODED_TOLERANCE = {"score": 1e-4, "prob": 1e-5, "max_label_mismatch_rate": 0.0}
+# Quantization is lossy: same bound the registry applies to golden rows
+QUANTIZED_TOLERANCE = {"score": GOLDEN_TOLERANCE, "prob": 0.02, "max_label_mismatch_rate": 0.005}
+
+QUANTIZED_OP_TYPES = {"DynamicQuantizeLinear", "MatMulInteger", "ConvInteger", "QLinearMatMul", "QLinearConv"}
+
+
+def _attr(node: onnx.NodeProto, name: str):
+    for a in node.attribute:
+        if a.name == name:
+            return helper.get_attribute_value(a)
+    return None
+
+def _set_attr(node: onnx.NodeProto, name: str, value) -> None:
+    for a in list(node.attribute):
+        if a.name == name:
+            node.attribute.remove(a)
+    node.attribute.append(helper.make_attribute(name, value))
+
+def _drop_attr(node: onnx.NodeProto, name: str) -> None:
+    for a in list(node.attribute):
+        if a.name == name:
+            node.attribute.remove(a)
+
+
+def extract_vocab(models: dict) -> dict:
+    """Category order of each categorical input's OneHotEncoder; all models must agree."""
+    vocab = {}
+    for name, model in models.items():
+        for node in model.graph.node:
+            if node.op_type == "OneHotEncoder" and node.input[0] in CATEGORICAL_FEATURES:
+                cats = [c.decode("utf-8") for c in _attr(node, "cats_strings") or []]
+                col = node.input[0]
+                if col in vocab and vocab[col] != cats:
+                    raise ValueError(f"{name}: {col} categories differ from the other models")
+                vocab[col] = cats
+    missing = set(CATEGORICAL_FEATURES) - set(vocab)
+    if missing:
+        raise ValueError(f"no one-hot encoder found for {sorted(missing)}")
+    return vocab
+
+
+def encode_model(model: onnx.ModelProto, vocab: dict) -> onnx.ModelProto:
+    model = copy.deepcopy(model)
+    graph = model.graph
+
+    for inp in graph.input:
+        if inp.name in vocab:
+            inp.type.tensor_type.elem_type = TensorProto.INT64
+
+    nodes = []
+    for node in graph.node:
+        if node.op_type == "OneHotEncoder" and node.input[0] in vocab:
+            _drop_attr(node, "cats_strings")
+            _set_attr(node, "cats_int64s", list(range(len(vocab[node.input[0]]))))
+        elif node.op_type == "LinearClassifier":
+            labels = [c.decode("utf-8") for c in _attr(node, "classlabels_strings") or []]
+            if labels != LR_CLASSES:
+                raise ValueError(f"unexpected LR class order {labels}")
+            _drop_attr(node, "classlabels_strings")
+            _set_attr(node, "classlabels_ints", list(range(len(LR_CLASSES))))
+        elif node.op_type == "ZipMap":
+            # Plain (N, 3) probability tensor instead of a sequence of maps
+            node = helper.make_node("Identity", [node.input[0]], [node.output[0]], name=node.name)
+        nodes.append(node)
+    del graph.node[:]
+    graph.node.extend(nodes)
+
+    for out in graph.output:
+        if out.type.HasField("sequence_type"):
+            out.CopyFrom(helper.make_tensor_value_info(out.name, TensorProto.FLOAT, [None, len(LR_CLASSES)]))
+        elif out.type.tensor_type.elem_type == TensorProto.STRING:
+            out.CopyFrom(helper.make_tensor_value_info(out.name, TensorProto.INT64, [None]))
+
+    onnx.checker.check_model(model)
+    return model
+
+
+def _sessions(model_dir: str, encoder: CategoricalEncoder = None) -> list:
+    sessions = []
+    for name in MODEL_NAMES.values():
+        sess = ort.InferenceSession(os.path.join(model_dir, name), providers=["CPUExecutionProvider"])
+        sessions.append(EncodedSession(sess, encoder) if encoder else sess)
+    return sessions
+
+def parity_rows(data_path: str, limit: int) -> pd.DataFrame:
+    rows = pd.DataFrame(GOLDEN_ROWS)
+    # One applicant with categories outside the vocabulary
+    unseen = dict(GOLDEN_ROWS[0], employment_type="unlisted", income_range="unlisted")
+    frames = [rows, pd.DataFrame([unseen])]
+    if data_path and os.path.exists(data_path):
+        data = pd.read_csv(data_path, usecols=lambda c: c in rows.columns, nrows=limit).dropna()
+        frames.append(data[rows.columns])
+    return pd.concat(frames, ignore_index=True)
+
+def check_parity(reference_dir: str, variant_dir: str, rows: pd.DataFrame, tolerance: dict) -> dict:
+    encoder = CategoricalEncoder(_load_json(os.path.join(variant_dir, ENCODED_VOCAB_FILE)))
+    ref = apply_ensemble_rule(score_batch(rows, *_sessions(reference_dir)))
+    new = apply_ensemble_rule(score_batch(rows, *_sessions(variant_dir, encoder)))
+
+    n = len(rows)
+    report = {
+        "rows": n,
+        "lr_label_mismatches": int((ref["lr_risk"] != new["lr_risk"]).sum()),
+        "risk_level_mismatches": int((ref["risk_level"] != new["risk_level"]).sum()),
+        "max_abs_diff": {
+            "lr_probs": float(np.nanmax(np.abs(ref["lr_probs"] - new["lr_probs"]))),
+            "xgb_score": float(np.max(np.abs(ref["xgb_score"] - new["xgb_score"]))),
+            "rf_score": float(np.max(np.abs(ref["rf_score"] - new["rf_score"]))),
+            "final_score": float(np.max(np.abs(ref["final_score"] - new["final_score"]))),
+        },
+        "tolerance": tolerance,
+    }
+    diffs = report["max_abs_diff"]
+    report["passed"] = bool(
+        report["lr_label_mismatches"] <= tolerance["max_label_mismatch_rate"] * n
+        and diffs["lr_probs"] <= tolerance["prob"]
+        and max(diffs["xgb_score"], diffs["rf_score"], diffs["final_score"]) <= tolerance["score"]
+    )
+    return report
+
+
+def _load_json(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _write_json(obj, path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(obj, f, indent=2)
+
+def _source_digests(models_dir: str) -> dict:
+    return {name: file_digest(os.path.join(models_dir, name)) for name in MODEL_NAMES.values()}
+
+def _finish(models_dir: str, out_dir: str, variant: str, rows: pd.DataFrame, tolerance: dict) -> dict:
+    report = check_parity(models_dir, out_dir, rows, tolerance)
+    report["variant"] = variant
+    report["source_digests"] = _source_digests(models_dir)
+    _write_json(report, os.path.join(out_dir, PARITY_FILE))
+    status = "PASSED" if report["passed"] else "FAILED"
+    print(f"{variant}: parity {status} on {report['rows']} rows; max diffs {report['max_abs_diff']}")
+    return report
+
+
+def build_encoded(models_dir: str, rows: pd.DataFrame) -> dict:
+    models = {name: onnx.load(os.path.join(models_dir, name)) for name in MODEL_NAMES.values()}
+    vocab = extract_vocab(models)
+
+    out_dir = os.path.join(models_dir, ENCODED_DIR_NAME)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+    for name, model in models.items():
+        onnx.save(encode_model(model, vocab), os.path.join(out_dir, name))
+    _write_json(vocab, os.path.join(out_dir, ENCODED_VOCAB_FILE))
+    return _finish(models_dir, out_dir, ENCODED_DIR_NAME, rows, ENCODED_TOLERANCE)
+
+
+def build_quantized(models_dir: str, rows: pd.DataFrame):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    src_dir = os.path.join(models_dir, ENCODED_DIR_NAME)
+    out_dir = os.path.join(models_dir, QUANTIZED_DIR_NAME)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+
+    quantized_ops = 0
+    for name in MODEL_NAMES.values():
+        out_path = os.path.join(out_dir, name)
+        quantize_dynamic(os.path.join(src_dir, name), out_path, weight_type=QuantType.QInt8)
+        quantized_ops += sum(n.op_type in QUANTIZED_OP_TYPES for n in onnx.load(out_path).graph.node)
+    if quantized_ops == 0:
+        # Tree ensembles and LinearClassifier have no int8 kernels: nothing would change
+        shutil.rmtree(out_dir)
+        print("quantized: no quantizable operators in these models; variant not written")
+        return None
+
+    shutil.copyfile(os.path.join(src_dir, ENCODED_VOCAB_FILE), os.path.join(out_dir, ENCODED_VOCAB_FILE))
+    return _finish(models_dir, out_dir, QUANTIZED_DIR_NAME, rows, QUANTIZED_TOLERANCE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the integer-encoded (and optionally quantized) model variant")
+    parser.add_argument("--models-dir", default=MODELS_ONNX_DIR)
+    parser.add_argument("--parity-data", default=DATA_FILE, help="CSV of applicants used for the parity check")
+    parser.add_argument("--parity-rows", type=int, default=20000)
+    parser.add_argument("--quantize", action="store_true", help="also try an int8 dynamic-quantized export")
+    args = parser.parse_args()
+
+    rows = parity_rows(args.parity_data, args.parity_rows)
+    reports = [build_encoded(args.models_dir, rows)]
+    if args.quantize:
+        reports.append(build_quantized(args.models_dir, rows))
+    if not all(r["passed"] for r in reports if r is not None):
+        raise SystemExit("parity check failed; the registry will not load the failing variant")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Build step: fuse the logistic, XGBoost and random-forest ONNX graphs plus the
+predict_all ensemble rule into a single model (models_onnx/ensemble_model.onnx).
+
+One sess.run on the fused model returns the final score, the risk band and
+every per-model output, so all pages share the exact same decision logic.
+
+Usage:
+    python build_ensemble_onnx.py [--models-dir models_onnx] [--out ensemble_model.onnx]
+"""
+import argparse
+import os
+
+import numpy as np
+import onnx
+from onnx import TensorProto, helper, numpy_helper
+
+from onnx_utils import MODELS_ONNX_DIR, ENSEMBLE_MODEL_FILE, LR_CLASSES, LR_RISK_TO_SCORE
+from risk_bands import LOW_RISK_MIN_SCORE, MEDIUM_RISK_MIN_SCORE, RISK_BANDS
+
+# Opsets the source graphs were exported with (skl2onnx)
+ONNX_OPSET = 11
+ML_OPSET = 3
+
+
+def _prefixed(graph: onnx.GraphProto, prefix: str, keep: set) -> list:
+    """
+    Renames every node, intermediate edge and initializer of graph with prefix.
+    Names in keep (the shared graph inputs) are left untouched.
+    """
+    def rename(name):
+        return name if (not name or name in keep) else prefix + name
+
+    for init in graph.initializer:
+        init.name = rename(init.name)
+    for node in graph.node:
+        node.name = rename(node.name or node.op_type)
+        node.input[:] = [rename(x) for x in node.input]
+        node.output[:] = [rename(x) for x in node.output]
+    return [prefix + o.name for o in graph.output]
+
+
+def _const(name: str, value, dtype=None) -> onnx.TensorProto:
+    return numpy_helper.from_array(np.asarray(value, dtype=dtype), name=name)
+
+
+def build_ensemble(models_dir: str) -> onnx.ModelProto:
+    lr = onnx.load(os.path.join(models_dir, "logistic_model.onnx"))
+    xgb = onnx.load(os.path.join(models_dir, "xgb_model.onnx"))
+    rf = onnx.load(os.path.join(models_dir, "rf_model.onnx"))
+
+    inputs = list(lr.graph.input)
+    input_names = {i.name for i in inputs}
+
+    # Drop the LR ZipMap: downstream ops need the plain (N, 3) probability tensor
+    zipmap = [n for n in lr.graph.node if n.op_type == "ZipMap"]
+    for n in zipmap:
+        lr.graph.node.remove(n)
+    classifier = next(n for n in lr.graph.node if n.op_type == "LinearClassifier")
+    labels = [
+        s.decode("utf-8")
+        for a in classifier.attribute if a.name == "classlabels_strings"
+        for s in a.strings
+    ]
+    if labels != LR_CLASSES:
+        raise ValueError(f"Unexpected LR class order {labels}, expected {LR_CLASSES}")
+    lr_prob_edge = zipmap[0].input[0] if zipmap else classifier.output[1]
+    lr_label_edge = next(o.name for o in lr.graph.output if o.name != "output_probability")
+
+    _prefixed(lr.graph, "lr_", input_names)
+    xgb_out = _prefixed(xgb.graph, "xgb_", input_names)[0]
+    rf_out = _prefixed(rf.graph, "rf_", input_names)[0]
+    lr_prob_edge = "lr_" + lr_prob_edge
+    lr_label_edge = "lr_" + lr_label_edge
+
+    high_idx = LR_CLASSES.index("High Risk")
+    low_idx = LR_CLASSES.index("Low Risk")
+
+    initializers = [
+        _const("ens_zero", 0.0, np.float32),
+        _const("ens_hundred", 100.0, np.float32),
+        _const("ens_half", 0.5, np.float32),
+        _const("ens_low_min", float(LOW_RISK_MIN_SCORE), np.float32),
+        _const("ens_medium_min", float(MEDIUM_RISK_MIN_SCORE), np.float32),
+        _const("ens_high_idx", [[high_idx]], np.int64),
+        _const("ens_low_idx", [[low_idx]], np.int64),
+        _const("ens_lr_scores", [LR_RISK_TO_SCORE[c] for c in LR_CLASSES], np.float32),
+        # Band index: 0 = High Risk (<40), 1 = Medium Risk, 2 = Low Risk (>=70)
+        _const("ens_bands", RISK_BANDS, object),
+    ]
+
+    nodes = [
+        # Per-model outputs, clipped to 0..100 like predict_all
+        helper.make_node("Clip", [xgb_out, "ens_zero", "ens_hundred"], ["xgb_score"]),
+        helper.make_node("Clip", [rf_out, "ens_zero", "ens_hundred"], ["rf_score"]),
+        helper.make_node("Identity", [lr_prob_edge], ["lr_probs"]),
+        helper.make_node("Identity", [lr_label_edge], ["lr_risk"]),
+        helper.make_node("ArgMax", ["lr_probs"], ["ens_lr_idx"], axis=1, keepdims=1),
+        helper.make_node("Gather", ["ens_lr_scores", "ens_lr_idx"], ["lr_score"], axis=0),
+
+        # High Risk -> min, Low Risk -> max, otherwise round(mean)
+        helper.make_node("Min", ["xgb_score", "rf_score"], ["ens_min"]),
+        helper.make_node("Max", ["xgb_score", "rf_score"], ["ens_max"]),
+        helper.make_node("Add", ["xgb_score", "rf_score"], ["ens_sum"]),
+        helper.make_node("Mul", ["ens_sum", "ens_half"], ["ens_mean"]),
+        helper.make_node("Round", ["ens_mean"], ["ens_mean_rounded"]),
+        helper.make_node("Equal", ["ens_lr_idx", "ens_high_idx"], ["ens_is_high"]),
+        helper.make_node("Equal", ["ens_lr_idx", "ens_low_idx"], ["ens_is_low"]),
+        helper.make_node("Where", ["ens_is_low", "ens_max", "ens_mean_rounded"], ["ens_not_high"]),
+        helper.make_node("Where", ["ens_is_high", "ens_min", "ens_not_high"], ["final_score"]),
+
+        # 70/40 banding
+        helper.make_node("Less", ["final_score", "ens_low_min"], ["ens_below_low"]),
+        helper.make_node("Less", ["final_score", "ens_medium_min"], ["ens_below_medium"]),
+        helper.make_node("Not", ["ens_below_low"], ["ens_at_low"]),
+        helper.make_node("Not", ["ens_below_medium"], ["ens_at_medium"]),
+        helper.make_node("Cast", ["ens_at_low"], ["ens_at_low_i"], to=TensorProto.INT64),
+        helper.make_node("Cast", ["ens_at_medium"], ["ens_at_medium_i"], to=TensorProto.INT64),
+        helper.make_node("Add", ["ens_at_low_i", "ens_at_medium_i"], ["ens_band_idx"]),
+        helper.make_node("Gather", ["ens_bands", "ens_band_idx"], ["risk_level"], axis=0),
+    ]
+
+    outputs = [
+        helper.make_tensor_value_info("final_score", TensorProto.FLOAT, [None, 1]),
+        helper.make_tensor_value_info("risk_level", TensorProto.STRING, [None, 1]),
+        helper.make_tensor_value_info("lr_risk", TensorProto.STRING, [None]),
+        helper.make_tensor_value_info("lr_probs", TensorProto.FLOAT, [None, len(LR_CLASSES)]),
+        helper.make_tensor_value_info("lr_score", TensorProto.FLOAT, [None, 1]),
+        helper.make_tensor_value_info("xgb_score", TensorProto.FLOAT, [None, 1]),
+        helper.make_tensor_value_info("rf_score", TensorProto.FLOAT, [None, 1]),
+    ]
+
+    graph = helper.make_graph(
+        list(lr.graph.node) + list(xgb.graph.node) + list(rf.graph.node) + nodes,
+        "altscore_ensemble",
+        inputs,
+        outputs,
+        initializer=list(lr.graph.initializer) + list(xgb.graph.initializer)
+        + list(rf.graph.initializer) + initializers,
+    )
+    model = helper.make_model(
+        graph,
+        producer_name="altscore",
+        opset_imports=[helper.make_opsetid("", ONNX_OPSET), helper.make_opsetid("ai.onnx.ml", ML_OPSET)],
+    )
+    model.ir_version = xgb.ir_version
+    onnx.checker.check_model(model)
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fuse LR/XGB/RF + ensemble rule into one ONNX model")
+    parser.add_argument("--models-dir", default=MODELS_ONNX_DIR)
+    parser.add_argument("--out", default=ENSEMBLE_MODEL_FILE,
+                        help="output file name, written inside --models-dir")
+    args = parser.parse_args()
+
+    model = build_ensemble(args.models_dir)
+    out_path = os.path.join(args.models_dir, args.out)
+    onnx.save(model, out_path)
+    print(f"Wrote {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Optional typed columnar backend for the user dataset.
+
+Each column of DATASET_COLUMNS is stored as a raw binary file with a fixed
+dtype under data/columnar/, described by meta.json. Columns are opened with
+np.memmap, so readers only touch the columns they ask for and numeric data is
+never re-parsed. Categoricals are dictionary-encoded (int32 codes + vocab).
+
+The CSV journal stays the source of truth: sync() brings the columnar copy up
+to date, appending only rows added since the last sync when the CSV has just
+grown. Enable it for readers (the dashboard and the rescore backfill) with
+ALTSCORE_STORAGE_BACKEND=columnar.
+
+Usage:
+    python columnar_store.py import [--csv data/dataset.csv]
+    python columnar_store.py export out.csv
+"""
+import argparse
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_store import (
+    DATA_FILE, DATASET_COLUMNS, FileLock, _lock_path_for, _read_complete_lines, _file_key, load_tombstones,
+)
+
+COLUMNAR_DIR = os.path.join("data", "columnar")
+META_FILE = "meta.json"
+BACKEND_ENV = "ALTSCORE_STORAGE_BACKEND"
+
+MISSING_INT = -1
+MISSING_CODE = -1
+
+# column -> (kind, numpy dtype). Int dtypes match the ONNX input tensors; floats
+# are kept as float64 so the store holds exactly what the CSV holds.
+SCHEMA = {
+    "user_id":                 ("text", "<U24"),
+    "employment_type":         ("category", "<i4"),
+    "income_range":            ("category", "<i4"),
+    "city_tier":               ("int", "<i8"),
+    "bank_account_age_months": ("int", "<i8"),
+    "num_bank_accounts":       ("int", "<i8"),
+    "monthly_income":          ("float", "<f8"),
+    "rent_paid_on_time":       ("float", "<f8"),
+    "utility_delay_days":      ("float", "<f8"),
+    "upi_txn_count":           ("float", "<f8"),
+    "avg_month_end_balance":   ("float", "<f8"),
+    "overdraft_event":         ("int", "<i8"),
+    "alt_credit_score":        ("float", "<f8"),
+    "lr_risk":                 ("category", "<i4"),
+    "lr_score":                ("float", "<f8"),
+    "lr_prob_high":            ("float", "<f8"),
+    "lr_prob_low":             ("float", "<f8"),
+    "lr_prob_medium":          ("float", "<f8"),
+    "xgb_score":               ("float", "<f8"),
+    "rf_score":                ("float", "<f8"),
+    "model_version":           ("category", "<i4"),
+    "scored_at":               ("text", "<U32"),
+}
+assert list(SCHEMA) == DATASET_COLUMNS
+
+
+def backend_enabled() -> bool:
+    return os.environ.get(BACKEND_ENV, "csv").strip().lower() == "columnar"
+
+
+# -----------------------------
+# Encoding
+# -----------------------------
+def _encode(df: pd.DataFrame, vocabs: dict) -> dict:
+    """CSV-parsed frame -> {column: typed array}. Extends vocabs in place."""
+    n = len(df)
+    out = {}
+    for col, (kind, dtype) in SCHEMA.items():
+        raw = df[col] if col in df.columns else pd.Series([np.nan] * n)
+        if kind == "category":
+            vocab = vocabs.setdefault(col, [])
+            index = {v: i for i, v in enumerate(vocab)}
+            codes = np.full(n, MISSING_CODE, dtype=dtype)
+            for i, v in enumerate(raw.tolist()):
+                if pd.isna(v):
+                    continue
+                v = str(v)
+                if v not in index:
+                    index[v] = len(vocab)
+                    vocab.append(v)
+                codes[i] = index[v]
+            out[col] = codes
+        elif kind == "int":
+            vals = pd.to_numeric(raw, errors="coerce")
+            out[col] = vals.fillna(MISSING_INT).to_numpy().astype(dtype)
+        elif kind == "float":
+            out[col] = pd.to_numeric(raw, errors="coerce").to_numpy(dtype=dtype)
+        else:
+            out[col] = raw.fillna("").astype(str).to_numpy(dtype=dtype)
+    return out
+
+def _decode(col: str, values: np.ndarray, vocabs: dict):
+    kind, _ = SCHEMA[col]
+    if kind == "category":
+        vocab = np.array(vocabs.get(col, []) + [np.nan], dtype=object)
+        # MISSING_CODE (-1) indexes the trailing NaN
+        return vocab[values]
+    if kind == "int":
+        arr = pd.array(np.asarray(values), dtype="Int64")
+        arr[np.asarray(values) == MISSING_INT] = pd.NA
+        return arr
+    if kind == "text":
+        return np.where(values == "", None, values).astype(object)
+    return values
+
+
+# -----------------------------
+# Storage
+# -----------------------------
+def _schema_meta() -> dict:
+    return {c: list(v) for c, v in SCHEMA.items()}
+
+def _column_path(store_dir: str, col: str) -> str:
+    return os.path.join(store_dir, f"{col}.bin")
+
+def read_meta(store_dir: str = COLUMNAR_DIR):
+    try:
+        with open(os.path.join(store_dir, META_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_meta(meta: dict, store_dir: str) -> None:
+    path = os.path.join(store_dir, META_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, path)
+
+def _replace_columns(arrays: dict, store_dir: str) -> None:
+    # New files swapped in whole: readers may still have the old ones memory-mapped
+    for col, arr in arrays.items():
+        path = _column_path(store_dir, col)
+        with open(path + ".tmp", "wb") as f:
+            f.write(np.ascontiguousarray(arr).tobytes())
+        os.replace(path + ".tmp", path)
+
+def _append_columns(arrays: dict, store_dir: str, rows: int) -> None:
+    for col, arr in arrays.items():
+        with open(_column_path(store_dir, col), "ab") as f:
+            # Drop whatever an interrupted earlier append left past meta["rows"],
+            # so every column stays aligned; nothing maps beyond that point
+            f.truncate(rows * np.dtype(SCHEMA[col][1]).itemsize)
+            f.write(np.ascontiguousarray(arr).tobytes())
+
+def _parse(header_line: bytes, body: bytes) -> pd.DataFrame:
+    return pd.read_csv(io.BytesIO(header_line + body), dtype=str, keep_default_na=True)
+
+def import_csv(csv_path: str = DATA_FILE, store_dir: str = COLUMNAR_DIR) -> dict:
+    """Full CSV -> columnar import. Replaces any existing store."""
+    os.makedirs(store_dir, exist_ok=True)
+    data = _read_complete_lines(csv_path, 0)
+    nl = data.find(b"\n")
+    header_line = data[:nl + 1] if nl >= 0 else b""
+    df = _parse(header_line, data[nl + 1:]) if nl >= 0 else pd.DataFrame(columns=DATASET_COLUMNS)
+
+    vocabs = {}
+    _replace_columns(_encode(df, vocabs), store_dir)
+    meta = {
+        "rows": len(df),
+        "schema": _schema_meta(),
+        "vocabs": vocabs,
+        "source": {
+            "path": os.path.abspath(csv_path),
+            "inode": _file_key(csv_path)[0],
+            "offset": len(data),
+            "header_line": header_line.decode("utf-8"),
+        },
+    }
+    _write_meta(meta, store_dir)
+    return meta
+
+def sync(csv_path: str = DATA_FILE, store_dir: str = COLUMNAR_DIR) -> dict:
+    """
+    Brings the columnar copy up to date with the CSV journal. Appends only the
+    new tail when the CSV has just grown; otherwise re-imports.
+    """
+    with FileLock(_lock_path_for(csv_path)):
+        meta = read_meta(store_dir)
+        key = _file_key(csv_path)
+        src = (meta or {}).get("source", {})
+        header_line = src.get("header_line", "").encode("utf-8")
+        with open(csv_path, "rb") as f:
+            same_header = bool(header_line) and f.read(len(header_line)) == header_line
+        if (meta is None or meta.get("schema") != _schema_meta() or src.get("inode") != key[0]
+                or key[1] < src.get("offset", 0) or not same_header):
+            return import_csv(csv_path, store_dir)
+
+        tail = _read_complete_lines(csv_path, src["offset"])
+        if not tail:
+            return meta
+        df = _parse(header_line, tail)
+        _append_columns(_encode(df, meta["vocabs"]), store_dir, meta["rows"])
+        meta["rows"] += len(df)
+        src["offset"] += len(tail)
+        _write_meta(meta, store_dir)
+        return meta
+
+def _covers(meta, csv_path: str) -> bool:
+    # Lock-free: the store was synced from this exact file and up to its current size
+    if meta is None or meta.get("schema") != _schema_meta() or not os.path.exists(csv_path):
+        return False
+    src = meta.get("source", {})
+    inode, size, _ = _file_key(csv_path)
+    return src.get("inode") == inode and src.get("offset") == size
+
+def _current_meta(csv_path: str, store_dir: str) -> dict:
+    meta = read_meta(store_dir)
+    if not _covers(meta, csv_path):
+        # Only a CSV that grew or was rewritten takes the writer lock
+        meta = sync(csv_path, store_dir)
+    return meta
+
+def read_columns(columns=None, store_dir: str = COLUMNAR_DIR, meta: dict = None) -> dict:
+    """
+    Memory-mapped, zero-copy column arrays in their stored dtype
+    (categoricals as int32 codes, see meta["vocabs"]).
+    """
+    meta = meta or read_meta(store_dir)
+    if meta is None:
+        raise FileNotFoundError(f"No columnar store in {store_dir}; run `python columnar_store.py import`")
+    rows = meta["rows"]
+    out = {}
+    for col in columns or DATASET_COLUMNS:
+        _, dtype = SCHEMA[col]
+        if rows == 0:
+            out[col] = np.empty(0, dtype=dtype)
+        else:
+            out[col] = np.memmap(_column_path(store_dir, col), dtype=dtype, mode="r", shape=(rows,))
+    return out
+
+def read_frame(columns=None, csv_path: str = DATA_FILE, store_dir: str = COLUMNAR_DIR) -> pd.DataFrame:
+    """
+    Syncs with the CSV when it has moved, then decodes only the requested
+    columns into a DataFrame. Tombstoned users are left out, like in the CSV
+    snapshot.
+    """
+    meta = _current_meta(csv_path, store_dir)
+    cols = columns or DATASET_COLUMNS
+    tombstones = load_tombstones(csv_path)
+    read = cols if not tombstones or "user_id" in cols else list(cols) + ["user_id"]
+    arrays = read_columns(read, store_dir, meta)
+    keep = slice(None)
+    if tombstones:
+        keep = ~np.isin(arrays["user_id"], list(tombstones.active))
+    return pd.DataFrame({c: _decode(c, arrays[c][keep], meta["vocabs"]) for c in cols})
+
+def export_csv(out_path: str, store_dir: str = COLUMNAR_DIR) -> None:
+    meta = read_meta(store_dir)
+    arrays = read_columns(None, store_dir, meta)
+    df = pd.DataFrame({c: _decode(c, arrays[c], meta["vocabs"]) for c in DATASET_COLUMNS})
+    df.to_csv(out_path, index=False)
+
+def load_columns(columns, csv_path: str = DATA_FILE) -> pd.DataFrame:
+    """
+    Every journal row in file order (tombstoned users included, as
+    pd.read_csv sees them) for only the given columns. Goes through the
+    columnar backend when it is enabled and csv_path is the dataset it mirrors.
+    """
+    if backend_enabled() and os.path.abspath(csv_path) == os.path.abspath(DATA_FILE):
+        meta = _current_meta(csv_path, COLUMNAR_DIR)
+        arrays = read_columns(columns, COLUMNAR_DIR, meta)
+        return pd.DataFrame({c: _decode(c, arrays[c], meta["vocabs"]) for c in columns})
+    header = pd.read_csv(csv_path, nrows=0).columns
+    return pd.read_csv(csv_path, usecols=[c for c in columns if c in header])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CSV <-> columnar bridge for the user dataset")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_imp = sub.add_parser("import", help="import (or re-sync) the CSV journal")
+    p_imp.add_argument("--csv", default=DATA_FILE)
+    p_imp.add_argument("--store", default=COLUMNAR_DIR)
+    p_imp.add_argument("--full", action="store_true", help="full re-import instead of incremental sync")
+    p_exp = sub.add_parser("export", help="write the columnar store back to CSV")
+    p_exp.add_argument("out")
+    p_exp.add_argument("--store", default=COLUMNAR_DIR)
+    args = parser.parse_args()
+
+    if args.cmd == "import":
+        if args.full:
+            with FileLock(_lock_path_for(args.csv)):
+                meta = import_csv(args.csv, args.store)
+        else:
+            meta = sync(args.csv, args.store)
+        print(f"{meta['rows']} rows in {args.store}")
+    else:
+        export_csv(args.out, args.store)
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
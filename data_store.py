@@ -0,0 +1,1085 @@
+"""
+Append-only storage for registered users.
+
+data/dataset.csv is treated as a journal: the header is fixed once and every
+registration is appended as a single line, so insert cost does not depend on
+how many users are already stored. User IDs come from a persistent counter
+instead of re-parsing the dataset.
+
+Writes from every Streamlit session go through one process-wide
+RegistrationWriter thread, which batches concurrent submissions into a single
+flush under a file lock and assigns IDs atomically.
+
+Risk-band aggregates for the dashboard header are kept in a small summary
+file that is updated on every write and delete.
+
+Deletes never rewrite the journal: each one appends a tombstone (or an undo)
+to a small sidecar journal, and readers drop tombstoned user IDs from their
+snapshot. compact() rewrites the dataset without them once enough have piled
+up; until then every delete can be undone.
+
+A sidecar user_id index maps every ID to the byte offset of its line, so a
+single record (features and stored model outputs) is read with one seek
+instead of loading the dataset. It is extended on each write and rebuilt
+whenever the dataset file is rewritten.
+
+Readers share one parsed DatasetSnapshot per process, keyed on the file's
+identity; when the journal has only grown, just the new tail is parsed.
+"""
+import csv
+import io
+import json
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+
+from metrics import timed, inc, observe
+from risk_bands import band_counts, band_labels, score_array
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DATA_DIR = "data"
+DATA_FILE = os.path.join(DATA_DIR, "dataset.csv")
+COUNTER_FILE = os.path.join(DATA_DIR, "user_id_counter.txt")
+LOCK_FILE = os.path.join(DATA_DIR, "dataset.lock")
+SUMMARY_FILE = os.path.join(DATA_DIR, "summary.json")
+TOMBSTONE_FILE = os.path.join(DATA_DIR, "tombstones.jsonl")
+USER_INDEX_FILE = os.path.join(DATA_DIR, "user_index.tsv")
+
+# Tombstones that trigger a background compaction after a delete (0 = only on demand)
+COMPACT_THRESHOLD_ENV = "ALTSCORE_COMPACT_THRESHOLD"
+DEFAULT_COMPACT_THRESHOLD = 500
+
+REQUIRED_COLUMNS = [
+    "user_id", "employment_type", "income_range", "city_tier",
+    "bank_account_age_months", "num_bank_accounts", "monthly_income",
+    "rent_paid_on_time", "utility_delay_days", "upi_txn_count",
+    "avg_month_end_balance", "overdraft_event", "alt_credit_score"
+]
+
+# Per-model outputs stored with each record so other pages never re-run inference
+MODEL_OUTPUT_COLUMNS = [
+    "lr_risk", "lr_score", "lr_prob_high", "lr_prob_low", "lr_prob_medium",
+    "xgb_score", "rf_score", "model_version", "scored_at"
+]
+
+DATASET_COLUMNS = REQUIRED_COLUMNS + MODEL_OUTPUT_COLUMNS
+
+_TAIL_BLOCK = 4096
+
+
+# -----------------------------
+# Journal file
+# -----------------------------
+def _read_header(path: str):
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        first = f.readline()
+    terminator = "\r\n" if first.endswith("\r\n") else "\n"
+    header = next(csv.reader([first.rstrip("\r\n")]), []) if first.strip() else []
+    return header, terminator
+
+def ensure_dataset_file(path: str = DATA_FILE) -> list:
+    """
+    Creates the journal if missing. An existing CSV whose header lacks any of
+    DATASET_COLUMNS is migrated once by extending its header; older rows simply
+    leave the new columns empty. Returns the header in on-disk order.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            csv.writer(f, lineterminator="\n").writerow(DATASET_COLUMNS)
+        return list(DATASET_COLUMNS)
+
+    header, terminator = _read_header(path)
+    missing = [c for c in DATASET_COLUMNS if c not in header]
+    if not missing:
+        return header
+
+    header = header + missing
+    tmp_path = path + ".tmp"
+    with open(path, "r", newline="", encoding="utf-8") as src, \
+            open(tmp_path, "w", newline="", encoding="utf-8") as dst:
+        src.readline()
+        csv.writer(dst, lineterminator=terminator).writerow(header)
+        for line in src:
+            dst.write(line)
+    os.replace(tmp_path, path)
+    return header
+
+def _last_line(path: str) -> str:
+    """Reads the last non-empty line by seeking backwards from the end of the file."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        buf = b""
+        while pos > 0:
+            step = min(_TAIL_BLOCK, pos)
+            pos -= step
+            f.seek(pos)
+            buf = f.read(step) + buf
+            lines = buf.rstrip(b"\r\n").split(b"\n")
+            if len(lines) > 1 or pos == 0:
+                return lines[-1].rstrip(b"\r").decode("utf-8")
+    return ""
+
+def _format_value(val) -> str:
+    if val is None:
+        return ""
+    if isinstance(val, (float, np.floating)) and np.isnan(val):
+        return ""
+    if isinstance(val, (np.integer, np.floating)):
+        val = val.item()
+    return str(val)
+
+def append_records(records: list, path: str = DATA_FILE) -> None:
+    """
+    Appends records as CSV lines in header order with a single write
+    (O(batch) regardless of dataset size).
+    """
+    if not records:
+        return
+    header = ensure_dataset_file(path)
+    _, terminator = _read_header(path)
+
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator=terminator)
+    for record in records:
+        writer.writerow([_format_value(record.get(col)) for col in header])
+
+    with open(path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(terminator.encode("utf-8"))
+        f.write(out.getvalue().encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+
+def append_record(record: dict, path: str = DATA_FILE) -> None:
+    append_records([record], path)
+
+
+class FileLock:
+    """Exclusive advisory lock on LOCK_FILE, shared by every process writing the journal."""
+
+    def __init__(self, path: str = LOCK_FILE):
+        self.path = path
+        self._f = None
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._f = open(self.path, "a+")
+        if fcntl is not None:
+            fcntl.flock(self._f.fileno(), fcntl.LOCK_EX)
+        else:
+            self._f.seek(0)
+            msvcrt.locking(self._f.fileno(), msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._f.fileno(), fcntl.LOCK_UN)
+        else:
+            self._f.seek(0)
+            msvcrt.locking(self._f.fileno(), msvcrt.LK_UNLCK, 1)
+        self._f.close()
+        self._f = None
+        return False
+
+
+# -----------------------------
+# User ID counter
+# -----------------------------
+def _user_number(user_id) -> int:
+    m = re.search(r"(\d+)$", str(user_id))
+    return int(m.group(1)) if m else 0
+
+def _last_user_number(path: str = DATA_FILE) -> int:
+    if not os.path.exists(path):
+        return 0
+    header, _ = _read_header(path)
+    if "user_id" not in header:
+        return 0
+    last = _last_line(path)
+    row = next(csv.reader([last]), [])
+    if not row or row == header:
+        return 0
+    idx = header.index("user_id")
+    return _user_number(row[idx]) if idx < len(row) else 0
+
+def _read_counter(path: str = COUNTER_FILE):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+def _write_counter(value: int, path: str = COUNTER_FILE) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(str(value))
+    os.replace(tmp_path, path)
+
+def _allocate_user_numbers(count: int, data_path: str, counter_path: str) -> list:
+    # Caller must hold FileLock
+    stored = _read_counter(counter_path)
+    first = max(stored or 1, _last_user_number(data_path) + 1)
+    _write_counter(first + count, counter_path)
+    return list(range(first, first + count))
+
+def format_user_id(n: int) -> str:
+    return f"USER_{n:04d}"
+
+def allocate_user_id(data_path: str = DATA_FILE, counter_path: str = COUNTER_FILE) -> str:
+    """
+    Returns the next user ID and advances the persistent counter.
+    The counter is seeded from the journal's last row, so existing CSV data
+    keeps its numbering, and IDs are never reused after a delete.
+    """
+    with FileLock(_lock_path_for(data_path)):
+        return format_user_id(_allocate_user_numbers(1, data_path, counter_path)[0])
+
+def _sidecar(data_path: str, default_path: str) -> str:
+    # Lock / summary files live next to whichever dataset they describe and are
+    # named after it, so datasets sharing a directory never share sidecars.
+    # The default dataset keeps the plain names.
+    name = os.path.basename(default_path)
+    stem = os.path.splitext(os.path.basename(data_path))[0]
+    if stem != os.path.splitext(os.path.basename(DATA_FILE))[0]:
+        name = f"{stem}.{name}"
+    return os.path.join(os.path.dirname(data_path) or ".", name)
+
+def _lock_path_for(data_path: str) -> str:
+    return _sidecar(data_path, LOCK_FILE)
+
+
+# -----------------------------
+# Risk-band summary
+# -----------------------------
+# Score histogram kept in the summary ({bin: count}, non-empty bins only): one
+# bin per stored score step (scores are written with two decimals) over
+# [0, 100], so the report page gets a percentile without loading the dataset
+SCORE_HIST_BINS = 10001
+
+def _score_bins(valid: np.ndarray) -> np.ndarray:
+    return np.clip(np.rint(valid * 100), 0, SCORE_HIST_BINS - 1).astype(np.int64)
+
+def empty_summary() -> dict:
+    return {
+        "total": 0,
+        "bands": {"low": 0, "medium": 0, "high": 0, "unknown": 0},
+        "score_count": 0,
+        "score_sum": 0.0,
+        "score_min": None,
+        "score_max": None,
+        "score_range_stale": False,
+        "score_hist": {},
+        "dataset_size": 0,
+        "tombstones_size": 0,
+    }
+
+def _apply_scores(summary: dict, scores, sign: int = 1) -> dict:
+    """Adds (sign=1) or removes (sign=-1) scores from the running aggregates."""
+    s = score_array(scores)
+    summary["total"] += sign * len(s)
+    for band, count in band_counts(s).items():
+        summary["bands"][band.lower()] += sign * count
+    valid = s[~np.isnan(s)]
+    summary["score_count"] += sign * len(valid)
+    summary["score_sum"] += sign * float(valid.sum())
+    hist = summary["score_hist"]
+    bins, counts = np.unique(_score_bins(valid), return_counts=True)
+    for b, count in zip(bins.tolist(), counts.tolist()):
+        key = str(b)  # JSON object keys are strings
+        hist[key] = hist.get(key, 0) + sign * count
+        if hist[key] <= 0:
+            del hist[key]
+    if sign > 0 and len(valid):
+        lo, hi = float(valid.min()), float(valid.max())
+        if summary["score_min"] is None or lo < summary["score_min"]:
+            summary["score_min"] = lo
+        if summary["score_max"] is None or hi > summary["score_max"]:
+            summary["score_max"] = hi
+    return summary
+
+def _save_summary(summary: dict, data_path: str) -> None:
+    summary["dataset_size"] = os.path.getsize(data_path) if os.path.exists(data_path) else 0
+    summary["tombstones_size"] = _tombstones_size(data_path)
+    path = _sidecar(data_path, SUMMARY_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(summary))
+    os.replace(tmp_path, path)
+
+def _read_summary(data_path: str):
+    try:
+        with open(_sidecar(data_path, SUMMARY_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def rebuild_summary(data_path: str = DATA_FILE) -> dict:
+    """Recomputes the aggregates from the raw dataset (reads only user_id and alt_credit_score)."""
+    summary = empty_summary()
+    if os.path.exists(data_path) and os.path.getsize(data_path) > 0:
+        header, _ = _read_header(data_path)
+        if "alt_credit_score" in header:
+            usecols = [c for c in ("user_id", "alt_credit_score") if c in header]
+            df = pd.read_csv(data_path, usecols=usecols)
+            tombstones = load_tombstones(data_path)
+            if tombstones and "user_id" in df.columns:
+                df = df[~df["user_id"].astype(str).isin(tombstones.active)]
+            _apply_scores(summary, df["alt_credit_score"].to_numpy())
+    _save_summary(summary, data_path)
+    return summary
+
+def score_percentile(score, summary: dict) -> float:
+    """
+    Percentage of scored applicants with a strictly lower score, from the
+    summary's score histogram.
+    """
+    total = summary.get("score_count") or 0
+    score = score_array([score])[0]
+    if total <= 0 or np.isnan(score):
+        return float("nan")
+    b = int(_score_bins(np.array([score]))[0])
+    return 100.0 * sum(count for key, count in summary["score_hist"].items() if int(key) < b) / total
+
+def load_summary(data_path: str = DATA_FILE) -> dict:
+    """
+    Returns the maintained aggregates in constant time. Falls back to a
+    rebuild when the summary is missing, the dataset was changed outside
+    data_store (its size no longer matches), or a delete removed the lowest
+    or highest score (score_min / score_max went stale).
+    """
+    summary = _read_summary(data_path)
+    if not _summary_matches(summary, data_path) or summary.get("score_range_stale"):
+        with FileLock(_lock_path_for(data_path)):
+            summary = rebuild_summary(data_path)
+    return summary
+
+def _update_summary_locked(data_path: str, added=()) -> None:
+    # Caller must hold FileLock and have checked _summary_in_sync before writing
+    summary = _read_summary(data_path)
+    _apply_scores(summary, added, 1)
+    _save_summary(summary, data_path)
+
+
+# -----------------------------
+# Deletes (tombstones)
+# -----------------------------
+def _tombstone_path(data_path: str) -> str:
+    return _sidecar(data_path, TOMBSTONE_FILE)
+
+def _tombstones_size(data_path: str) -> int:
+    path = _tombstone_path(data_path)
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+class Tombstones:
+    """
+    Deletes in effect, replayed from the tombstone journal: user_id -> the
+    delete event (with the score, so undo needs no lookup), oldest first.
+    """
+
+    def __init__(self, key=None, active: dict = None):
+        self.key = key
+        self.active = active or {}
+
+    def __len__(self):
+        return len(self.active)
+
+    def __contains__(self, user_id):
+        return str(user_id) in self.active
+
+    def last(self):
+        """Most recent delete still in effect, or None."""
+        return next(reversed(self.active.values()), None)
+
+_tombstones = {}
+_tombstones_lock = threading.Lock()
+
+def load_tombstones(data_path: str = DATA_FILE) -> Tombstones:
+    """Active tombstones, re-read only when the tombstone journal changed."""
+    path = _tombstone_path(data_path)
+    if not os.path.exists(path):
+        return Tombstones()
+    key = _file_key(path)
+    with _tombstones_lock:
+        cached = _tombstones.get(path)
+        if cached is not None and cached.key == key:
+            return cached
+        active = {}
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue  # torn last line of a crashed append
+                user_id = str(event.get("user_id"))
+                active.pop(user_id, None)
+                if event.get("op") == "delete":
+                    active[user_id] = event
+        cached = _tombstones[path] = Tombstones(key, active)
+        return cached
+
+def _append_tombstone(data_path: str, event: dict) -> None:
+    # Caller must hold FileLock
+    with open(_tombstone_path(data_path), "a", encoding="utf-8") as f:
+        f.write(json.dumps(event) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+def _drop_from_score_range(summary: dict, score: float) -> None:
+    # min/max cannot be decremented; when the removed score was one of them, the
+    # range is marked stale and recomputed lazily by load_summary (or at compaction)
+    if summary["score_count"] == 0:
+        summary["score_min"] = summary["score_max"] = None
+        summary["score_range_stale"] = False
+    elif not np.isnan(score) and score in (summary["score_min"], summary["score_max"]):
+        summary["score_range_stale"] = True
+
+def _live_record(data_path: str, user_id: str):
+    # Caller must hold FileLock and have checked the tombstones
+    return _parse_record(_indexed_lines(_sync_user_index(data_path), data_path, user_id), user_id)
+
+def delete_user(user_id, data_path: str = DATA_FILE):
+    """
+    Deletes one record by appending a tombstone; the dataset itself is not
+    touched. Returns the user_id, or None when no live record has it.
+    """
+    user_id = str(user_id).strip()
+    with FileLock(_lock_path_for(data_path)):
+        if not os.path.exists(data_path) or user_id in load_tombstones(data_path):
+            return None
+        record = _live_record(data_path, user_id)
+        if record is None:
+            return None
+        score = score_array([record.get("alt_credit_score")])[0]
+        summary_ok = _summary_in_sync(data_path)
+        _append_tombstone(data_path, {
+            "op": "delete",
+            "user_id": user_id,
+            "score": None if np.isnan(score) else float(score),
+            "at": time.time(),
+        })
+        if summary_ok:
+            summary = _read_summary(data_path)
+            _apply_scores(summary, [score], -1)
+            _drop_from_score_range(summary, score)
+            _save_summary(summary, data_path)
+        else:
+            rebuild_summary(data_path)
+    inc("store.deletes")
+    maybe_compact(data_path)
+    return user_id
+
+def delete_last_record(data_path: str = DATA_FILE):
+    """
+    Deletes the newest live record. Returns its user_id, or None when the
+    dataset is empty.
+    """
+    frame = get_snapshot(data_path).frame
+    if frame.empty:
+        return None
+    return delete_user(frame["user_id"].iloc[-1], data_path)
+
+def undo_delete(user_id=None, data_path: str = DATA_FILE):
+    """
+    Restores a tombstoned record (the most recent delete when user_id is
+    None). Only possible until compaction. Returns the restored user_id or None.
+    """
+    with FileLock(_lock_path_for(data_path)):
+        tombstones = load_tombstones(data_path)
+        event = tombstones.last() if user_id is None else tombstones.active.get(str(user_id).strip())
+        if event is None:
+            return None
+        summary_ok = _summary_in_sync(data_path)
+        _append_tombstone(data_path, {"op": "undo", "user_id": event["user_id"], "at": time.time()})
+        if summary_ok:
+            summary = _read_summary(data_path)
+            _apply_scores(summary, [event.get("score")], 1)
+            _save_summary(summary, data_path)
+        else:
+            rebuild_summary(data_path)
+    inc("store.undeletes")
+    return event["user_id"]
+
+def compact(data_path: str = DATA_FILE) -> int:
+    """
+    Rewrites the dataset without tombstoned records and clears the tombstone
+    journal (those deletes can no longer be undone). Returns rows removed.
+    """
+    with FileLock(_lock_path_for(data_path)):
+        tombstones = load_tombstones(data_path)
+        if not tombstones or not os.path.exists(data_path):
+            return 0
+        with timed("store.compact"):
+            _, terminator = _read_header(data_path)
+            # Values are kept as the exact text that was stored
+            df = pd.read_csv(data_path, dtype=str, keep_default_na=False)
+            keep = ~df["user_id"].isin(tombstones.active).to_numpy()
+            # Replace the file (new inode) so snapshot readers never mistake the rewrite for an append
+            tmp_path = data_path + ".tmp"
+            df[keep].to_csv(tmp_path, index=False, lineterminator=terminator)
+            os.replace(tmp_path, data_path)
+            os.remove(_tombstone_path(data_path))
+            rebuild_summary(data_path)
+            rebuild_user_index(data_path)
+    removed = int((~keep).sum())
+    inc("store.compacted_rows", removed)
+    return removed
+
+def compact_threshold() -> int:
+    try:
+        return max(0, int(os.environ.get(COMPACT_THRESHOLD_ENV, DEFAULT_COMPACT_THRESHOLD)))
+    except ValueError:
+        return DEFAULT_COMPACT_THRESHOLD
+
+_compacting = set()
+_compacting_lock = threading.Lock()
+
+def maybe_compact(data_path: str = DATA_FILE) -> bool:
+    """Starts a background compaction once the tombstones reach the threshold."""
+    threshold = compact_threshold()
+    if not threshold or len(load_tombstones(data_path)) < threshold:
+        return False
+    with _compacting_lock:
+        if data_path in _compacting:
+            return False
+        _compacting.add(data_path)
+
+    def run():
+        try:
+            compact(data_path)
+        except Exception:
+            inc("store.compact_errors")
+        finally:
+            with _compacting_lock:
+                _compacting.discard(data_path)
+
+    threading.Thread(target=run, name="dataset-compaction", daemon=True).start()
+    return True
+
+def _summary_matches(summary, data_path: str) -> bool:
+    size = os.path.getsize(data_path) if os.path.exists(data_path) else 0
+    return (
+        summary is not None
+        and "score_hist" in summary
+        and summary.get("dataset_size") == size
+        and summary.get("tombstones_size", 0) == _tombstones_size(data_path)
+    )
+
+def _summary_in_sync(data_path: str) -> bool:
+    return _summary_matches(_read_summary(data_path), data_path)
+
+
+# -----------------------------
+# User ID index
+# -----------------------------
+# Index file layout: a header line "#altscore-user-index<TAB>inode<TAB>start" naming
+# the dataset file it describes and the offset of its first record, then one
+# "user_id<TAB>offset<TAB>length" line per record in file order. A rebuild
+# replaces the file; otherwise it is only appended to, like the journal.
+_USER_INDEX_MAGIC = "#altscore-user-index"
+
+def _user_index_path(data_path: str) -> str:
+    return _sidecar(data_path, USER_INDEX_FILE)
+
+class UserIndex:
+    """
+    user_id -> byte offset of its line in the dataset file with inode
+    `inode`, for the first `end` bytes of it. A repeated ID maps to its last
+    line, as everywhere else. Deleted users keep their entry until
+    compaction; lookups check the tombstones.
+    """
+
+    def __init__(self, inode: int, start: int):
+        self.inode = inode
+        self.start = start
+        self.end = start
+        self.offsets = {}
+        self.header_line = b""
+        self.file_key = None   # (inode, bytes parsed) of the index file itself
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __contains__(self, user_id):
+        return str(user_id).strip() in self.offsets
+
+    def _add_lines(self, data: bytes) -> None:
+        for line in data.decode("utf-8").splitlines():
+            user_id, offset, length = line.split("\t")
+            self.offsets[user_id] = int(offset)
+            self.end = int(offset) + int(length)
+
+def _line_field(line: bytes, col: int) -> str:
+    if b'"' in line:
+        row = next(csv.reader([line.decode("utf-8")]), [])
+        return row[col] if col < len(row) else ""
+    parts = line.split(b",", col + 1)
+    return parts[col].decode("utf-8") if col < len(parts) else ""
+
+def _scan_user_lines(data_path: str, start: int) -> list:
+    """(user_id, offset, length) of every complete dataset line from byte `start` on."""
+    header, _ = _read_header(data_path)
+    if "user_id" not in header:
+        return []
+    col = header.index("user_id")
+    entries = []
+    pos = start
+    for line in _read_complete_lines(data_path, start).splitlines(keepends=True):
+        user_id = _line_field(line.rstrip(b"\r\n"), col).strip()
+        if user_id:
+            entries.append((user_id, pos, len(line)))
+        pos += len(line)
+    return entries
+
+def _index_lines(entries) -> bytes:
+    return "".join(f"{user_id}\t{offset}\t{length}\n" for user_id, offset, length in entries).encode("utf-8")
+
+def _can_tail_read_index(index: UserIndex, path: str, st) -> bool:
+    # Same file, only grown, and still describing the same dataset
+    if index.file_key[0] != st.st_ino or st.st_size < index.file_key[1]:
+        return False
+    with open(path, "rb") as f:
+        return f.read(len(index.header_line)) == index.header_line
+
+_user_indexes = {}
+_user_indexes_lock = threading.Lock()
+
+def _load_user_index(data_path: str):
+    """
+    The index as last written, or None when there is none (or it is
+    unreadable). Only lines appended since the previous call are parsed.
+    """
+    path = _user_index_path(data_path)
+    if not os.path.exists(path):
+        return None
+    with _user_indexes_lock:
+        st = os.stat(path)
+        index = _user_indexes.get(path)
+        try:
+            if index is not None and index.file_key == (st.st_ino, st.st_size):
+                return index
+            if index is not None and _can_tail_read_index(index, path, st):
+                data = _read_complete_lines(path, index.file_key[1])
+                index._add_lines(data)
+                parsed = index.file_key[1] + len(data)
+            else:
+                data = _read_complete_lines(path, 0)
+                nl = data.find(b"\n")
+                magic, inode, start = data[:nl].decode("utf-8").split("\t")
+                if magic != _USER_INDEX_MAGIC:
+                    return None
+                index = UserIndex(int(inode), int(start))
+                index.header_line = data[:nl + 1]
+                index._add_lines(data[nl + 1:])
+                parsed = len(data)
+        except ValueError:
+            _user_indexes.pop(path, None)
+            return None
+        index.file_key = (st.st_ino, parsed)
+        _user_indexes[path] = index
+        return index
+
+def rebuild_user_index(data_path: str = DATA_FILE) -> UserIndex:
+    """Re-indexes the whole dataset (caller must hold FileLock)."""
+    with timed("user_index.rebuild"):
+        with open(data_path, "rb") as f:
+            inode = os.fstat(f.fileno()).st_ino
+            start = len(f.readline())
+        path = _user_index_path(data_path)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(f"{_USER_INDEX_MAGIC}\t{inode}\t{start}\n".encode("utf-8"))
+            f.write(_index_lines(_scan_user_lines(data_path, start)))
+        os.replace(tmp_path, path)
+    inc("user_index.rebuilds")
+    return _load_user_index(data_path)
+
+def _sync_user_index(data_path: str) -> UserIndex:
+    # Caller must hold FileLock. Indexes appended lines; a rewritten dataset is re-indexed.
+    index = _load_user_index(data_path)
+    st = os.stat(data_path)
+    if index is None or index.inode != st.st_ino or index.end > st.st_size:
+        return rebuild_user_index(data_path)
+    if index.end < st.st_size:
+        entries = _scan_user_lines(data_path, index.end)
+        if entries:
+            with open(_user_index_path(data_path), "ab") as f:
+                f.write(_index_lines(entries))
+            index = _load_user_index(data_path)
+    return index
+
+def get_user_index(data_path: str = DATA_FILE) -> UserIndex:
+    """The user_id index, caught up with the dataset (normally just read from disk)."""
+    index = _load_user_index(data_path)
+    if index is not None:
+        st = os.stat(data_path)
+        if index.inode == st.st_ino and index.end == st.st_size:
+            return index
+    with FileLock(_lock_path_for(data_path)):
+        return _sync_user_index(data_path)
+
+def _indexed_lines(index: UserIndex, data_path: str, user_id: str):
+    # (header line, record line); None when the dataset was replaced after the index was read
+    offset = index.offsets.get(user_id)
+    with open(data_path, "rb") as f:
+        if os.fstat(f.fileno()).st_ino != index.inode:
+            return None
+        header_line = f.readline()
+        if offset is None:
+            return header_line, b""
+        f.seek(offset)
+        return header_line, f.readline()
+
+def _parse_record(lines, user_id: str):
+    header_line, line = lines
+    if not line.strip():
+        return None
+    row = pd.read_csv(io.BytesIO(header_line + line), dtype={"user_id": str})
+    if row.empty or "user_id" not in row.columns or str(row["user_id"].iloc[0]).strip() != user_id:
+        return None  # the line was edited in place outside data_store
+    return row.iloc[0].to_dict()
+
+def find_user(user_id, data_path: str = DATA_FILE):
+    """
+    The live record of one user (features and stored model outputs) as a
+    dict, or None. Costs one index lookup and one line read, whatever the
+    size of the dataset.
+    """
+    user_id = str(user_id).strip()
+    if not user_id or not os.path.exists(data_path) or user_id in load_tombstones(data_path):
+        return None
+    with timed("store.find_user"):
+        lines = _indexed_lines(get_user_index(data_path), data_path, user_id)
+        if lines is None:
+            with FileLock(_lock_path_for(data_path)):
+                lines = _indexed_lines(_sync_user_index(data_path), data_path, user_id)
+        return _parse_record(lines, user_id)
+
+
+# -----------------------------
+# Shared snapshot cache
+# -----------------------------
+DEFAULT_EMPLOYMENT_TYPES = ["gig", "salaried", "self_employed"]
+DEFAULT_INCOME_RANGES = ["0-15000", "10000-30000", "30000-50000", "50000-100000"]
+DEFAULT_CITY_TIERS = [1, 2, 3]
+
+def _file_key(path: str):
+    st = os.stat(path)
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+def _parse_csv_bytes(header_line: bytes, body: bytes) -> pd.DataFrame:
+    return pd.read_csv(io.BytesIO(header_line + body))
+
+
+class DatasetSnapshot:
+    """
+    Immutable parsed view of the dataset at one file identity.
+    journal holds every parsed row in file order; frame is the live view
+    without tombstoned users (the journal itself when nothing is deleted).
+    Treat both as read-only: they are shared by every page in the process.
+    """
+
+    def __init__(self, journal: pd.DataFrame, key, offset: int, header_line: bytes, catalogs=None,
+                 tombstones: Tombstones = None):
+        self.journal = journal
+        self.key = key
+        self.offset = offset          # bytes of the file covered by journal (ends on a line boundary)
+        self.header_line = header_line
+        self.tombstones = tombstones or Tombstones()
+        self.frame = _live_rows(journal, self.tombstones)
+        self._catalogs = catalogs
+
+    @property
+    def generation(self):
+        """Changes on every append, delete, undo and compaction."""
+        return (self.key, self.tombstones.key)
+
+    @property
+    def empty(self) -> bool:
+        return self.frame.empty
+
+    def with_tombstones(self, tombstones: Tombstones) -> "DatasetSnapshot":
+        return DatasetSnapshot(self.journal, self.key, self.offset, self.header_line, self._catalogs, tombstones)
+
+    def catalogs(self):
+        """(employment types, income ranges, city tiers) for the registration dropdowns."""
+        if self._catalogs is None:
+            self._catalogs = catalogs_from_frame(self.frame)
+        return self._catalogs
+
+    def dropdown_options(self):
+        emp, inc, tiers = self.catalogs()
+        if emp and inc and tiers:
+            return emp, inc, tiers
+        return DEFAULT_EMPLOYMENT_TYPES, DEFAULT_INCOME_RANGES, DEFAULT_CITY_TIERS
+
+
+def _live_rows(journal: pd.DataFrame, tombstones: Tombstones) -> pd.DataFrame:
+    # One hashed isin over user_id, and only while there are pending deletes
+    if not tombstones or journal.empty or "user_id" not in journal.columns:
+        return journal
+    return journal[~journal["user_id"].astype(str).isin(tombstones.active).to_numpy()]
+
+def catalogs_from_frame(df: pd.DataFrame):
+    if df.empty or not {"employment_type", "income_range", "city_tier"} <= set(df.columns):
+        return [], [], []
+    emp = sorted(df["employment_type"].dropna().astype(str).unique().tolist())
+    inc = sorted(df["income_range"].dropna().astype(str).unique().tolist())
+    tiers = pd.to_numeric(df["city_tier"], errors="coerce").dropna().astype(int)
+    return emp, inc, sorted(set(tiers.tolist()))
+
+def _merge_catalogs(old, new):
+    return tuple(sorted(set(a) | set(b)) for a, b in zip(old, new))
+
+def _read_complete_lines(path: str, start: int) -> bytes:
+    # Stop at the last newline so a write that is still in progress is never parsed
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read()
+    cut = data.rfind(b"\n")
+    return data[:cut + 1] if cut >= 0 else b""
+
+def _full_snapshot(path: str, key, tombstones: Tombstones = None) -> DatasetSnapshot:
+    data = _read_complete_lines(path, 0)
+    nl = data.find(b"\n")
+    if nl < 0:
+        return DatasetSnapshot(pd.DataFrame(columns=DATASET_COLUMNS), key, 0, b"", tombstones=tombstones)
+    header_line = data[:nl + 1]
+    journal = _parse_csv_bytes(header_line, data[nl + 1:])
+    return DatasetSnapshot(journal, key, len(data), header_line, tombstones=tombstones)
+
+def _extend_snapshot(snap: DatasetSnapshot, path: str, key, tombstones: Tombstones = None) -> DatasetSnapshot:
+    tail = _read_complete_lines(path, snap.offset)
+    if not tail:
+        return DatasetSnapshot(snap.journal, key, snap.offset, snap.header_line, snap._catalogs, tombstones)
+    new_rows = _parse_csv_bytes(snap.header_line, tail)
+    journal = pd.concat([snap.journal, new_rows], ignore_index=True) if not snap.journal.empty else new_rows
+    catalogs = None
+    if snap._catalogs is not None:
+        catalogs = _merge_catalogs(snap._catalogs, catalogs_from_frame(new_rows))
+    return DatasetSnapshot(journal, key, snap.offset + len(tail), snap.header_line, catalogs, tombstones)
+
+def _can_tail_read(snap: DatasetSnapshot, path: str, key) -> bool:
+    # Same inode, file only grew, and the header we parsed against is unchanged
+    if not snap.header_line or key[0] != snap.key[0] or key[1] < snap.offset:
+        return False
+    with open(path, "rb") as f:
+        return f.read(len(snap.header_line)) == snap.header_line
+
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+def get_snapshot(data_path: str = DATA_FILE) -> DatasetSnapshot:
+    """
+    Process-wide cached view of the dataset. Reuses the parsed journal while
+    the file identity (inode, size, mtime) is unchanged and tail-reads only
+    newly appended rows when the journal has just grown. A delete or undo
+    only re-filters the journal already in memory.
+    """
+    if not os.path.exists(data_path):
+        return DatasetSnapshot(pd.DataFrame(columns=DATASET_COLUMNS), None, 0, b"")
+
+    tombstones = load_tombstones(data_path)
+    with _snapshots_lock:
+        key = _file_key(data_path)
+        snap = _snapshots.get(data_path)
+        if snap is not None and snap.key == key:
+            if snap.tombstones.key != tombstones.key:
+                snap = _snapshots[data_path] = snap.with_tombstones(tombstones)
+            return snap
+        if snap is not None and _can_tail_read(snap, data_path, key):
+            with timed("snapshot.tail_read"):
+                snap = _extend_snapshot(snap, data_path, key, tombstones)
+        else:
+            with timed("snapshot.full_read"):
+                snap = _full_snapshot(data_path, key, tombstones)
+        _snapshots[data_path] = snap
+        return snap
+
+
+# -----------------------------
+# Paginated queries
+# -----------------------------
+def risk_level_labels(scores) -> np.ndarray:
+    """Vectorized Low / Medium / High / Unknown band for each score."""
+    return band_labels(scores, short=True)
+
+def _top_k_order(key: np.ndarray, k: int) -> np.ndarray:
+    # Only the first k positions need ordering: partition, then sort that slice
+    if k < len(key):
+        part = np.argpartition(key, k - 1)[:k]
+        return part[np.argsort(key[part], kind="stable")]
+    return np.argsort(key, kind="stable")
+
+def query_users(df: pd.DataFrame, score_col: str = "alt_credit_score", bands=None,
+                employment_types=None, city_tiers=None, search: str = "",
+                sort: str = "score_desc", page: int = 1, page_size: int = 50, score_index=None):
+    """
+    Filters, sorts and slices df for one table page using vectorized masks.
+
+    sort is one of "score_desc", "score_asc", "newest", "oldest".
+    score_index (score_index.ScoreIndex over the same rows, keyed by df's row
+    labels) serves unfiltered score-sorted pages without sorting.
+    Returns (page frame with a risk_level column, number of matching rows).
+    """
+    n = len(df)
+    start = max(page - 1, 0) * page_size
+    unfiltered = not (bands or employment_types or city_tiers or search)
+    if (score_index is not None and unfiltered and sort in ("score_desc", "score_asc")
+            and score_index.total() == n):
+        labels = score_index.page(start, min(start + page_size, n), descending=(sort == "score_desc"))
+        page_df = df.loc[labels]
+        page_df = page_df.assign(risk_level=risk_level_labels(page_df[score_col].to_numpy()))
+        page_df.index = range(start + 1, start + 1 + len(page_df))
+        return page_df, n
+
+    scores = pd.to_numeric(df[score_col], errors="coerce").to_numpy(dtype=float) if n else np.empty(0)
+    levels = risk_level_labels(scores)
+
+    mask = np.ones(n, dtype=bool)
+    if bands:
+        mask &= np.isin(levels, list(bands))
+    if employment_types:
+        mask &= df["employment_type"].astype(str).isin(employment_types).to_numpy()
+    if city_tiers:
+        tiers = pd.to_numeric(df["city_tier"], errors="coerce")
+        mask &= tiers.isin(list(city_tiers)).to_numpy()
+    if search:
+        mask &= df["user_id"].astype(str).str.contains(search.strip(), case=False, regex=False).to_numpy()
+
+    rows = np.flatnonzero(mask)
+    total = len(rows)
+    end = min(start + page_size, total)
+    if start >= total:
+        return df.iloc[0:0].assign(risk_level=pd.Series(dtype=object)), total
+
+    if sort in ("score_desc", "score_asc"):
+        key = scores[rows] if sort == "score_asc" else -scores[rows]
+        key = np.where(np.isnan(key), np.inf, key)  # missing scores last
+        order = rows[_top_k_order(key, end)[start:end]]
+    elif sort == "newest":
+        order = rows[::-1][start:end]
+    else:
+        order = rows[start:end]
+
+    page_df = df.iloc[order].assign(risk_level=levels[order])
+    page_df.index = range(start + 1, start + 1 + len(page_df))
+    return page_df, total
+
+
+# -----------------------------
+# Single-writer queue
+# -----------------------------
+class RegistrationWriter:
+    """
+    Dedicated writer thread fed by a queue. Each flush drains everything that
+    is waiting (up to max_batch), assigns consecutive user IDs and appends all
+    records with one write under the file lock (group commit).
+    """
+
+    def __init__(self, data_path: str = DATA_FILE, counter_path: str = COUNTER_FILE, max_batch: int = 256):
+        self.data_path = data_path
+        self.counter_path = counter_path
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="registration-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, record: dict) -> Future:
+        """Queues a record (without user_id). The future resolves to the assigned user ID."""
+        fut = Future()
+        fut.queued_at = time.perf_counter()
+        self._queue.put((dict(record), fut))
+        return fut
+
+    def register(self, record: dict, timeout: float = 30.0) -> str:
+        return self.submit(record).result(timeout=timeout)
+
+    def close(self, timeout: float = None) -> None:
+        """Flushes everything already submitted, then stops the writer thread."""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._flush(batch)
+                    return
+                batch.append(item)
+            self._flush(batch)
+
+    def _flush(self, batch: list):
+        started = time.perf_counter()
+        for _, fut in batch:
+            observe("writer.queue_wait", started - fut.queued_at)
+        try:
+            t0 = time.perf_counter()
+            with FileLock(_lock_path_for(self.data_path)):
+                observe("writer.lock_wait", time.perf_counter() - t0)
+                with timed("writer.allocate_ids"):
+                    numbers = _allocate_user_numbers(len(batch), self.data_path, self.counter_path)
+                records = []
+                for (record, _), n in zip(batch, numbers):
+                    record["user_id"] = format_user_id(n)
+                    records.append(record)
+                summary_ok = _summary_in_sync(self.data_path)
+                with timed("writer.append"):
+                    append_records(records, self.data_path)
+                with timed("writer.summary"):
+                    if summary_ok:
+                        _update_summary_locked(self.data_path, added=[r.get("alt_credit_score") for r in records])
+                    else:
+                        rebuild_summary(self.data_path)
+                with timed("writer.user_index"):
+                    try:
+                        _sync_user_index(self.data_path)
+                    except (OSError, ValueError):
+                        # The records are stored; the next lookup catches the index up
+                        inc("user_index.errors")
+        except Exception as e:
+            inc("writer.errors")
+            for _, fut in batch:
+                fut.set_exception(e)
+            return
+        observe("writer.flush", time.perf_counter() - started)
+        inc("writer.flushes")
+        inc("registrations", len(batch))
+        for record, fut in batch:
+            fut.set_result(record["user_id"])
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_writer() -> RegistrationWriter:
+    """Process-wide RegistrationWriter shared by all Streamlit sessions."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = RegistrationWriter()
+        return _writer
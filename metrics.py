@@ -0,0 +1,174 @@
+"""
+In-process latency histograms and counters for the scoring and persistence paths.
+
+Code paths wrap their stages in `timed("stage")` (or call observe()), and
+count events with inc(). Each stage keeps count/sum/min/max and a bounded
+window of recent samples for p50/p95/p99, so memory stays fixed however long
+the process runs.
+
+Exports:
+- snapshot() / to_json() for the admin panel
+- to_prometheus() in the text exposition format; with ALTSCORE_METRICS_TEXTFILE
+  set, maybe_export() rewrites that file (node_exporter textfile collector) at
+  most every ALTSCORE_METRICS_EXPORT_SECONDS seconds
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+TEXTFILE_ENV = "ALTSCORE_METRICS_TEXTFILE"
+EXPORT_SECONDS_ENV = "ALTSCORE_METRICS_EXPORT_SECONDS"
+WINDOW_SIZE = 2048
+QUANTILES = (0.5, 0.95, 0.99)
+PREFIX = "altscore"
+
+
+class StageHistogram:
+    """Latency distribution of one stage. Quantiles cover the last WINDOW_SIZE samples."""
+
+    def __init__(self, window: int = WINDOW_SIZE):
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def quantiles(self) -> dict:
+        if not self.recent:
+            return {q: float("nan") for q in QUANTILES}
+        values = np.quantile(np.fromiter(self.recent, dtype=float), QUANTILES)
+        return dict(zip(QUANTILES, values.tolist()))
+
+    def to_dict(self) -> dict:
+        q = self.quantiles()
+        return {
+            "count": self.count,
+            "sum_s": self.total,
+            "mean_s": self.total / self.count if self.count else None,
+            "min_s": self.min if self.count else None,
+            "max_s": self.max if self.count else None,
+            "p50_s": q[0.5],
+            "p95_s": q[0.95],
+            "p99_s": q[0.99],
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._counters = {}
+        self._started = time.time()
+        self._last_export = float("-inf")
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            hist = self._stages.get(stage)
+            if hist is None:
+                hist = self._stages[stage] = StageHistogram()
+            hist.observe(seconds)
+
+    def inc(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    @contextmanager
+    def timed(self, stage: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - t0)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+            self._started = time.time()
+
+    # -------- export
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "since": self._started,
+                "stages": {name: h.to_dict() for name, h in sorted(self._stages.items())},
+                "counters": dict(sorted(self._counters.items())),
+            }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self) -> str:
+        snap = self.snapshot()
+        lines = [
+            f"# HELP {PREFIX}_stage_latency_seconds Latency of each scoring / persistence stage.",
+            f"# TYPE {PREFIX}_stage_latency_seconds summary",
+        ]
+        for stage, h in snap["stages"].items():
+            label = _label(stage)
+            for q in QUANTILES:
+                value = h[f"p{int(q * 100)}_s"]
+                lines.append(f'{PREFIX}_stage_latency_seconds{{stage="{label}",quantile="{q}"}} {_num(value)}')
+            lines.append(f'{PREFIX}_stage_latency_seconds_sum{{stage="{label}"}} {_num(h["sum_s"])}')
+            lines.append(f'{PREFIX}_stage_latency_seconds_count{{stage="{label}"}} {h["count"]}')
+        lines += [
+            f"# HELP {PREFIX}_events_total Event counters.",
+            f"# TYPE {PREFIX}_events_total counter",
+        ]
+        for name, value in snap["counters"].items():
+            lines.append(f'{PREFIX}_events_total{{event="{_label(name)}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str) -> None:
+        # Atomic replace, so the collector never reads a half-written file
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+    def maybe_export(self) -> None:
+        """Rewrites the ALTSCORE_METRICS_TEXTFILE, if set, when the export interval has passed."""
+        path = os.environ.get(TEXTFILE_ENV)
+        if not path:
+            return
+        interval = float(os.environ.get(EXPORT_SECONDS_ENV, 15))
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_export < interval:
+                return
+            self._last_export = now
+        try:
+            self.write_textfile(path)
+        except OSError:
+            # Metrics export must never fail a request
+            pass
+
+
+def _label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _num(value) -> str:
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return "NaN"
+    return repr(float(value))
+
+
+METRICS = Metrics()
+
+timed = METRICS.timed
+observe = METRICS.observe
+inc = METRICS.inc
+maybe_export = METRICS.maybe_export
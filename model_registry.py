@@ -0,0 +1,366 @@
+"""
+Process-wide registry of ONNX sessions shared by every page.
+
+Each model is loaded once per process. The first load writes the optimized
+graph to models_onnx/optimized/ (keyed on the model's content hash and the
+ONNX Runtime version), so later startups load it with graph optimization
+disabled. Every session runs one warm-up inference at boot so the first real
+registration does not pay for lazy initialization.
+
+ALTSCORE_MODEL_VARIANT selects which export of each set is loaded: "default"
+(the models as trained), "encoded" (integer-encoded categoricals, see
+build_encoded_onnx.py) or "quantized". A variant is only used when its
+parity report passed against the exact files of the set; otherwise the
+default models are loaded and stats() says why.
+
+Models can be rolled without a restart. Drop a complete artifact set into
+models_onnx/versions/<version>/ and create a READY file in it last. The
+watcher thread loads and warms the new set in the background, verifies it
+against a golden input set, then swaps it in atomically. Callers take one
+ModelSet per request via current(), so in-flight scoring keeps using the
+sessions it started with.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+import onnxruntime as ort
+import pandas as pd
+
+from onnx_utils import (
+    MODELS_ONNX_DIR, ENSEMBLE_MODEL_FILE, LR_CLASSES, PREDICTION_CACHE, PARITY_FILE, build_onnx_inputs_batch,
+    make_session_options, predict_all, load_vocab, CategoricalEncoder, EncodedSession,
+    FeatureVector, predict_features,
+)
+
+OPTIMIZED_DIR_NAME = "optimized"
+VERSIONS_DIR_NAME = "versions"
+READY_MARKER = "READY"
+GOLDEN_FILE = "golden.csv"
+BASE_VERSION_PREFIX = "base-"
+
+VARIANT_ENV = "ALTSCORE_MODEL_VARIANT"
+DEFAULT_VARIANT = "default"
+ENCODED_DIR_NAME = "encoded"
+QUANTIZED_DIR_NAME = "quantized"
+VARIANTS = (DEFAULT_VARIANT, ENCODED_DIR_NAME, QUANTIZED_DIR_NAME)
+
+POLL_SECONDS_ENV = "ALTSCORE_MODEL_POLL_SECONDS"
+GOLDEN_TOLERANCE = 1.0
+# predict_features and predict_all run the same sessions on the same values
+FAST_PATH_TOLERANCE = 1e-4
+
+MODEL_NAMES = {
+    "lr": "logistic_model.onnx",
+    "xgb": "xgb_model.onnx",
+    "rf": "rf_model.onnx",
+}
+
+# Registration form defaults, used for the boot-time warm-up run
+WARMUP_ROW = {
+    "employment_type": "salaried",
+    "income_range": "25000-80000",
+    "city_tier": 2,
+    "bank_account_age_months": 24,
+    "num_bank_accounts": 1,
+    "monthly_income": 30000.0,
+    "rent_paid_on_time": 1.0,
+    "utility_delay_days": 0.0,
+    "upi_txn_count": 20.0,
+    "avg_month_end_balance": 5000.0,
+    "overdraft_event": 0,
+}
+
+# Built-in golden inputs covering the main applicant profiles; a version dir
+# may add its own golden.csv (optionally with an expected final_score column)
+GOLDEN_ROWS = [
+    WARMUP_ROW,
+    {**WARMUP_ROW, "employment_type": "gig", "income_range": "10000-30000", "city_tier": 1,
+     "bank_account_age_months": 6, "monthly_income": 12000.0, "utility_delay_days": 12.0,
+     "upi_txn_count": 5.0, "avg_month_end_balance": 300.0, "overdraft_event": 1},
+    {**WARMUP_ROW, "employment_type": "self_employed", "income_range": "20000-100000", "city_tier": 3,
+     "bank_account_age_months": 120, "num_bank_accounts": 3, "monthly_income": 90000.0,
+     "upi_txn_count": 150.0, "avg_month_end_balance": 40000.0},
+]
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+def _natural_key(name: str):
+    return [int(t) if t.isdigit() else t for t in re.split(r"(\d+)", name)]
+
+
+class ModelSet:
+    """One immutable, fully loaded artifact set. Never mutated after a swap."""
+
+    def __init__(self, version: str, model_dir: str, lr, xgb, rf, ensemble, stats: dict):
+        self.version = version
+        self.model_dir = model_dir
+        self.lr = lr
+        self.xgb = xgb
+        self.rf = rf
+        self.ensemble = ensemble
+        self.stats = stats
+        self.loaded_at = time.time()
+
+    def sessions(self):
+        return self.lr, self.xgb, self.rf
+
+
+class ModelRegistry:
+    def __init__(self, models_dir: str = MODELS_ONNX_DIR, config: dict = None, warmup: bool = True,
+                 variant: str = None):
+        self.models_dir = models_dir
+        self.variant = (variant or os.environ.get(VARIANT_ENV, DEFAULT_VARIANT)).strip().lower()
+        self.cache_dir = os.path.join(models_dir, OPTIMIZED_DIR_NAME)
+        self.versions_dir = os.path.join(models_dir, VERSIONS_DIR_NAME)
+        self.config = config
+        self.warmup = warmup
+        self._current = None
+        self._rejected = {}        # version -> reason, so a bad set is not retried every poll
+        self._history = []
+        self._lock = threading.Lock()
+        self._watcher = None
+
+    # -------- loading
+    def _optimized_path(self, name: str, digest: str) -> str:
+        base = os.path.splitext(name)[0]
+        return os.path.join(self.cache_dir, f"{base}.{digest}.ort{ort.__version__}.onnx")
+
+    def _load_session(self, src: str, encoder: CategoricalEncoder = None):
+        name = os.path.basename(src)
+        digest = file_digest(src)
+        opt_path = self._optimized_path(name, digest)
+
+        so = make_session_options(self.config)
+        tmp_path = None
+        if os.path.exists(opt_path):
+            # Already optimized on a previous start: skip graph optimization entirely
+            so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+            path, cached = opt_path, True
+        else:
+            # EXTENDED (not ALL) keeps the saved graph portable across CPUs
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{opt_path}.{os.getpid()}.tmp"
+            so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+            so.optimized_model_filepath = tmp_path
+            path, cached = src, False
+
+        t0 = time.perf_counter()
+        sess = ort.InferenceSession(path, sess_options=so, providers=["CPUExecutionProvider"])
+        load_s = time.perf_counter() - t0
+        if tmp_path and os.path.exists(tmp_path):
+            os.replace(tmp_path, opt_path)
+        if encoder is not None:
+            sess = EncodedSession(sess, encoder)
+
+        warmup_s = None
+        if self.warmup:
+            t0 = time.perf_counter()
+            sess.run(None, build_onnx_inputs_batch(pd.DataFrame([WARMUP_ROW])))
+            warmup_s = time.perf_counter() - t0
+
+        return sess, {
+            "model": name,
+            "digest": digest,
+            "optimized_cache_hit": cached,
+            "load_s": load_s,
+            "warmup_s": warmup_s,
+        }
+
+    def _variant_dir(self, model_dir: str):
+        """(directory to load, encoder or None, reason the variant was not used or None)."""
+        if self.variant == DEFAULT_VARIANT:
+            return model_dir, None, None
+        if self.variant not in VARIANTS:
+            return model_dir, None, f"unknown variant {self.variant!r}"
+        variant_dir = os.path.join(model_dir, self.variant)
+        try:
+            with open(os.path.join(variant_dir, PARITY_FILE), "r", encoding="utf-8") as f:
+                report = json.load(f)
+            encoder = CategoricalEncoder(load_vocab(variant_dir))
+        except (OSError, ValueError) as e:
+            return model_dir, None, f"{self.variant} export not usable: {e}"
+        if not report.get("passed"):
+            return model_dir, None, f"{self.variant} export failed its parity check"
+        digests = {name: file_digest(os.path.join(model_dir, name)) for name in MODEL_NAMES.values()}
+        if report.get("source_digests") != digests:
+            return model_dir, None, f"{self.variant} export was built from different model files"
+        return variant_dir, encoder, None
+
+    def _load_set(self, version: str, model_dir: str) -> ModelSet:
+        load_dir, encoder, reason = self._variant_dir(model_dir)
+        sessions, stats = {}, {}
+        for key, name in MODEL_NAMES.items():
+            sessions[key], stats[key] = self._load_session(os.path.join(load_dir, name), encoder)
+        ensemble = None
+        ensemble_path = os.path.join(model_dir, ENSEMBLE_MODEL_FILE)
+        # The fused graph takes string inputs; encoded variants use the three numeric sessions
+        if encoder is None and os.path.exists(ensemble_path):
+            ensemble, stats["ensemble"] = self._load_session(ensemble_path)
+        stats["variant"] = {
+            "requested": self.variant,
+            "used": DEFAULT_VARIANT if load_dir == model_dir else self.variant,
+            "reason": reason,
+        }
+        return ModelSet(version, model_dir, sessions["lr"], sessions["xgb"], sessions["rf"], ensemble, stats)
+
+    def _base_version(self) -> str:
+        digests = [file_digest(os.path.join(self.models_dir, n)) for n in MODEL_NAMES.values()]
+        return BASE_VERSION_PREFIX + hashlib.sha256("".join(digests).encode()).hexdigest()[:12]
+
+    # -------- versions
+    def available_versions(self) -> list:
+        """Complete artifact sets under versions/, oldest first (natural name order)."""
+        if not os.path.isdir(self.versions_dir):
+            return []
+        ready = []
+        for entry in os.scandir(self.versions_dir):
+            if not entry.is_dir():
+                continue
+            files = set(os.listdir(entry.path))
+            if READY_MARKER in files and all(n in files for n in MODEL_NAMES.values()):
+                ready.append(entry.name)
+        return sorted(ready, key=_natural_key)
+
+    def resolve_version(self):
+        """(version, directory) that current() would load, without loading anything."""
+        versions = [v for v in self.available_versions() if v not in self._rejected]
+        if versions:
+            return versions[-1], os.path.join(self.versions_dir, versions[-1])
+        return self._base_version(), self.models_dir
+
+    def _initial_set(self) -> ModelSet:
+        models = self._load_set(*self.resolve_version())
+        self.verify(models)
+        return models
+
+    def verify(self, models: ModelSet) -> None:
+        """
+        Raises ValueError if the set fails the golden input checks, or if the
+        single-row fast path disagrees with predict_all on them.
+        """
+        golden = pd.DataFrame(GOLDEN_ROWS)
+        golden_path = os.path.join(models.model_dir, GOLDEN_FILE)
+        expected = None
+        if os.path.exists(golden_path):
+            golden = pd.read_csv(golden_path)
+            if "final_score" in golden.columns:
+                expected = golden.pop("final_score").to_numpy(dtype=float)
+
+        for i in range(len(golden)):
+            out = predict_all(golden.iloc[[i]], *models.sessions(), models.ensemble)
+            if out["lr_risk"] not in LR_CLASSES:
+                raise ValueError(f"golden row {i}: unexpected LR label {out['lr_risk']!r}")
+            for key in ("xgb_score", "rf_score", "final_score"):
+                if not np.isfinite(out[key]) or not 0 <= out[key] <= 100:
+                    raise ValueError(f"golden row {i}: {key}={out[key]} outside 0..100")
+            if expected is not None and abs(out["final_score"] - expected[i]) > GOLDEN_TOLERANCE:
+                raise ValueError(
+                    f"golden row {i}: final_score {out['final_score']:.2f} != expected {expected[i]:.2f}"
+                )
+            self._check_fast_path(models, golden.iloc[[i]], i)
+
+    def _check_fast_path(self, models: ModelSet, row: pd.DataFrame, i: int) -> None:
+        # Separate sessions on both paths, so parallel model execution and IO binding are exercised
+        ref = predict_all(row, *models.sessions())
+        fast = predict_features(FeatureVector.from_mapping(row.iloc[0]), *models.sessions())
+        if fast["lr_risk"] != ref["lr_risk"]:
+            raise ValueError(f"golden row {i}: predict_features LR label {fast['lr_risk']!r} != {ref['lr_risk']!r}")
+        for key in ("xgb_score", "rf_score", "final_score"):
+            if abs(fast[key] - ref[key]) > FAST_PATH_TOLERANCE:
+                raise ValueError(f"golden row {i}: predict_features {key}={fast[key]:.4f} != predict_all {ref[key]:.4f}")
+
+    # -------- access
+    def current(self) -> ModelSet:
+        """The active ModelSet. Take it once per request and use it throughout."""
+        models = self._current
+        if models is None:
+            with self._lock:
+                if self._current is None:
+                    self._current = self._initial_set()
+                    self._history.append({"version": self._current.version, "at": time.time(), "event": "loaded"})
+                models = self._current
+        return models
+
+    def sessions(self):
+        return self.current().sessions()
+
+    def ensemble(self):
+        return self.current().ensemble
+
+    def stats(self) -> dict:
+        """Per-model load and warm-up timings for the active set, plus swap history."""
+        models = self.current()
+        return {
+            "version": models.version,
+            "models": dict(models.stats),
+            "history": list(self._history),
+            "rejected": dict(self._rejected),
+        }
+
+    # -------- hot swap
+    def check_for_update(self) -> bool:
+        """
+        Loads, warms and verifies the newest ready version if it differs from the
+        active one, then swaps it in. Returns True when a swap happened.
+        """
+        active = self.current()
+        candidates = [v for v in self.available_versions() if v not in self._rejected]
+        if not candidates or candidates[-1] == active.version:
+            return False
+        version = candidates[-1]
+        try:
+            # Built entirely off to the side; requests keep using `active` meanwhile
+            models = self._load_set(version, os.path.join(self.versions_dir, version))
+            self.verify(models)
+        except Exception as e:
+            self._rejected[version] = str(e)
+            self._history.append({"version": version, "at": time.time(), "event": f"rejected: {e}"})
+            return False
+        with self._lock:
+            self._current = models   # single reference assignment: atomic for readers
+            self._history.append({"version": version, "at": time.time(), "event": "swapped"})
+        # Entries are keyed on the version already; clearing just frees the old set's memory
+        PREDICTION_CACHE.clear()
+        return True
+
+    def start_watcher(self, interval: float = None) -> None:
+        """Polls versions/ in a daemon thread. Safe to call more than once."""
+        if interval is None:
+            interval = float(os.environ.get(POLL_SECONDS_ENV, 10))
+        with self._lock:
+            if self._watcher is not None:
+                return
+            self._watcher = threading.Thread(target=self._watch, args=(interval,), name="model-watcher", daemon=True)
+            self._watcher.start()
+
+    def _watch(self, interval: float) -> None:
+        while True:
+            time.sleep(interval)
+            try:
+                self.check_for_update()
+            except Exception:
+                # A broken poll must never take the watcher down
+                pass
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_registry() -> ModelRegistry:
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry()
+            _registry.start_watcher()
+        return _registry
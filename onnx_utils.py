@@ -1,16 +1,146 @@
 import os
+import sys
+import json
+import time
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import pandas as pd
 import onnxruntime as ort
 
+from metrics import timed, inc
+from risk_bands import band_labels, risk_band
+
 MODELS_ONNX_DIR = "models_onnx"
 
-def load_onnx_sessions():
-    lr_sess  = ort.InferenceSession(os.path.join(MODELS_ONNX_DIR, "logistic_model.onnx"), providers=["CPUExecutionProvider"])
-    xgb_sess = ort.InferenceSession(os.path.join(MODELS_ONNX_DIR, "xgb_model.onnx"), providers=["CPUExecutionProvider"])
-    rf_sess  = ort.InferenceSession(os.path.join(MODELS_ONNX_DIR, "rf_model.onnx"), providers=["CPUExecutionProvider"])
+ENSEMBLE_MODEL_FILE = "ensemble_model.onnx"
+
+# Class order of the logistic regression classifier (confirmed)
+LR_CLASSES = ["High Risk", "Low Risk", "Medium Risk"]
+
+# Ensemble rule shared by predict_all and the fused ensemble graph
+LR_RISK_TO_SCORE = {"Low Risk": 85, "Medium Risk": 55, "High Risk": 25}
+ELIGIBILITY = {"Low Risk": "✅ ELIGIBLE", "Medium Risk": "⚠️ CONDITIONAL", "High Risk": "❌ RISKY"}
+
+CATEGORICAL_FEATURES = ["employment_type", "income_range"]
+INT_FEATURES = ["city_tier", "bank_account_age_months", "num_bank_accounts", "overdraft_event"]
+FLOAT_FEATURES = [
+    "monthly_income", "rent_paid_on_time", "utility_delay_days",
+    "upi_txn_count", "avg_month_end_balance",
+]
+
+# -----------------------------
+# ONNX Runtime threading config
+# -----------------------------
+# All values come from the environment so each host can be tuned to its core count:
+#   ALTSCORE_ORT_INTRA_OP_THREADS   threads per operator (0 = ORT default)
+#   ALTSCORE_ORT_INTER_OP_THREADS   threads across graph branches (0 = ORT default)
+#   ALTSCORE_ORT_EXECUTION_MODE     "sequential" | "parallel" graph execution inside a session
+#   ALTSCORE_ORT_GLOBAL_THREAD_POOL "1" to share one intra/inter pool across all sessions
+#   ALTSCORE_MODEL_EXECUTION        "sequential" | "parallel" LR/XGB/RF runs in predict_all / score_batch
+#   ALTSCORE_MODEL_WORKERS          size of the bounded pool used for parallel model runs
+#   ALTSCORE_ORT_PROFILING          "1" to enable ONNX Runtime's built-in profiler on new sessions
+#   ALTSCORE_ORT_PROFILE_DIR        where profiler JSON files go (default: profiles)
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+def load_ort_config() -> dict:
+    return {
+        "intra_op_threads": _env_int("ALTSCORE_ORT_INTRA_OP_THREADS", 0),
+        "inter_op_threads": _env_int("ALTSCORE_ORT_INTER_OP_THREADS", 0),
+        "execution_mode": os.environ.get("ALTSCORE_ORT_EXECUTION_MODE", "sequential").strip().lower(),
+        "global_thread_pool": os.environ.get("ALTSCORE_ORT_GLOBAL_THREAD_POOL", "0").strip() in ("1", "true", "yes"),
+        "model_execution": os.environ.get("ALTSCORE_MODEL_EXECUTION", "sequential").strip().lower(),
+        "model_workers": max(1, _env_int("ALTSCORE_MODEL_WORKERS", 3)),
+        "profiling": os.environ.get("ALTSCORE_ORT_PROFILING", "0").strip() in ("1", "true", "yes"),
+        "profile_dir": os.environ.get("ALTSCORE_ORT_PROFILE_DIR", "profiles"),
+    }
+
+ORT_CONFIG = load_ort_config()
+
+_global_pool_configured = False
+_model_pool = None
+_model_pool_lock = threading.Lock()
+
+def make_session_options(config: dict = None) -> ort.SessionOptions:
+    global _global_pool_configured
+    config = config or ORT_CONFIG
+    so = ort.SessionOptions()
+    if config["global_thread_pool"]:
+        # The global pools must be sized before the first session creates the ORT environment
+        if not _global_pool_configured:
+            ort.set_global_thread_pool_sizes(config["intra_op_threads"], config["inter_op_threads"])
+            _global_pool_configured = True
+        so.use_per_session_threads = False
+    else:
+        so.intra_op_num_threads = config["intra_op_threads"]
+        so.inter_op_num_threads = config["inter_op_threads"]
+    so.execution_mode = (
+        ort.ExecutionMode.ORT_PARALLEL if config["execution_mode"] == "parallel"
+        else ort.ExecutionMode.ORT_SEQUENTIAL
+    )
+    if config.get("profiling"):
+        os.makedirs(config["profile_dir"], exist_ok=True)
+        so.enable_profiling = True
+        so.profile_file_prefix = os.path.join(config["profile_dir"], "ort")
+    return so
+
+def end_profiling(sessions) -> list:
+    """
+    Stops the ORT profiler on each session and returns the JSON trace files
+    written (viewable in chrome://tracing). Sessions without profiling are skipped.
+    """
+    files = []
+    for sess in sessions:
+        if sess is not None and sess.get_session_options().enable_profiling:
+            path = sess.end_profiling()
+            if path:
+                files.append(path)
+    return files
+
+def _new_session(path: str, config: dict = None) -> ort.InferenceSession:
+    return ort.InferenceSession(path, sess_options=make_session_options(config), providers=["CPUExecutionProvider"])
+
+def _get_model_pool() -> ThreadPoolExecutor:
+    global _model_pool
+    with _model_pool_lock:
+        if _model_pool is None:
+            _model_pool = ThreadPoolExecutor(max_workers=ORT_CONFIG["model_workers"], thread_name_prefix="onnx-model")
+        return _model_pool
+
+def _run_models(calls: list, model_execution: str = None) -> list:
+    """
+    Runs zero-arg model calls. In parallel model execution they share one
+    bounded, process-wide pool (sess.run releases the GIL), otherwise they
+    run one after another. model_execution overrides ORT_CONFIG for this call.
+    """
+    if (model_execution or ORT_CONFIG["model_execution"]) != "parallel" or len(calls) < 2:
+        return [call() for call in calls]
+    futures = [_get_model_pool().submit(call) for call in calls]
+    return [f.result() for f in futures]
+
+def load_onnx_sessions(config: dict = None):
+    lr_sess  = _new_session(os.path.join(MODELS_ONNX_DIR, "logistic_model.onnx"), config)
+    xgb_sess = _new_session(os.path.join(MODELS_ONNX_DIR, "xgb_model.onnx"), config)
+    rf_sess  = _new_session(os.path.join(MODELS_ONNX_DIR, "rf_model.onnx"), config)
     return lr_sess, xgb_sess, rf_sess
 
+def load_ensemble_session(config: dict = None):
+    """
+    Fused LR/XGB/RF + ensemble rule model built by build_ensemble_onnx.py.
+    Returns None when it has not been built, so callers fall back to the
+    three separate sessions.
+    """
+    path = os.path.join(MODELS_ONNX_DIR, ENSEMBLE_MODEL_FILE)
+    if not os.path.exists(path):
+        return None
+    return _new_session(path, config)
+
 def _as_col(x, dtype):
     return np.array([[x]], dtype=dtype)
 
@@ -49,27 +179,22 @@ def onnx_predict_classifier_label_and_proba(sess, input_df: pd.DataFrame):
     """
     inputs = build_onnx_inputs(input_df)
     outputs = sess.run(None, inputs)
+    return _classifier_from_outputs(outputs)
 
+def _classifier_from_outputs(outputs):
     # ----- LABEL -----
-    label = outputs[0]
-    label = label.ravel()[0]
-    if isinstance(label, (bytes, bytearray)):
-        label = label.decode("utf-8")
+    label = _lr_labels_from_output(outputs[0])[0]
 
     # ----- PROBABILITIES -----
     probs = {}
     if len(outputs) > 1:
-        proba = np.array(outputs[1])
+        # ZipMap output (list of dicts) or a (1,3) / (1,1,3) tensor
+        proba = _probs_from_output(outputs[1], 1).reshape(-1)
 
-        # Flatten safely (works for (1,3), (1,1,3), etc.)
-        proba = proba.reshape(-1)
-
-        classes = ["High Risk", "Low Risk", "Medium Risk"]
-
-        if len(proba) == len(classes):
+        if len(proba) == len(LR_CLASSES):
             probs = {
-                classes[i]: float(proba[i])
-                for i in range(len(classes))
+                LR_CLASSES[i]: float(proba[i])
+                for i in range(len(LR_CLASSES))
             }
 
     return str(label), probs
@@ -83,7 +208,9 @@ def onnx_predict_regressor(sess, input_df):
     """
     inputs = build_onnx_inputs(input_df)
     outputs = sess.run(None, inputs)
+    return _regressor_from_outputs(outputs)
 
+def _regressor_from_outputs(outputs) -> float:
     # Find first numeric output and return scalar float
     for out in outputs:
         arr = np.array(out)
@@ -94,3 +221,590 @@ def onnx_predict_regressor(sess, input_df):
     debug = [(np.array(o).dtype, np.array(o).shape, np.array(o)[:5]) for o in outputs]
     raise TypeError(f"Regressor ONNX produced no numeric output. Outputs summary: {debug}")
 
+
+# -----------------------------
+# Batched scoring (N rows -> one sess.run per model)
+# -----------------------------
+def build_onnx_inputs_batch(input_df: pd.DataFrame) -> dict:
+    """
+    Column-wise version of build_onnx_inputs: every feature becomes one
+    (N, 1) tensor built in a single pass over the column.
+    """
+    n = len(input_df)
+    inputs = {}
+    for col in CATEGORICAL_FEATURES:
+        values = input_df[col].astype(str).str.strip().str.lower()
+        inputs[col] = values.to_numpy(dtype=object).reshape(n, 1)
+    for col in INT_FEATURES:
+        inputs[col] = input_df[col].to_numpy(dtype=np.int64).reshape(n, 1)
+    for col in FLOAT_FEATURES:
+        inputs[col] = input_df[col].to_numpy(dtype=np.float32).reshape(n, 1)
+    return inputs
+
+def _labels_from_output(out) -> np.ndarray:
+    labels = np.asarray(out).reshape(-1)
+    return np.array(
+        [x.decode("utf-8") if isinstance(x, (bytes, bytearray)) else str(x) for x in labels],
+        dtype=object,
+    )
+
+def _lr_labels_from_output(out) -> np.ndarray:
+    # Encoded model variants emit the class index instead of the class name
+    arr = np.asarray(out).reshape(-1)
+    if arr.dtype.kind in ("i", "u"):
+        return np.asarray(LR_CLASSES, dtype=object)[arr]
+    return _labels_from_output(arr)
+
+def _probs_from_output(out, n: int) -> np.ndarray:
+    """
+    Returns an (N, 3) float32 array in LR_CLASSES order.
+    Handles both ZipMap output (list of dicts) and plain tensors.
+    """
+    if isinstance(out, list) and (not out or isinstance(out[0], dict)):
+        return np.array(
+            [[float(d.get(c, 0.0)) for c in LR_CLASSES] for d in out],
+            dtype=np.float32,
+        ).reshape(n, len(LR_CLASSES))
+    return np.asarray(out, dtype=np.float32).reshape(n, -1)
+
+def _regression_from_outputs(outputs, n: int) -> np.ndarray:
+    for out in outputs:
+        arr = np.asarray(out)
+        if arr.dtype.kind in ("f", "i"):
+            return arr.astype(np.float64).reshape(n, -1)[:, 0]
+    debug = [(np.asarray(o).dtype, np.asarray(o).shape) for o in outputs]
+    raise TypeError(f"Regressor ONNX produced no numeric output. Outputs summary: {debug}")
+
+def score_batch(input_df: pd.DataFrame, lr_sess, xgb_sess, rf_sess, model_execution: str = None) -> dict:
+    """
+    Scores every row of input_df with one sess.run per model.
+
+    Returns per-row arrays:
+    - lr_risk:   (N,) labels from the logistic regression classifier
+    - lr_probs:  (N, 3) probabilities, columns in LR_CLASSES order
+    - xgb_score: (N,) raw XGBoost regression output
+    - rf_score:  (N,) raw Random Forest regression output
+
+    model_execution ("sequential" | "parallel") overrides ORT_CONFIG.
+    """
+    return score_inputs(build_onnx_inputs_batch(input_df), len(input_df), lr_sess, xgb_sess, rf_sess,
+                        model_execution)
+
+def score_inputs(inputs: dict, n: int, lr_sess, xgb_sess, rf_sess, model_execution: str = None) -> dict:
+    """score_batch for tensors already built by build_onnx_inputs_batch."""
+    if n == 0:
+        return {
+            "lr_risk": np.empty(0, dtype=object),
+            "lr_probs": np.empty((0, len(LR_CLASSES)), dtype=np.float32),
+            "xgb_score": np.empty(0, dtype=np.float64),
+            "rf_score": np.empty(0, dtype=np.float64),
+        }
+
+    lr_out, xgb_out, rf_out = _run_models([
+        lambda: lr_sess.run(None, inputs),
+        lambda: xgb_sess.run(None, inputs),
+        lambda: rf_sess.run(None, inputs),
+    ], model_execution)
+    lr_risk = _lr_labels_from_output(lr_out[0])
+    lr_probs = (
+        _probs_from_output(lr_out[1], n) if len(lr_out) > 1
+        else np.full((n, len(LR_CLASSES)), np.nan, dtype=np.float32)
+    )
+
+    return {
+        "lr_risk": lr_risk,
+        "lr_probs": lr_probs,
+        "xgb_score": _regression_from_outputs(xgb_out, n),
+        "rf_score": _regression_from_outputs(rf_out, n),
+    }
+
+# -----------------------------
+# Ensemble rule
+# -----------------------------
+def apply_ensemble_rule(scores: dict) -> dict:
+    """
+    Vectorized predict_all rule over score_batch output. Adds lr_score,
+    clipped xgb/rf scores, final_score, risk_level and eligibility arrays.
+    """
+    lr_risk = np.asarray(scores["lr_risk"], dtype=object)
+    xgb = np.clip(np.asarray(scores["xgb_score"], dtype=np.float64), 0, 100)
+    rf = np.clip(np.asarray(scores["rf_score"], dtype=np.float64), 0, 100)
+
+    lr_score = np.array([LR_RISK_TO_SCORE.get(r, 50) for r in lr_risk], dtype=np.int64)
+    # np.round is round-half-to-even, same as Python's round() in predict_all
+    final = np.where(
+        lr_risk == "High Risk", np.minimum(xgb, rf),
+        np.where(lr_risk == "Low Risk", np.maximum(xgb, rf), np.round((xgb + rf) / 2)),
+    )
+    risk_level = band_labels(final)
+
+    return {
+        **scores,
+        "lr_score": lr_score,
+        "xgb_score": xgb,
+        "rf_score": rf,
+        "final_score": final,
+        "risk_level": risk_level,
+        "eligibility": np.array([ELIGIBILITY[r] for r in risk_level], dtype=object),
+    }
+
+def onnx_predict_ensemble(sess, input_df: pd.DataFrame) -> dict:
+    """
+    Runs the fused ensemble model once for every row of input_df.
+    Returns per-row arrays for final_score, risk_level, lr_risk, lr_probs,
+    lr_score, xgb_score and rf_score.
+    """
+    return ensemble_from_inputs(sess, build_onnx_inputs_batch(input_df), len(input_df))
+
+def ensemble_from_inputs(sess, inputs: dict, n: int) -> dict:
+    """onnx_predict_ensemble for tensors already built by build_onnx_inputs_batch."""
+    return _parse_ensemble_outputs(sess, sess.run(None, inputs), n)
+
+def _parse_ensemble_outputs(sess, outputs, n: int) -> dict:
+    out = dict(zip([o.name for o in sess.get_outputs()], outputs))
+    return {
+        "final_score": np.asarray(out["final_score"], dtype=np.float64).reshape(n),
+        "risk_level": _labels_from_output(out["risk_level"]),
+        "lr_risk": _labels_from_output(out["lr_risk"]),
+        "lr_probs": np.asarray(out["lr_probs"], dtype=np.float32).reshape(n, len(LR_CLASSES)),
+        "lr_score": np.asarray(out["lr_score"]).reshape(n).astype(np.int64),
+        "xgb_score": np.asarray(out["xgb_score"], dtype=np.float64).reshape(n),
+        "rf_score": np.asarray(out["rf_score"], dtype=np.float64).reshape(n),
+    }
+
+# -----------------------------
+# Prediction cache
+# -----------------------------
+# Identical feature vectors (form resubmits, duplicate batch rows) skip inference.
+#   ALTSCORE_PREDICTION_CACHE_SIZE  max entries (0 disables the cache)
+#   ALTSCORE_PREDICTION_CACHE_TTL   seconds an entry stays valid (0 = no expiry)
+FEATURE_ORDER = CATEGORICAL_FEATURES + INT_FEATURES + FLOAT_FEATURES
+
+def feature_key(row) -> tuple:
+    """
+    Canonical 11-feature tuple, normalized exactly as build_onnx_inputs feeds
+    the models (lower-cased categoricals, int64, float32), so inputs that
+    score identically share a key.
+    """
+    return (
+        *(str(row[c]).strip().lower() for c in CATEGORICAL_FEATURES),
+        *(int(row[c]) for c in INT_FEATURES),
+        *(np.float32(row[c]).item() for c in FLOAT_FEATURES),
+    )
+
+def _approx_size(obj) -> int:
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(_approx_size(k) + _approx_size(v) for k, v in obj.items())
+    if isinstance(obj, (tuple, list)):
+        return sys.getsizeof(obj) + sum(_approx_size(v) for v in obj)
+    return sys.getsizeof(obj)
+
+
+class PredictionCache:
+    """Thread-safe LRU + TTL map of (model version, feature key) -> predict_all result."""
+
+    def __init__(self, max_entries: int = 4096, ttl_seconds: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()   # key -> (expires_at, result, approx bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            expires_at, result, size = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self._entries[key]
+                self._bytes -= size
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+        return _copy_result(result)
+
+    def put(self, key, result: dict) -> None:
+        if not self.enabled:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds > 0 else None
+        size = _approx_size(key) + _approx_size(result)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (expires_at, _copy_result(result), size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self._stats["evictions"] += 1
+
+    def clear(self) -> None:
+        """Drops every entry, e.g. after the model set is reloaded."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._stats["invalidations"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hit_rate": self._stats["hits"] / lookups if lookups else None,
+                "approx_bytes": self._bytes,
+            }
+
+def _copy_result(result: dict) -> dict:
+    # Callers may mutate what they get back; lr_probs is the only nested value
+    out = dict(result)
+    if isinstance(out.get("lr_probs"), dict):
+        out["lr_probs"] = dict(out["lr_probs"])
+    return out
+
+PREDICTION_CACHE = PredictionCache(
+    max_entries=max(0, _env_int("ALTSCORE_PREDICTION_CACHE_SIZE", 4096)),
+    ttl_seconds=float(os.environ.get("ALTSCORE_PREDICTION_CACHE_TTL", 3600)),
+)
+
+def dedupe_inputs(inputs: dict, n: int):
+    """
+    Collapses duplicate rows of build_onnx_inputs_batch tensors. Returns
+    (tensors for the distinct rows, inverse index of length n) so batch callers
+    score each distinct feature vector once and scatter results back with
+    `values[inverse]`.
+    """
+    frame = pd.DataFrame({name: np.asarray(col).reshape(n) for name, col in inputs.items()})
+    inverse = frame.groupby(list(frame.columns), sort=False, dropna=False).ngroup().to_numpy()
+    _, first = np.unique(inverse, return_index=True)
+    unique = {name: col[first] for name, col in inputs.items()}
+    return unique, inverse
+
+
+def _timed_run(stage: str, sess, inputs: dict):
+    with timed(stage):
+        return sess.run(None, inputs)
+
+def predict_all(input_df, lr_sess, xgb_sess, rf_sess, ensemble_sess=None, model_version: str = None):
+    """
+    Scores the first row of input_df. Uses the fused ensemble model (one
+    sess.run) when available, otherwise the three separate sessions.
+    Each stage is recorded in metrics under "predict.*".
+
+    With model_version given, results are served from / stored in
+    PREDICTION_CACHE under (model_version, feature_key(row)).
+    """
+    inc("predictions")
+    with timed("predict.total"):
+        key = None
+        if model_version is not None and PREDICTION_CACHE.enabled:
+            key = (model_version, feature_key(input_df.iloc[0]))
+            cached = PREDICTION_CACHE.get(key)
+            if cached is not None:
+                inc("predictions.cache_hit")
+                return cached
+        out = _predict_all(input_df, lr_sess, xgb_sess, rf_sess, ensemble_sess)
+        if key is not None:
+            PREDICTION_CACHE.put(key, out)
+        return out
+
+def _predict_all(input_df, lr_sess, xgb_sess, rf_sess, ensemble_sess):
+    # One single-row input build, shared by the fused model or all three models
+    with timed("predict.build_inputs"):
+        inputs = build_onnx_inputs(input_df)
+    if ensemble_sess is not None:
+        with timed("predict.ensemble_run"):
+            out = ensemble_from_inputs(ensemble_sess, inputs, 1)
+        return _ensemble_row_result(out)
+
+    lr_out, xgb_out, rf_out = _run_models([
+        lambda: _timed_run("predict.lr_run", lr_sess, inputs),
+        lambda: _timed_run("predict.xgb_run", xgb_sess, inputs),
+        lambda: _timed_run("predict.rf_run", rf_sess, inputs),
+    ])
+    with timed("predict.ensemble_rule"):
+        return _combine_model_outputs(lr_out, xgb_out, rf_out)
+
+def _ensemble_row_result(out: dict) -> dict:
+    """predict_all result for row 0 of fused-ensemble output."""
+    probs = out["lr_probs"][0]
+    final_score = float(out["final_score"][0])
+    risk_level = str(out["risk_level"][0])
+    return {
+        "lr_risk": str(out["lr_risk"][0]),
+        "lr_probs": {LR_CLASSES[i]: float(probs[i]) for i in range(len(LR_CLASSES))},
+        "lr_score": int(out["lr_score"][0]),
+        "xgb_score": float(out["xgb_score"][0]),
+        "rf_score": float(out["rf_score"][0]),
+        "final_score": final_score,
+        "eligibility": ELIGIBILITY[risk_level],
+        "risk_level": risk_level,
+    }
+
+def _combine_model_outputs(lr_out, xgb_out, rf_out) -> dict:
+    """predict_all result from raw single-row LR / XGB / RF session outputs."""
+    lr_risk, lr_probs = _classifier_from_outputs(lr_out)
+    xgb_raw = _regressor_from_outputs(xgb_out)
+    rf_raw = _regressor_from_outputs(rf_out)
+
+    # Convert risk -> score (your rule)
+    lr_score = int(LR_RISK_TO_SCORE.get(lr_risk, 50))
+
+    xgb_score = float(np.clip(xgb_raw, 0, 100))
+    rf_score  = float(np.clip(rf_raw, 0, 100))
+
+    if lr_risk == "High Risk":
+        final_score = min(xgb_score, rf_score)
+    elif lr_risk == "Low Risk":
+        final_score = max(xgb_score, rf_score)
+    else:
+        final_score = round((xgb_score + rf_score) / 2)
+
+    risk_level = risk_band(final_score)
+
+    return {
+        "lr_risk": lr_risk,
+        "lr_probs": lr_probs,
+        "lr_score": lr_score,
+        "xgb_score": xgb_score,
+        "rf_score": rf_score,
+        "final_score": final_score,
+        "eligibility": ELIGIBILITY[risk_level],
+        "risk_level": risk_level,
+    }
+
+
+# -----------------------------
+# Single-row fast path (no pandas)
+# -----------------------------
+class FeatureVector:
+    """
+    One applicant's 11 model features, normalized the way the models see
+    them: categoricals stripped and lower-cased, counts as int. Floats keep
+    their entered value (the CSV stores it as typed); key() rounds them to the
+    float32 the models actually receive.
+    """
+    __slots__ = tuple(FEATURE_ORDER)
+
+    def __init__(self, employment_type, income_range, city_tier, bank_account_age_months,
+                 num_bank_accounts, overdraft_event, monthly_income, rent_paid_on_time,
+                 utility_delay_days, upi_txn_count, avg_month_end_balance):
+        self.employment_type = str(employment_type).strip().lower()
+        self.income_range = str(income_range).strip().lower()
+        self.city_tier = int(city_tier)
+        self.bank_account_age_months = int(bank_account_age_months)
+        self.num_bank_accounts = int(num_bank_accounts)
+        self.overdraft_event = int(overdraft_event)
+        self.monthly_income = float(monthly_income)
+        self.rent_paid_on_time = float(rent_paid_on_time)
+        self.utility_delay_days = float(utility_delay_days)
+        self.upi_txn_count = float(upi_txn_count)
+        self.avg_month_end_balance = float(avg_month_end_balance)
+
+    @classmethod
+    def from_mapping(cls, row) -> "FeatureVector":
+        """From a dict, a pandas row or any mapping holding the 11 feature names."""
+        return cls(**{c: row[c] for c in FEATURE_ORDER})
+
+    def key(self) -> tuple:
+        """Same tuple as feature_key() for the equivalent row."""
+        return (
+            self.employment_type, self.income_range,
+            self.city_tier, self.bank_account_age_months, self.num_bank_accounts, self.overdraft_event,
+            *(np.float32(getattr(self, c)).item() for c in FLOAT_FEATURES),
+        )
+
+    def to_dict(self) -> dict:
+        return {c: getattr(self, c) for c in FEATURE_ORDER}
+
+    def __repr__(self):
+        return f"FeatureVector({self.to_dict()!r})"
+
+
+class _RowBuffers(threading.local):
+    """Per-thread (1, 1) input tensors, refilled in place for every request."""
+
+    def __init__(self):
+        self.feeds = {}
+        for c in CATEGORICAL_FEATURES:
+            self.feeds[c] = np.empty((1, 1), dtype=object)
+        for c in INT_FEATURES:
+            self.feeds[c] = np.zeros((1, 1), dtype=np.int64)
+        for c in FLOAT_FEATURES:
+            self.feeds[c] = np.zeros((1, 1), dtype=np.float32)
+        # session -> (IOBinding or None if not bindable, the (name, array) pairs it is bound to)
+        self.bindings = weakref.WeakKeyDictionary()
+        # Integer-ID twins of the categorical buffers, used by encoded model variants
+        self.category_ids = {c: np.full((1, 1), -1, dtype=np.int64) for c in CATEGORICAL_FEATURES}
+
+_row_buffers = _RowBuffers()
+
+def fill_row_buffers(fv: FeatureVector) -> dict:
+    """Writes fv into this thread's preallocated input tensors and returns the feed dict."""
+    feeds = _row_buffers.feeds
+    for c in FEATURE_ORDER:
+        feeds[c][0, 0] = getattr(fv, c)
+    return feeds
+
+def _bindable(sess) -> bool:
+    # The Python IO binding API only handles non-string tensors, in both directions
+    args = list(sess.get_inputs()) + list(sess.get_outputs())
+    return all(a.type.startswith("tensor(") and a.type != "tensor(string)" for a in args)
+
+def run_bound(sess, feeds: dict):
+    """
+    sess.run on the caller's row buffers. Sessions whose inputs and outputs
+    are all numeric tensors use an IO binding cached per thread and bound to
+    the buffers themselves, so refilling them is enough; if feeds are
+    different arrays the binding is rebuilt. Others (string tensors, ZipMap
+    outputs) fall back to sess.run.
+    """
+    if isinstance(sess, EncodedSession):
+        feeds = sess.encode_row(feeds)
+        sess = sess.session
+    bindings = _row_buffers.bindings
+    entry = bindings.get(sess)
+    # A binding is only reused for the very arrays it was bound to
+    if entry is None or (entry[0] is not None and any(feeds[name] is not arr for name, arr in entry[1])):
+        binding, bound = None, ()
+        if _bindable(sess):
+            binding = sess.io_binding()
+            bound = tuple((i.name, feeds[i.name]) for i in sess.get_inputs())
+            for name, arr in bound:
+                binding.bind_cpu_input(name, arr)
+            for o in sess.get_outputs():
+                binding.bind_output(o.name, "cpu")
+        entry = bindings[sess] = (binding, bound)
+    binding = entry[0]
+    if binding is None:
+        return sess.run(None, feeds)
+    sess.run_with_iobinding(binding)
+    return binding.copy_outputs_to_cpu()
+
+def _timed_bound_run(stage: str, sess, feeds: dict):
+    with timed(stage):
+        return run_bound(sess, feeds)
+
+def predict_features(fv: FeatureVector, lr_sess, xgb_sess, rf_sess, ensemble_sess=None,
+                     model_version: str = None) -> dict:
+    """
+    predict_all for a FeatureVector, without pandas: the features go straight
+    into reusable per-thread input buffers. Same result dict and cache
+    behaviour as predict_all.
+    """
+    inc("predictions")
+    with timed("predict.total"):
+        key = None
+        if model_version is not None and PREDICTION_CACHE.enabled:
+            key = (model_version, fv.key())
+            cached = PREDICTION_CACHE.get(key)
+            if cached is not None:
+                inc("predictions.cache_hit")
+                return cached
+
+        with timed("predict.build_inputs"):
+            feeds = fill_row_buffers(fv)
+        if ensemble_sess is not None:
+            with timed("predict.ensemble_run"):
+                out = _ensemble_row_result(_parse_ensemble_outputs(ensemble_sess, run_bound(ensemble_sess, feeds), 1))
+        else:
+            # Bound single-row runs take microseconds: they stay on the thread that
+            # owns the buffers instead of hopping to the model pool
+            lr_out = _timed_bound_run("predict.lr_run", lr_sess, feeds)
+            xgb_out = _timed_bound_run("predict.xgb_run", xgb_sess, feeds)
+            rf_out = _timed_bound_run("predict.rf_run", rf_sess, feeds)
+            with timed("predict.ensemble_rule"):
+                out = _combine_model_outputs(lr_out, xgb_out, rf_out)
+
+        if key is not None:
+            PREDICTION_CACHE.put(key, out)
+        return out
+
+
+# -----------------------------
+# Integer-encoded model variant
+# -----------------------------
+# build_encoded_onnx.py exports a copy of the model set whose categorical inputs
+# are int64 IDs into a fixed vocabulary (vocab.json, shipped with the models)
+# and whose outputs are all numeric tensors. No string tensors cross the ORT
+# boundary, and every session can use IO binding.
+ENCODED_VOCAB_FILE = "vocab.json"
+PARITY_FILE = "parity.json"
+UNKNOWN_CATEGORY = -1   # matches no one-hot slot, same as an unseen string in the original models
+
+def load_vocab(model_dir: str) -> dict:
+    with open(os.path.join(model_dir, ENCODED_VOCAB_FILE), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class CategoricalEncoder:
+    """Maps normalized category strings to their vocabulary IDs."""
+
+    def __init__(self, vocab: dict):
+        self.vocab = {col: list(values) for col, values in vocab.items()}
+        self._lookup = {col: {v: i for i, v in enumerate(values)} for col, values in self.vocab.items()}
+        self._index = {col: pd.Index(values) for col, values in self.vocab.items()}
+
+    @property
+    def columns(self) -> list:
+        return list(self.vocab)
+
+    def encode(self, col: str, values) -> np.ndarray:
+        """(N, 1) string tensor -> (N, 1) int64 IDs, UNKNOWN_CATEGORY for unseen values."""
+        arr = np.asarray(values, dtype=object)
+        return self._index[col].get_indexer(arr.reshape(-1)).astype(np.int64).reshape(arr.shape)
+
+    def encode_one(self, col: str, value) -> int:
+        return self._lookup[col].get(value, UNKNOWN_CATEGORY)
+
+
+class EncodedSession:
+    """
+    Wraps an encoded-variant InferenceSession so callers keep passing the
+    usual string feeds (build_onnx_inputs / build_onnx_inputs_batch).
+    """
+
+    def __init__(self, session, encoder: CategoricalEncoder):
+        self.session = session
+        self.encoder = encoder
+
+    def run(self, output_names, feeds: dict, run_options=None):
+        feeds = dict(feeds)
+        for col in self.encoder.columns:
+            if col in feeds:
+                feeds[col] = self.encoder.encode(col, feeds[col])
+        return self.session.run(output_names, feeds, run_options)
+
+    def encode_row(self, feeds: dict) -> dict:
+        """
+        Single-row fast path: the caller's feeds with each categorical
+        replaced by its ID, written into this thread's integer buffers.
+        """
+        ids = _row_buffers.category_ids
+        for col in self.encoder.columns:
+            ids[col][0, 0] = self.encoder.encode_one(col, feeds[col][0, 0])
+        return {**feeds, **ids}
+
+    def get_inputs(self):
+        return self.session.get_inputs()
+
+    def get_outputs(self):
+        return self.session.get_outputs()
+
+    def get_session_options(self):
+        return self.session.get_session_options()
+
+    def end_profiling(self):
+        return self.session.end_profiling()
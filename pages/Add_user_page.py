@@ -1,102 +1,33 @@
-import os
-import re
+import time
+from datetime import datetime, timezone
 import numpy as np
-import pandas as pd
 import streamlit as st
 
-from onnx_utils import load_onnx_sessions, onnx_predict_regressor, onnx_predict_classifier_label_and_proba
+from onnx_utils import FeatureVector, predict_features
+from preprocess import clean_record
+from model_registry import get_registry
+from metrics import timed, observe, inc, maybe_export
+from data_store import (
+    ensure_dataset_file, get_writer, get_snapshot,
+    DEFAULT_EMPLOYMENT_TYPES, DEFAULT_INCOME_RANGES, DEFAULT_CITY_TIERS,
+)
 
 st.set_page_config(page_title="Register User", layout="centered")
 
-DATA_FILE = "data/dataset.csv"
-
-REQUIRED_COLUMNS = [
-    "user_id", "employment_type", "income_range", "city_tier",
-    "bank_account_age_months", "num_bank_accounts", "monthly_income",
-    "rent_paid_on_time", "utility_delay_days", "upi_txn_count",
-    "avg_month_end_balance", "overdraft_event", "alt_credit_score"
-]
-
-@st.cache_resource
-def load_models():
-    return load_onnx_sessions()
-
-def ensure_dataset_file():
-    os.makedirs("data", exist_ok=True)
-    if not os.path.exists(DATA_FILE):
-        pd.DataFrame(columns=REQUIRED_COLUMNS).to_csv(DATA_FILE, index=False)
-
-def generate_user_id():
-    if os.path.exists(DATA_FILE):
-        try:
-            df = pd.read_csv(DATA_FILE)
-            if not df.empty and "user_id" in df.columns:
-                last_id = str(df.iloc[-1]["user_id"])
-                m = re.search(r"(\d+)$", last_id)
-                if m:
-                    n = int(m.group(1))
-                    return f"USER_{n+1:04d}"
-        except Exception:
-            pass
-    return "USER_0001"
-
 def get_dropdown_options_from_dataset():
-    if os.path.exists(DATA_FILE):
-        try:
-            df = pd.read_csv(DATA_FILE)
-            if not df.empty:
-                emp = sorted(df["employment_type"].dropna().unique().tolist())
-                inc = sorted(df["income_range"].dropna().unique().tolist())
-                tiers = sorted(list(set([int(x) for x in df["city_tier"].dropna().tolist()])))
-                if emp and inc and tiers:
-                    return emp, inc, tiers
-        except Exception:
-            pass
-    return (["gig", "salaried", "self_employed"], ["0-15000", "10000-30000", "30000-50000", "50000-100000"], [1,2,3])
-
-def predict_all(input_df, lr_sess, xgb_sess, rf_sess):
-    lr_risk, lr_probs = onnx_predict_classifier_label_and_proba(lr_sess, input_df)
-
-    # Convert risk -> score (your rule)
-    risk_to_score = {"Low Risk": 85, "Medium Risk": 55, "High Risk": 25}
-    lr_score = int(risk_to_score.get(lr_risk, 50))
-
-    xgb_score = float(np.clip(onnx_predict_regressor(xgb_sess, input_df), 0, 100))
-    rf_score  = float(np.clip(onnx_predict_regressor(rf_sess, input_df), 0, 100))
-
-    # final_score = int(round((lr_score + xgb_score + rf_score) / 3))
-    
-    if lr_risk == "High Risk":
-        final_score = min(xgb_score, rf_score)
-    elif lr_risk == "Low Risk":
-        final_score = max(xgb_score, rf_score)
-    else:
-        final_score = round((xgb_score + rf_score) / 2)
-        
-    if final_score >= 70:
-        eligibility = "✅ ELIGIBLE"
-        risk_level = "Low Risk"
-    elif final_score >= 40:
-        eligibility = "⚠️ CONDITIONAL"
-        risk_level = "Medium Risk"
-    else:
-        eligibility = "❌ RISKY"
-        risk_level = "High Risk"
-
-    return {
-        "lr_risk": lr_risk,
-        "lr_probs": lr_probs,
-        "lr_score": lr_score,
-        "xgb_score": xgb_score,
-        "rf_score": rf_score,
-        "final_score": final_score,
-        "eligibility": eligibility,
-        "risk_level": risk_level,
-    }
+    # Catalogs are derived once per dataset snapshot and shared across sessions
+    try:
+        with timed("register.load_options"):
+            return get_snapshot().dropdown_options()
+    except Exception:
+        return (DEFAULT_EMPLOYMENT_TYPES, DEFAULT_INCOME_RANGES, DEFAULT_CITY_TIERS)
 
 # -------- startup
 ensure_dataset_file()
-lr_sess, xgb_sess, rf_sess = load_models()
+# Sessions are loaded (optimized + warmed up) once per process and shared with every page.
+# Take one ModelSet per run so a hot swap never mixes model versions mid-request.
+registry = get_registry()
+models = registry.current()
 employment_options, income_options, city_tier_options = get_dropdown_options_from_dataset()
 
 with st.sidebar:
@@ -107,6 +38,8 @@ with st.sidebar:
     if st.button("📊 Dashboard", use_container_width=True):
         st.switch_page("pages/dashboard_page.py")
     st.write("---")
+    with st.expander("Model load stats"):
+        st.json(registry.stats())
 
 st.markdown("<h1>📝 User Registration</h1>", unsafe_allow_html=True)
 
@@ -207,26 +140,53 @@ with st.form("user_registration_form"):
 
 
 if submitted:
-    user_id = generate_user_id()
     if pays_rent == "No":
         rent_paid_on_time = 1.0
 
-    input_df = pd.DataFrame([{
-        "employment_type": str(employment_type).strip().lower(),
-        "income_range": str(income_range).strip().lower(),
-        "city_tier": int(city_tier),
-        "bank_account_age_months": int(bank_account_age_months),
-        "num_bank_accounts": int(num_bank_accounts),
-        "monthly_income": float(monthly_income),
-        "rent_paid_on_time": float(rent_paid_on_time),
-        "utility_delay_days": float(utility_delay_days),
-        "upi_txn_count": float(upi_txn_count),
-        "avg_month_end_balance": float(avg_month_end_balance),
-        "overdraft_event": 1 if overdraft_event == "Yes" else 0,
-    }])
+    # Same schema as bulk scoring; scoring goes to preallocated buffers without pandas
+    values, input_issues = clean_record(dict(
+        employment_type=employment_type,
+        income_range=income_range,
+        city_tier=city_tier,
+        bank_account_age_months=bank_account_age_months,
+        num_bank_accounts=num_bank_accounts,
+        overdraft_event=1 if overdraft_event == "Yes" else 0,
+        monthly_income=monthly_income,
+        rent_paid_on_time=rent_paid_on_time,
+        utility_delay_days=utility_delay_days,
+        upi_txn_count=upi_txn_count,
+        avg_month_end_balance=avg_month_end_balance,
+    ))
+    features = FeatureVector.from_mapping(values)
+    if input_issues:
+        inc("register.input_issues")
+        st.warning("Some inputs were adjusted or are not recognised by the models: " + ", ".join(
+            f"{col} ({'/'.join(names)})" for col, names in input_issues.items()
+        ))
 
     with st.spinner("Generating score..."):
-        out = predict_all(input_df, lr_sess, xgb_sess, rf_sess)
+        t_submit = time.perf_counter()
+        # Unchanged resubmits are served from the prediction cache
+        out = predict_features(features, *models.sessions(), models.ensemble, model_version=models.version)
+
+        new_entry = features.to_dict()
+        new_entry["alt_credit_score"] = out["final_score"]
+        new_entry["lr_risk"] = out["lr_risk"]
+        new_entry["lr_score"] = out["lr_score"]
+        new_entry["lr_prob_high"] = out["lr_probs"].get("High Risk", np.nan)
+        new_entry["lr_prob_low"] = out["lr_probs"].get("Low Risk", np.nan)
+        new_entry["lr_prob_medium"] = out["lr_probs"].get("Medium Risk", np.nan)
+        new_entry["xgb_score"] = round(out["xgb_score"], 2)
+        new_entry["rf_score"] = round(out["rf_score"], 2)
+        new_entry["model_version"] = models.version
+        new_entry["scored_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+        # The shared writer assigns the ID atomically and batches concurrent sessions
+        with timed("register.persist"):
+            user_id = get_writer().register(new_entry)
+        observe("register.total", time.perf_counter() - t_submit)
+        inc("register.submissions")
+        maybe_export()
 
         st.session_state["report_data"] = {
             "user_id": user_id,
@@ -238,16 +198,9 @@ if submitted:
             "lr_probs": out["lr_probs"],
             "eligibility": out["eligibility"],
             "risk_level": out["risk_level"],
+            "features": features.to_dict(),
         }
 
-        new_entry = input_df.iloc[0].to_dict()
-        new_entry["user_id"] = user_id
-        new_entry["alt_credit_score"] = out["final_score"]
-
-        df_csv = pd.read_csv(DATA_FILE)
-        df_csv = pd.concat([df_csv, pd.DataFrame([new_entry])], ignore_index=True)
-        df_csv.to_csv(DATA_FILE, index=False)
-
         st.success(f"✅ User {user_id} registered successfully!")
         c1, c2, c3, c4 = st.columns(4)
         with c1: st.metric("Logistic Regression", f"{out['lr_score']}", out["lr_risk"])
@@ -255,4 +208,4 @@ if submitted:
         with c3: st.metric("Random Forest", f"{out['rf_score']:.1f}")
         with c4: st.metric("Final Score", f"{out['final_score']}", out["risk_level"])
 
-        st.switch_page("pages/user_report_page.py")
+        st.switch_page("pages/user_report_page.py", query_params={"user_id": user_id})
@@ -0,0 +1,140 @@
+import os
+import pandas as pd
+import streamlit as st
+
+from metrics import METRICS, TEXTFILE_ENV
+from onnx_utils import ORT_CONFIG, PREDICTION_CACHE, end_profiling
+from model_registry import get_registry
+
+st.set_page_config(page_title="Admin | Metrics", layout="wide")
+
+st.markdown(
+    """
+    <style>
+    [data-testid="stSidebarNav"] { display: none !important; }
+    </style>
+    """,
+    unsafe_allow_html=True
+)
+
+# -----------------------------
+# Sidebar
+# -----------------------------
+with st.sidebar:
+    st.markdown("<h2 style='text-align:center;color:#00D1FF;'>ALTSCORE</h2>", unsafe_allow_html=True)
+    st.write("---")
+    if st.button("🏠 Home", use_container_width=True):
+        st.switch_page("app.py")
+    if st.button("📊 Dashboard", use_container_width=True):
+        st.switch_page("pages/dashboard_page.py")
+    if st.button("➕ New Registration", use_container_width=True):
+        st.switch_page("pages/Add_user_page.py")
+
+st.markdown("<h1>🛠️ Latency Metrics</h1>", unsafe_allow_html=True)
+st.caption("Collected in this server process since start-up or the last reset. Quantiles cover recent samples.")
+
+snap = METRICS.snapshot()
+
+# -----------------------------
+# Stage latencies
+# -----------------------------
+st.subheader("⏱️ Stages")
+if snap["stages"]:
+    rows = []
+    for stage, h in snap["stages"].items():
+        rows.append({
+            "stage": stage,
+            "count": h["count"],
+            "p50 (ms)": h["p50_s"] * 1000,
+            "p95 (ms)": h["p95_s"] * 1000,
+            "p99 (ms)": h["p99_s"] * 1000,
+            "mean (ms)": (h["mean_s"] or 0) * 1000,
+            "max (ms)": (h["max_s"] or 0) * 1000,
+            "total (s)": h["sum_s"],
+        })
+    stages_df = pd.DataFrame(rows).set_index("stage")
+    st.dataframe(stages_df.style.format(precision=3), use_container_width=True)
+else:
+    st.info("No timings yet. Register a user or open the dashboard to collect some.")
+
+st.subheader("🔢 Counters")
+if snap["counters"]:
+    st.dataframe(
+        pd.DataFrame(list(snap["counters"].items()), columns=["event", "count"]).set_index("event"),
+        use_container_width=True,
+    )
+else:
+    st.caption("No events counted yet.")
+
+# -----------------------------
+# Prediction cache
+# -----------------------------
+st.subheader("🗃️ Prediction cache")
+cache = PREDICTION_CACHE.stats()
+if PREDICTION_CACHE.enabled:
+    k1, k2, k3, k4 = st.columns(4)
+    with k1:
+        st.metric("Hit rate", "—" if cache["hit_rate"] is None else f"{cache['hit_rate']:.1%}")
+    with k2:
+        st.metric("Entries", f"{cache['entries']} / {cache['max_entries']}")
+    with k3:
+        st.metric("Memory (approx.)", f"{cache['approx_bytes'] / 1024:.1f} KiB")
+    with k4:
+        st.metric("Evictions", f"{cache['evictions'] + cache['expirations']}")
+    if st.button("🧹 Clear prediction cache"):
+        PREDICTION_CACHE.clear()
+        st.rerun()
+else:
+    st.caption("Disabled (ALTSCORE_PREDICTION_CACHE_SIZE=0).")
+
+# -----------------------------
+# Export
+# -----------------------------
+st.subheader("📤 Export")
+c1, c2, c3 = st.columns(3)
+with c1:
+    st.download_button("Download JSON", METRICS.to_json(), "altscore_metrics.json",
+                       "application/json", use_container_width=True)
+with c2:
+    st.download_button("Download Prometheus textfile", METRICS.to_prometheus(), "altscore.prom",
+                       "text/plain", use_container_width=True)
+with c3:
+    if st.button("🔄 Reset metrics", use_container_width=True):
+        METRICS.reset()
+        st.rerun()
+
+textfile = os.environ.get(TEXTFILE_ENV)
+if textfile:
+    st.caption(f"Textfile export is on: {textfile} is rewritten periodically.")
+    if st.button("Write textfile now"):
+        METRICS.write_textfile(textfile)
+        st.success(f"Wrote {textfile}")
+else:
+    st.caption(f"Set {TEXTFILE_ENV} to have the server keep a Prometheus textfile up to date.")
+
+# -----------------------------
+# Model variant
+# -----------------------------
+st.subheader("🧬 Model variant")
+variant = get_registry().stats()["models"].get("variant") or {}
+st.write(f"Requested **{variant.get('requested', '—')}**, serving **{variant.get('used', '—')}**.")
+if variant.get("reason"):
+    st.warning(f"Fell back to the default models: {variant['reason']}")
+st.caption("Choose with ALTSCORE_MODEL_VARIANT; build the encoded export with `python build_encoded_onnx.py`.")
+
+# -----------------------------
+# ONNX Runtime profiler
+# -----------------------------
+st.subheader("🔬 ONNX Runtime profiler")
+if ORT_CONFIG["profiling"]:
+    st.write(f"Profiling is **on** for newly created sessions; traces go to `{ORT_CONFIG['profile_dir']}/`.")
+    st.caption("Writing the traces stops profiling on the current sessions until the next model load.")
+    if st.button("Write profiler traces"):
+        models = get_registry().current()
+        files = end_profiling(list(models.sessions()) + [models.ensemble])
+        if files:
+            st.success("Wrote " + ", ".join(files))
+        else:
+            st.warning("No active profiling sessions (traces were already written).")
+else:
+    st.write("Profiling is **off**. Start the app with `ALTSCORE_ORT_PROFILING=1` to record per-operator traces.")
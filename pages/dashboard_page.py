@@ -3,65 +3,34 @@ import numpy as np
 import pandas as pd
 import streamlit as st
 
-from onnx_utils import load_onnx_sessions, onnx_predict_regressor, onnx_predict_classifier_label_and_proba
+from data_store import (
+    DATA_FILE, load_summary, delete_last_record, delete_user, undo_delete, load_tombstones, compact,
+    compact_threshold, get_snapshot, query_users, catalogs_from_frame,
+)
+from columnar_store import backend_enabled, read_frame
+from score_index import get_score_index
+from metrics import timed, inc, maybe_export
+from risk_bands import BAND_RANGES, BAND_COLORS, band_labels, color_risk, color_lr_risk, risk_styles
+from analytics import SEGMENT_COLUMNS, dataset_generation, get_analytics
 
 st.set_page_config(page_title="Credit Analytics Dashboard", layout="wide")
 
-DATA_FILE = "data/dataset.csv"
-
-# -----------------------------
-# Cached model sessions
-# -----------------------------
-@st.cache_resource
-def load_models():
-    return load_onnx_sessions()
+DASHBOARD_COLUMNS = [
+    "user_id", "employment_type", "income_range", "city_tier", "monthly_income",
+    "bank_account_age_months", "num_bank_accounts", "rent_paid_on_time",
+    "utility_delay_days", "upi_txn_count", "avg_month_end_balance", "overdraft_event",
+    "alt_credit_score", "lr_risk", "xgb_score", "rf_score", "model_version", "scored_at",
+]
 
 # -----------------------------
 # Helpers
 # -----------------------------
-def compute_risk_level(score):
-    if pd.isna(score):
-        return "Unknown"
-    if score >= 70:
-        return "Low"
-    elif score >= 40:
-        return "Medium"
-    else:
-        return "High"
-
-def color_risk(val):
-    if val == "Low":
-        return "background-color: #6bcf7f; color: white; font-weight: bold;"
-    elif val == "Medium":
-        return "background-color: #ffd93d; color: black; font-weight: bold;"
-    elif val == "High":
-        return "background-color: #ff6b6b; color: white; font-weight: bold;"
-    return ""
-
-def color_lr_risk(val):
-    if val in ("High Risk", "High"):
-        return "background-color: #ff6b6b; color: white; font-weight: bold;"
-    if val in ("Medium Risk", "Medium"):
-        return "background-color: #ffd93d; color: black; font-weight: bold;"
-    if val in ("Low Risk", "Low"):
-        return "background-color: #6bcf7f; color: white; font-weight: bold;"
-    return ""
-
-def build_input_df_from_row(row: pd.Series) -> pd.DataFrame:
-    # Keep column names exactly as training/ONNX expects
-    return pd.DataFrame([{
-        "employment_type": str(row.get("employment_type", "salaried")).strip().lower(),
-        "income_range": str(row.get("income_range", "10000-30000")).strip().lower(),
-        "city_tier": int(pd.to_numeric(row.get("city_tier", 2), errors="coerce") or 2),
-        "bank_account_age_months": int(pd.to_numeric(row.get("bank_account_age_months", 24), errors="coerce") or 24),
-        "num_bank_accounts": int(pd.to_numeric(row.get("num_bank_accounts", 1), errors="coerce") or 1),
-        "monthly_income": float(pd.to_numeric(row.get("monthly_income", 30000), errors="coerce") or 30000),
-        "rent_paid_on_time": float(pd.to_numeric(row.get("rent_paid_on_time", 1.0), errors="coerce") or 1.0),
-        "utility_delay_days": float(pd.to_numeric(row.get("utility_delay_days", 0.0), errors="coerce") or 0.0),
-        "upi_txn_count": float(pd.to_numeric(row.get("upi_txn_count", 20.0), errors="coerce") or 20.0),
-        "avg_month_end_balance": float(pd.to_numeric(row.get("avg_month_end_balance", 5000.0), errors="coerce") or 5000.0),
-        "overdraft_event": int(pd.to_numeric(row.get("overdraft_event", 0), errors="coerce") or 0),
-    }])
+def fmt_stored(val):
+    return "—" if val is None or pd.isna(val) else str(val)
+
+def fmt_stored_score(val):
+    val = pd.to_numeric(val, errors="coerce")
+    return "—" if pd.isna(val) else f"{val:.1f}"
 
 # -----------------------------
 # Minimal CSS
@@ -93,16 +62,24 @@ with st.sidebar:
     if st.button("➕ New Registration", use_container_width=True):
         st.switch_page("pages/Add_user_page.py")
 
+    if st.button("🛠️ Admin: Metrics", use_container_width=True):
+        st.switch_page("pages/admin_page.py")
+
+    st.write("---")
+
+    # Reads the one record through the user_id index, not the dataset
+    with st.form("open_report_form", clear_on_submit=True):
+        report_id = st.text_input("User ID to open", placeholder="USER_0042")
+        if st.form_submit_button("📄 Open Report", use_container_width=True) and report_id.strip():
+            st.switch_page("pages/user_report_page.py", query_params={"user_id": report_id.strip()})
+
     st.write("---")
 
     if st.button("🗑️ Delete Last Entry", use_container_width=True):
         if os.path.exists(DATA_FILE):
             try:
-                df_del = pd.read_csv(DATA_FILE)
-                if not df_del.empty:
-                    deleted_user = df_del.iloc[-1].get("user_id", "Unknown")
-                    df_del = df_del.iloc[:-1]
-                    df_del.to_csv(DATA_FILE, index=False)
+                deleted_user = delete_last_record()
+                if deleted_user is not None:
                     st.success(f"✅ Deleted: {deleted_user}")
                     st.rerun()
                 else:
@@ -112,6 +89,33 @@ with st.sidebar:
         else:
             st.warning("No dataset found.")
 
+    # Deletes are tombstones: instant, and undoable until the next compaction
+    with st.form("delete_user_form", clear_on_submit=True):
+        delete_id = st.text_input("User ID to delete", placeholder="USER_0042")
+        if st.form_submit_button("🗑️ Delete User", use_container_width=True) and delete_id.strip():
+            try:
+                if delete_user(delete_id) is not None:
+                    st.rerun()
+                else:
+                    st.warning(f"No user {delete_id.strip()} found.")
+            except Exception as e:
+                st.error(f"Error deleting user: {e}")
+
+    tombstones = load_tombstones()
+    if tombstones:
+        last_deleted = tombstones.last()["user_id"]
+        if st.button(f"↩️ Undo delete of {last_deleted}", use_container_width=True):
+            undo_delete()
+            st.rerun()
+        threshold = compact_threshold()
+        st.caption(
+            f"{len(tombstones)} deleted user(s) pending compaction"
+            + (f" (automatic at {threshold})." if threshold else ".")
+        )
+        if st.button("🧹 Compact now", use_container_width=True):
+            removed = compact()
+            st.success(f"Removed {removed} deleted rows from the dataset.")
+
 # -----------------------------
 # Header
 # -----------------------------
@@ -125,9 +129,18 @@ if not os.path.exists(DATA_FILE):
     st.warning("📭 Dataset file not found. Please add users first.")
     st.stop()
 
-df_raw = pd.read_csv(DATA_FILE)
+# Shared, cached parse of the dataset; the frame is read-only, so every step below returns a new frame.
+# With the columnar backend enabled, only the columns the dashboard shows are read.
+inc("dashboard.views")
+with timed("dashboard.load"):
+    if backend_enabled():
+        generation = dataset_generation()
+        df_raw = read_frame(DASHBOARD_COLUMNS)
+    else:
+        snapshot = get_snapshot()
+        generation, df_raw = snapshot.generation, snapshot.frame
 # Keep original order (append order) for "Last Added Users"
-df_added_order = df_raw.copy()
+df_added_order = df_raw
 
 if df_raw.empty:
     st.warning("📭 Dataset is empty. Please register some users first.")
@@ -141,49 +154,125 @@ if "credit_score" not in df_raw.columns:
     st.error("❌ Column 'credit_score' not found (or 'alt_credit_score' missing).")
     st.stop()
 
-df_raw["credit_score"] = pd.to_numeric(df_raw["credit_score"], errors="coerce")
-df_raw = df_raw.sort_values(by="credit_score", ascending=False, na_position="last").reset_index(drop=True)
-
-# Add risk_level column
-df_raw["risk_level"] = df_raw["credit_score"].apply(compute_risk_level)
-
-# -----------------------------
-# Load ONNX sessions
-# -----------------------------
-try:
-    lr_sess, xgb_sess, rf_sess = load_models()
-except Exception as e:
-    st.error(f"ONNX model loading error: {e}")
-    st.stop()
+df_raw = df_raw.assign(credit_score=pd.to_numeric(df_raw["credit_score"], errors="coerce"))
 
 # -----------------------------
 # Metrics
 # -----------------------------
 col1, col2, col3, col4 = st.columns(4)
 
-total_users = len(df_raw)
-low_users = int((df_raw["credit_score"] >= 70).sum())
-high_users = int((df_raw["credit_score"] < 40).sum())
-medium_users = int(df_raw["credit_score"].between(40, 70).sum())
+# Band counts are maintained at write/delete time (see data_store.load_summary)
+with timed("dashboard.summary"):
+    summary = load_summary()
+total_users = summary["total"]
+low_users = summary["bands"]["low"]
+medium_users = summary["bands"]["medium"]
+high_users = summary["bands"]["high"]
 
 with col1:
     st.metric("Total Users", f"{total_users}")
 with col2:
-    st.metric("Low Risk (≥70)", f"{low_users}")
+    st.metric(f"Low Risk ({BAND_RANGES['Low']})", f"{low_users}")
 with col3:
-    st.metric("Medium Risk (40-69)", f"{medium_users}")
+    st.metric(f"Medium Risk ({BAND_RANGES['Medium']})", f"{medium_users}")
 with col4:
-    st.metric("High Risk (<40)", f"{high_users}")
+    st.metric(f"High Risk ({BAND_RANGES['High']})", f"{high_users}")
+
+st.write("")
+
+# -----------------------------
+# Segment analytics (computed once per dataset generation, shared by all sessions)
+# -----------------------------
+st.subheader("📈 Score distribution & segments")
+
+stats = get_analytics(df_raw, generation, score_col="credit_score")
+
+h1, h2 = st.columns([3, 1])
+with h1:
+    st.caption(f"Users per {stats.histogram.index[1] - stats.histogram.index[0]}-point score bin")
+    st.bar_chart(stats.histogram, x_label="credit score", y_label="users",
+                 color=[BAND_COLORS[b] for b in stats.histogram.columns])
+with h2:
+    st.caption("Risk bands")
+    shown = [b for b in stats.bands if b in BAND_COLORS or stats.bands[b]]
+    bands = pd.DataFrame({"users": [stats.bands[b] for b in shown]}, index=shown)
+    st.dataframe(bands, use_container_width=True)
+
+SEGMENT_LABELS = {"employment_type": "Employment type", "income_range": "Income range", "city_tier": "City tier"}
+segment_col = st.radio(
+    "Group by", [c for c in SEGMENT_COLUMNS if c in stats.segments],
+    format_func=SEGMENT_LABELS.get, horizontal=True,
+)
+segment = stats.segments[segment_col]
+band_share = segment[["low_pct", "medium_pct", "high_pct"]].rename(
+    columns={"low_pct": "Low", "medium_pct": "Medium", "high_pct": "High"}
+)
+segment_labels = segment.index.astype(str)
+
+g1, g2 = st.columns(2)
+with g1:
+    st.caption("Risk-band mix (% of users in the segment)")
+    st.bar_chart(band_share.set_axis(segment_labels), horizontal=True,
+                 color=[BAND_COLORS[b] for b in band_share.columns])
+with g2:
+    st.caption("Mean credit score")
+    st.bar_chart(segment["mean_score"].set_axis(segment_labels), horizontal=True, color="#00D1FF")
+
+with st.expander("Segment details (mean features)"):
+    st.dataframe(segment.style.format(precision=1), use_container_width=True)
 
 st.write("")
 
 # -----------------------------
-# Top 10 Users (sorted)
+# All users (paginated)
 # -----------------------------
 st.subheader("✅ All users")
 
-display_df = df_raw.head(2000).copy()
-display_df.index = range(1, len(display_df) + 1)
+SORT_OPTIONS = {
+    "Credit score (high → low)": "score_desc",
+    "Credit score (low → high)": "score_asc",
+    "Newest first": "newest",
+    "Oldest first": "oldest",
+}
+
+if backend_enabled():
+    emp_options, _, tier_options = catalogs_from_frame(df_raw)
+else:
+    emp_options, _, tier_options = get_snapshot().catalogs()
+
+f1, f2, f3, f4 = st.columns([1.2, 1.2, 1, 1.2])
+with f1:
+    band_filter = st.multiselect("Risk level", ["Low", "Medium", "High", "Unknown"])
+with f2:
+    emp_filter = st.multiselect("Employment type", emp_options)
+with f3:
+    tier_filter = st.multiselect("City tier", tier_options)
+with f4:
+    search = st.text_input("Search user ID", "")
+
+s1, s2, s3 = st.columns([2, 1, 1])
+with s1:
+    sort_label = st.selectbox("Sort by", list(SORT_OPTIONS))
+with s2:
+    page_size = st.selectbox("Rows per page", [25, 50, 100, 200], index=1)
+
+def fetch_page(page):
+    with timed("dashboard.query"):
+        return query_users(
+            df_raw, score_col="credit_score", bands=band_filter, employment_types=emp_filter,
+            city_tiers=tier_filter, search=search, sort=SORT_OPTIONS[sort_label], page=page, page_size=page_size,
+            score_index=None if backend_enabled() else get_score_index(),
+        )
+
+page = int(st.session_state.get("users_page", 1))
+page_df, total_matches = fetch_page(page)
+num_pages = max(1, -(-total_matches // page_size))
+if page > num_pages:
+    # Filters shrank the result set; jump back to the first page
+    st.session_state["users_page"] = page = 1
+    page_df, total_matches = fetch_page(page)
+with s3:
+    st.number_input(f"Page (of {num_pages})", min_value=1, max_value=num_pages, step=1, key="users_page")
 
 cols = [
     "user_id",
@@ -201,11 +290,17 @@ cols = [
     "credit_score",
     "risk_level",
 ]
-cols = [c for c in cols if c in display_df.columns]
+cols = [c for c in cols if c in page_df.columns]
 
+st.caption(f"{total_matches} matching users")
 st.dataframe(
-    display_df[cols].style.map(color_risk, subset=["risk_level"]),
-    use_container_width=True
+    page_df[cols].style.apply(risk_styles, subset=["risk_level"]),
+    use_container_width=True,
+    column_config={
+        "credit_score": st.column_config.ProgressColumn(
+            "credit_score", min_value=0, max_value=100, format="%.1f"
+        ),
+    },
 )
 
 st.write("")
@@ -219,35 +314,26 @@ st.subheader("🤖 AI Model Predictions (Last 5 Registered Users)")
 if "alt_credit_score" in df_added_order.columns and "credit_score" not in df_added_order.columns:
     df_added_order = df_added_order.rename(columns={"alt_credit_score": "credit_score"})
 
-# Add risk_level in df_added_order if missing
-if "risk_level" not in df_added_order.columns and "credit_score" in df_added_order.columns:
-    df_added_order["credit_score"] = pd.to_numeric(df_added_order["credit_score"], errors="coerce")
-    df_added_order["risk_level"] = df_added_order["credit_score"].apply(compute_risk_level)
-
 # Take last 5 rows by insertion order, show newest on top
-df_predict = df_added_order.tail(5).copy().iloc[::-1].reset_index(drop=True)
+df_predict = df_added_order.tail(5).iloc[::-1].reset_index(drop=True)
 
+# Add risk_level if missing
+if "risk_level" not in df_predict.columns and "credit_score" in df_predict.columns:
+    df_predict["credit_score"] = pd.to_numeric(df_predict["credit_score"], errors="coerce")
+    df_predict["risk_level"] = band_labels(df_predict["credit_score"].to_numpy(), short=True)
+
+# Per-model outputs are stored at registration; rows saved before that show "—"
 pred_rows = []
 for idx, row in df_predict.iterrows():
-    try:
-        input_df = build_input_df_from_row(row)
-
-        lr_risk, lr_probs = onnx_predict_classifier_label_and_proba(lr_sess, input_df)
-        xgb_score = float(np.clip(onnx_predict_regressor(xgb_sess, input_df), 0, 100))
-        rf_score  = float(np.clip(onnx_predict_regressor(rf_sess, input_df), 0, 100))
-
-        xgb_s = f"{xgb_score:.1f}"
-        rf_s  = f"{rf_score:.1f}"
-    except Exception:
-        lr_risk, xgb_s, rf_s = "Error", "Error", "Error"
-
     pred_rows.append({
         "User ID": row.get("user_id", f"User_{idx+1}"),
         "Credit Score": row.get("credit_score", np.nan),
         "Risk Level": row.get("risk_level", "Unknown"),
-        # "LR Risk": lr_risk,
-        # "XGB Score": xgb_s,
-        # "RF Score": rf_s,
+        "LR Risk": fmt_stored(row.get("lr_risk")),
+        "XGB Score": fmt_stored_score(row.get("xgb_score")),
+        "RF Score": fmt_stored_score(row.get("rf_score")),
+        "Model Version": fmt_stored(row.get("model_version")),
+        "Scored At": fmt_stored(row.get("scored_at")),
     })
 
 pred_df = pd.DataFrame(pred_rows)
@@ -256,8 +342,9 @@ pred_df.index = range(1, len(pred_df) + 1)
 styled = (
     pred_df.style
     .map(color_risk, subset=["Risk Level"])
-    # .map(color_lr_risk, subset=["LR Risk"])
+    .map(color_lr_risk, subset=["LR Risk"])
 )
 
 st.dataframe(styled, use_container_width=True)
 
+maybe_export()
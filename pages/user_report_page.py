@@ -1,6 +1,13 @@
 import streamlit as st
 import pandas as pd
 
+from data_store import find_user, load_summary, score_percentile
+from onnx_utils import ELIGIBILITY, FEATURE_ORDER, INT_FEATURES, FeatureVector
+from preprocess import clean_record
+from model_registry import get_registry
+from risk_bands import risk_band
+from whatif import SWEEP_FEATURES, DEFAULT_POINTS, MAX_POINTS, sweep_range, sweep_grid, sweep_feature, nearest_in_band
+
 st.set_page_config(page_title="Credit Analysis Report", layout="centered")
 
 # --------------------------------------------------
@@ -24,13 +31,50 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --------------------------------------------------
-# Validate session state
-# --------------------------------------------------
-if "report_data" not in st.session_state:
+# Report data: ?user_id=... reads the stored record, else this session's registration
+# --------------------------------------------------
+def _stored(value):
+    return None if pd.isna(value) else value
+
+def report_from_record(record: dict) -> dict:
+    """Same shape as the registration page's report_data, from a stored record."""
+    final = _stored(record.get("alt_credit_score"))
+    risk_level = risk_band(final) if final is not None else None
+    probs = {
+        label: _stored(record.get(col))
+        for label, col in (("High Risk", "lr_prob_high"), ("Low Risk", "lr_prob_low"), ("Medium Risk", "lr_prob_medium"))
+    }
+    return {
+        "user_id": record["user_id"],
+        "lr": _stored(record.get("lr_score")),
+        "xgb": _stored(record.get("xgb_score")),
+        "rf": _stored(record.get("rf_score")),
+        "final": final,
+        "lr_risk": _stored(record.get("lr_risk")) or "—",
+        "lr_probs": probs if all(p is not None for p in probs.values()) else None,
+        "eligibility": ELIGIBILITY.get(risk_level, "—"),
+        "risk_level": risk_level,
+        "model_version": _stored(record.get("model_version")),
+        "scored_at": _stored(record.get("scored_at")),
+        "features": {col: _stored(record.get(col)) for col in FEATURE_ORDER},
+    }
+
+requested_id = st.query_params.get("user_id", "").strip()
+if requested_id:
+    record = find_user(requested_id)
+    if record is None:
+        st.error(f"❌ No user {requested_id} found.")
+        st.stop()
+    data = report_from_record(record)
+elif "report_data" in st.session_state:
+    data = st.session_state["report_data"]
+else:
     st.error("❌ No report data found. Please register a user first.")
     st.stop()
 
-data = st.session_state["report_data"]
+if data["final"] is None:
+    st.error(f"❌ User {data['user_id']} has no stored credit score.")
+    st.stop()
 
 # --------------------------------------------------
 # Header
@@ -69,8 +113,8 @@ report_df = pd.DataFrame({
     ],
     "Result": [
         data["lr_risk"],
-        f"{data['rf']}/100",
-        f"{data['xgb']}/100",
+        "—" if data["rf"] is None else f"{data['rf']}/100",
+        "—" if data["xgb"] is None else f"{data['xgb']}/100",
         f"{final_score}/100"
     ],
     "Remarks": [
@@ -85,6 +129,9 @@ st.markdown("<div class='main-box'>", unsafe_allow_html=True)
 st.table(report_df)
 st.markdown("</div>", unsafe_allow_html=True)
 
+if data.get("scored_at"):
+    st.caption(f"Scored {data['scored_at']} by model version {data.get('model_version') or '—'}.")
+
 # --------------------------------------------------
 # Score Progress
 # --------------------------------------------------
@@ -99,12 +146,29 @@ with col2:
         unsafe_allow_html=True
     )
 
+# --------------------------------------------------
+# Standing in the applicant population (summary score histogram, no dataset load)
+# --------------------------------------------------
+try:
+    percentile = score_percentile(data["final"], load_summary())
+except Exception:
+    percentile = float("nan")
+
+if not pd.isna(percentile):
+    st.markdown(
+        f"<p style='text-align:center;color:white;font-size:18px;'>"
+        f"Better than <b>{percentile:.0f}%</b> of applicants</p>",
+        unsafe_allow_html=True
+    )
+
 # --------------------------------------------------
 # Final Verdict Message
 # --------------------------------------------------
-if final_score >= 70:
+# Same band as risk_level (the displayed final_score is truncated to an int)
+verdict_band = risk_band(data["final"])
+if verdict_band == "Low Risk":
     st.success("🎉 **Excellent profile!** This user is eligible for credit facilities.")
-elif final_score >= 40:
+elif verdict_band == "Medium Risk":
     st.warning("⚠️ **Moderate risk.** Conditional approval is recommended.")
 else:
     st.error("❌ **High risk profile.** Credit extension is not recommended.")
@@ -116,6 +180,55 @@ if data.get("lr_probs"):
     st.markdown("<h3 style='color:white;'>📊 Risk Probability Breakdown</h3>", unsafe_allow_html=True)
     st.json(data["lr_probs"])
 
+# --------------------------------------------------
+# What-if explorer: every variant scored in one batch
+# --------------------------------------------------
+def _fmt(value) -> str:
+    return f"{value:,}" if isinstance(value, int) else f"{value:,.2f}"
+
+if data.get("features"):
+    st.markdown("<h3 style='color:white;'>🔮 What-if Explorer</h3>", unsafe_allow_html=True)
+    # Same cleaning as registration, so a legacy record with a blank value still sweeps
+    values, _ = clean_record(data["features"])
+    fv = FeatureVector.from_mapping(values)
+    models = get_registry().current()
+
+    feature = st.selectbox("Feature to change", list(SWEEP_FEATURES),
+                           format_func=lambda c: SWEEP_FEATURES[c]["label"])
+    low, high = sweep_range(fv, feature)
+    current = getattr(fv, feature)
+    wc1, wc2 = st.columns([3, 1])
+    with wc1:
+        if feature in INT_FEATURES:
+            sweep_low, sweep_high = st.slider("Range", int(low), int(high), (int(low), int(high)),
+                                              key=f"whatif_range_{feature}")
+        else:
+            sweep_low, sweep_high = st.slider("Range", float(low), float(high), (float(low), float(high)),
+                                              step=(high - low) / 100 or 1.0, key=f"whatif_range_{feature}")
+    with wc2:
+        points = st.number_input("Variants", min_value=10, max_value=MAX_POINTS, value=DEFAULT_POINTS, step=50)
+
+    sweep = sweep_feature(fv, feature, sweep_grid(fv, feature, sweep_low, sweep_high, points),
+                          *models.sessions(), models.ensemble)
+    st.line_chart(
+        sweep.set_index(feature)[["final_score", "xgb_score", "rf_score"]],
+        x_label=SWEEP_FEATURES[feature]["label"], y_label="Score",
+    )
+
+    now = sweep.loc[sweep[feature] == current]
+    notes = []
+    if not now.empty:
+        now_level = now["risk_level"].iloc[0]
+        notes.append(f"Now {_fmt(current)}: {now['final_score'].iloc[0]:.0f}/100 ({now_level}).")
+        for band in ("Low Risk", "Medium Risk"):
+            if band == now_level:
+                break
+            target = nearest_in_band(sweep, feature, current, band)
+            if target is not None:
+                notes.append(f"Closest value for {band}: {_fmt(target)}.")
+    notes.append(f"{len(sweep)} variants scored in one batch with model version {models.version}.")
+    st.caption(" ".join(notes))
+
 # --------------------------------------------------
 # Sidebar Navigation
 # --------------------------------------------------
@@ -131,3 +244,12 @@ with st.sidebar:
 
     if st.button("➕ New Registration", use_container_width=True):
         st.switch_page("pages/Add_user_page.py")
+
+    st.write("---")
+
+    # Shareable: the report URL carries the user ID
+    with st.form("open_report_form", clear_on_submit=True):
+        open_id = st.text_input("Open report for user ID", placeholder="USER_0042")
+        if st.form_submit_button("📄 Open Report", use_container_width=True) and open_id.strip():
+            st.query_params["user_id"] = open_id.strip()
+            st.rerun()
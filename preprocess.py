@@ -0,0 +1,202 @@
+"""
+Schema-driven cleaning of the 11 model features.
+
+clean_features() takes a whole frame (bulk scoring, the rescore backfill)
+and, one column at a time, normalizes the categoricals, coerces and clips
+the numerics and fills explicit defaults. Every cell gets an issue code, so
+callers can tell which rows were scored on something other than what was
+given. A value of 0 is a value: only missing or unparseable cells get the
+default.
+
+clean_record() applies the same schema to one mapping without pandas, for
+the registration form.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+from onnx_utils import FEATURE_ORDER, CATEGORICAL_FEATURES, INT_FEATURES
+
+# Issue codes, one bit each per cell
+ISSUE_MISSING = 1            # absent or blank -> default
+ISSUE_INVALID = 2            # not a number -> default
+ISSUE_CLIPPED = 4            # outside the valid range -> clipped to it
+ISSUE_UNKNOWN_CATEGORY = 8   # not a category the models were trained on (scored as "none of them")
+
+ISSUE_NAMES = {
+    ISSUE_MISSING: "missing",
+    ISSUE_INVALID: "invalid",
+    ISSUE_CLIPPED: "clipped",
+    ISSUE_UNKNOWN_CATEGORY: "unknown_category",
+}
+# Cells whose scored value differs from the input
+ERROR_ISSUES = ISSUE_MISSING | ISSUE_INVALID | ISSUE_CLIPPED
+
+# Bounds are what the features can physically be, not the registration form's
+# limits: stored and imported rows must score exactly as before.
+FEATURE_SCHEMA = {
+    "employment_type": {
+        "default": "salaried",
+        "categories": ["contract", "gig", "salaried", "self_employed", "student", "unemployed"],
+    },
+    "income_range": {
+        "default": "10000-30000",
+        "categories": ["0-15000", "10000-30000", "15000-30000", "20000-100000", "25000-80000", "30000-50000"],
+    },
+    "city_tier":               {"default": 2, "min": 1, "max": 3},
+    "bank_account_age_months": {"default": 24, "min": 0},
+    "num_bank_accounts":       {"default": 1, "min": 1},
+    "overdraft_event":         {"default": 0, "min": 0},
+    "monthly_income":          {"default": 30000.0, "min": 0.0},
+    "rent_paid_on_time":       {"default": 1.0, "min": 0.0, "max": 1.0},
+    "utility_delay_days":      {"default": 0.0, "min": 0.0},
+    "upi_txn_count":           {"default": 20.0, "min": 0.0},
+    "avg_month_end_balance":   {"default": 5000.0, "min": 0.0},
+}
+
+
+class CleanedFeatures:
+    """
+    Result of clean_features: `frame` holds the 11 features ready for
+    build_onnx_inputs_batch (same index as the input), `issues` is an
+    (N, 11) uint8 array of issue bits in FEATURE_ORDER.
+    """
+
+    def __init__(self, frame: pd.DataFrame, issues: np.ndarray):
+        self.frame = frame
+        self.issues = issues
+
+    def __len__(self):
+        return len(self.frame)
+
+    @property
+    def error_mask(self) -> np.ndarray:
+        """(N,) True for rows where at least one value was defaulted or clipped."""
+        return (self.issues & ERROR_ISSUES).any(axis=1)
+
+    @property
+    def unknown_category_mask(self) -> np.ndarray:
+        return (self.issues & ISSUE_UNKNOWN_CATEGORY).any(axis=1)
+
+    def counts(self) -> dict:
+        """{issue name: {feature: rows}} for the issues that occurred."""
+        out = {}
+        for bit, name in ISSUE_NAMES.items():
+            per_col = (self.issues & bit).astype(bool).sum(axis=0)
+            hits = {col: int(c) for col, c in zip(FEATURE_ORDER, per_col) if c}
+            if hits:
+                out[name] = hits
+        return out
+
+    def describe(self) -> np.ndarray:
+        """(N,) strings like "monthly_income:invalid;city_tier:clipped"; "" for clean rows."""
+        out = np.full(len(self.frame), "", dtype=object)
+        for i in np.flatnonzero(self.issues.any(axis=1)):
+            out[i] = ";".join(
+                f"{col}:{name}"
+                for col, codes in zip(FEATURE_ORDER, self.issues[i]) if codes
+                for bit, name in ISSUE_NAMES.items() if codes & bit
+            )
+        return out
+
+
+def _clean_category(raw: pd.Series, spec: dict):
+    text = raw.astype(str).str.strip().str.lower().to_numpy(dtype=object)
+    missing = raw.isna().to_numpy() | (text == "")
+    values = np.where(missing, spec["default"], text)
+    unknown = ~missing & ~pd.Index(values).isin(spec["categories"])
+    codes = (np.where(missing, ISSUE_MISSING, 0) | np.where(unknown, ISSUE_UNKNOWN_CATEGORY, 0)).astype(np.uint8)
+    return values, codes
+
+def _clean_number(raw: pd.Series, spec: dict, is_int: bool):
+    if pd.api.types.is_numeric_dtype(raw.dtype) and not pd.api.types.is_bool_dtype(raw.dtype):
+        num = raw.to_numpy(dtype=np.float64, na_value=np.nan)
+        missing = np.isnan(num)
+        invalid = np.isinf(num)
+    else:
+        # Mixed or text column (JSONL, hand-edited CSV): only blanks count as missing,
+        # and only the cells that failed to parse are looked at as text
+        num = pd.to_numeric(raw, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        missing = raw.isna().to_numpy(copy=True)
+        failed = np.flatnonzero(~missing & ~np.isfinite(num))
+        if len(failed):
+            missing[failed] = raw.iloc[failed].astype(str).str.strip().to_numpy() == ""
+        invalid = ~missing & ~np.isfinite(num)
+
+    bad = missing | invalid
+    num = np.where(bad, spec["default"], num)
+    if is_int:
+        num = np.rint(num)
+    lo, hi = spec.get("min", -np.inf), spec.get("max", np.inf)
+    clipped = ~bad & ((num < lo) | (num > hi))
+    num = np.clip(num, lo, hi)
+
+    codes = (
+        np.where(missing, ISSUE_MISSING, 0)
+        | np.where(invalid, ISSUE_INVALID, 0)
+        | np.where(clipped, ISSUE_CLIPPED, 0)
+    ).astype(np.uint8)
+    return num.astype(np.int64) if is_int else num, codes
+
+def clean_features(df: pd.DataFrame) -> CleanedFeatures:
+    """Cleans the 11 model features of every row of df in one column-wise pass."""
+    n = len(df)
+    columns = {}
+    issues = np.zeros((n, len(FEATURE_ORDER)), dtype=np.uint8)
+    for j, col in enumerate(FEATURE_ORDER):
+        spec = FEATURE_SCHEMA[col]
+        if col not in df.columns:
+            raw = pd.Series(np.nan, index=df.index, dtype=object)
+        else:
+            raw = df[col]
+        if col in CATEGORICAL_FEATURES:
+            columns[col], issues[:, j] = _clean_category(raw, spec)
+        else:
+            columns[col], issues[:, j] = _clean_number(raw, spec, col in INT_FEATURES)
+    return CleanedFeatures(pd.DataFrame(columns, index=df.index), issues)
+
+
+def clean_record(record) -> tuple:
+    """
+    clean_features for one mapping, without pandas. Returns (values, issues)
+    where issues maps each affected feature to its issue names.
+    """
+    values, issues = {}, {}
+    for col in FEATURE_ORDER:
+        spec = FEATURE_SCHEMA[col]
+        raw = record.get(col)
+        if col in CATEGORICAL_FEATURES:
+            value, code = _clean_category_value(raw, spec)
+        else:
+            value, code = _clean_number_value(raw, spec, col in INT_FEATURES)
+        values[col] = value
+        if code:
+            issues[col] = [name for bit, name in ISSUE_NAMES.items() if code & bit]
+    return values, issues
+
+def _is_blank(raw) -> bool:
+    return raw is None or (isinstance(raw, float) and math.isnan(raw)) or str(raw).strip() == ""
+
+def _clean_category_value(raw, spec: dict):
+    if _is_blank(raw):
+        return spec["default"], ISSUE_MISSING
+    value = str(raw).strip().lower()
+    return value, 0 if value in spec["categories"] else ISSUE_UNKNOWN_CATEGORY
+
+def _clean_number_value(raw, spec: dict, is_int: bool):
+    if _is_blank(raw):
+        return spec["default"], ISSUE_MISSING
+    try:
+        num = float(str(raw).strip()) if isinstance(raw, str) else float(raw)
+    except (TypeError, ValueError):
+        num = math.nan
+    if not math.isfinite(num):
+        return spec["default"], ISSUE_INVALID
+    if is_int:
+        num = round(num)
+    code = 0
+    lo, hi = spec.get("min", -math.inf), spec.get("max", math.inf)
+    if num < lo or num > hi:
+        num, code = min(max(num, lo), hi), ISSUE_CLIPPED
+    return (int(num) if is_int else num), code
@@ -0,0 +1,237 @@
+"""
+Multiprocess backfill: rescore every stored record after a model change.
+
+The dataset is split into fixed-size shards that are scored on a process
+pool, with one set of ONNX sessions per worker (single-threaded ORT, so
+workers scale with cores instead of fighting over them). Stored features go
+through preprocess.clean_features first, so a hand-edited or legacy row with
+a blank or malformed value is scored on the schema default rather than
+failing the shard. Each finished shard
+is written atomically to a work directory, so an interrupted run resumes
+where it stopped. When every shard is done the new scores are merged into
+data/dataset.csv under the dataset lock and the file is replaced atomically.
+Rows registered while the backfill was running are kept as they are.
+
+Usage:
+    python rescore.py [--workers 8] [--shard-size 20000] [--resume]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from onnx_utils import (
+    MODELS_ONNX_DIR, LR_CLASSES, CATEGORICAL_FEATURES, INT_FEATURES, FLOAT_FEATURES,
+    score_batch, apply_ensemble_rule, onnx_predict_ensemble, load_ort_config,
+)
+from model_registry import ModelRegistry
+from preprocess import clean_features
+from data_store import (
+    DATA_FILE, FileLock, _lock_path_for, _file_key, _format_value, _read_header, rebuild_summary,
+    rebuild_user_index,
+)
+from columnar_store import load_columns
+
+FEATURE_COLUMNS = CATEGORICAL_FEATURES + INT_FEATURES + FLOAT_FEATURES
+WORK_DIR = os.path.join("data", "rescore_work")
+MANIFEST_FILE = "manifest.json"
+
+RESULT_COLUMNS = [
+    "alt_credit_score", "lr_risk", "lr_score", "lr_prob_high", "lr_prob_low", "lr_prob_medium",
+    "xgb_score", "rf_score",
+]
+
+
+# -----------------------------
+# Worker side
+# -----------------------------
+_worker_models = None
+
+def _init_worker(models_dir: str) -> None:
+    global _worker_models
+    # One session set per worker; ORT stays single-threaded so N workers use N cores
+    config = dict(load_ort_config(), intra_op_threads=1, inter_op_threads=1, global_thread_pool=False)
+    _worker_models = ModelRegistry(models_dir, config=config).current()
+
+def score_shard(shard_id: int, start: int, features: pd.DataFrame, out_dir: str) -> tuple:
+    models = _worker_models
+    cleaned = clean_features(features)
+    features = cleaned.frame
+    if models.ensemble is not None:
+        out = onnx_predict_ensemble(models.ensemble, features)
+    else:
+        # Sequential model runs: each worker already owns one core
+        out = apply_ensemble_rule(score_batch(features, *models.sessions(), model_execution="sequential"))
+
+    probs = out["lr_probs"]
+    result = pd.DataFrame({
+        "row": np.arange(start, start + len(features)),
+        "alt_credit_score": np.round(out["final_score"], 2),
+        "lr_risk": out["lr_risk"],
+        "lr_score": out["lr_score"],
+        "lr_prob_high": probs[:, LR_CLASSES.index("High Risk")],
+        "lr_prob_low": probs[:, LR_CLASSES.index("Low Risk")],
+        "lr_prob_medium": probs[:, LR_CLASSES.index("Medium Risk")],
+        "xgb_score": np.round(out["xgb_score"], 2),
+        "rf_score": np.round(out["rf_score"], 2),
+    })
+    path = _shard_path(out_dir, shard_id)
+    result.to_pickle(path + ".tmp")
+    os.replace(path + ".tmp", path)
+    return shard_id, len(result), int(cleaned.error_mask.sum()), models.version
+
+
+# -----------------------------
+# Driver
+# -----------------------------
+def _shard_path(work_dir: str, shard_id: int) -> str:
+    return os.path.join(work_dir, f"shard_{shard_id:06d}.pkl")
+
+def _load_manifest(work_dir: str):
+    try:
+        with open(os.path.join(work_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _save_manifest(manifest: dict, work_dir: str) -> None:
+    path = os.path.join(work_dir, MANIFEST_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(path + ".tmp", path)
+
+def _progress(done: int, total: int, rows: int, started: float) -> None:
+    elapsed = time.perf_counter() - started
+    rate = rows / elapsed if elapsed > 0 else 0.0
+    eta = (elapsed / done) * (total - done) if done else float("nan")
+    print(f"\r  shards {done}/{total}  rows {rows:,}  {rate:,.0f} rows/sec  eta {eta:6.1f}s",
+          end="", file=sys.stderr, flush=True)
+
+def _merge(data_path: str, work_dir: str, manifest: dict, model_version: str) -> int:
+    """Writes shard results into the dataset under the lock. Returns rows updated."""
+    results = pd.concat(
+        [pd.read_pickle(_shard_path(work_dir, i)) for i in range(manifest["shards"])],
+        ignore_index=True,
+    ).sort_values("row")
+
+    with FileLock(_lock_path_for(data_path)):
+        key = _file_key(data_path)
+        if key[0] != manifest["source_inode"] or key[1] < manifest["source_size"]:
+            raise RuntimeError(
+                "dataset was rewritten (e.g. a delete) during the backfill; rerun without --resume"
+            )
+        _, terminator = _read_header(data_path)
+        # Untouched fields keep the exact text that was stored
+        df = pd.read_csv(data_path, dtype=str, keep_default_na=False)
+        rows = results["row"].to_numpy()
+        updates = {col: results[col].to_numpy() for col in RESULT_COLUMNS}
+        updates["model_version"] = model_version
+        updates["scored_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        for col, new_values in updates.items():
+            values = (
+                df[col].to_numpy(dtype=object, copy=True) if col in df.columns
+                else np.full(len(df), "", dtype=object)
+            )
+            # Same text as a fresh registration writes
+            values[rows] = [_format_value(v) for v in np.broadcast_to(new_values, len(rows))]
+            df[col] = values
+
+        tmp_path = data_path + ".tmp"
+        df.to_csv(tmp_path, index=False, lineterminator=terminator)
+        os.replace(tmp_path, data_path)
+        rebuild_summary(data_path)
+        rebuild_user_index(data_path)
+    return len(rows)
+
+def backfill(data_path: str = DATA_FILE, models_dir: str = MODELS_ONNX_DIR, workers: int = None,
+             shard_size: int = 20000, work_dir: str = WORK_DIR, resume: bool = False) -> dict:
+    workers = workers or os.cpu_count() or 1
+    manifest = _load_manifest(work_dir) if resume else None
+    if manifest is None:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        os.makedirs(work_dir, exist_ok=True)
+
+    # Snapshot of the rows to rescore; later appends are left alone
+    df = load_columns(FEATURE_COLUMNS, data_path)
+    key = _file_key(data_path)
+    total_rows = len(df)
+    model_version, _ = ModelRegistry(models_dir).resolve_version()
+    if manifest is None:
+        manifest = {
+            "source_inode": key[0],
+            "source_size": key[1],
+            "rows": total_rows,
+            "shard_size": shard_size,
+            "shards": -(-total_rows // shard_size),
+            "model_version": model_version,
+        }
+        _save_manifest(manifest, work_dir)
+    elif manifest["source_inode"] != key[0] or total_rows < manifest["rows"]:
+        raise RuntimeError("dataset changed since the interrupted run; start again without --resume")
+    elif manifest["model_version"] != model_version:
+        raise RuntimeError(
+            f"models changed since the interrupted run ({manifest['model_version']} -> {model_version}); "
+            "start again without --resume"
+        )
+
+    shard_size = manifest["shard_size"]
+    pending = [i for i in range(manifest["shards"]) if not os.path.exists(_shard_path(work_dir, i))]
+    done = manifest["shards"] - len(pending)
+    print(f"Rescoring {manifest['rows']:,} rows in {manifest['shards']} shards "
+          f"({done} already done) on {workers} workers", file=sys.stderr)
+
+    started = time.perf_counter()
+    rows_done = 0
+    rows_fixed = 0
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(models_dir,)) as pool:
+            futures = []
+            for i in pending:
+                start = i * shard_size
+                stop = min(start + shard_size, manifest["rows"])
+                futures.append(pool.submit(score_shard, i, start, df.iloc[start:stop], work_dir))
+            for fut in as_completed(futures):
+                _, n, fixed, version = fut.result()
+                if version != model_version:
+                    raise RuntimeError(f"worker scored with {version}, expected {model_version}")
+                done += 1
+                rows_done += n
+                rows_fixed += fixed
+                _progress(done, manifest["shards"], rows_done, started)
+        print(file=sys.stderr)
+
+    updated = _merge(data_path, work_dir, manifest, model_version)
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+    elapsed = time.perf_counter() - started
+    return {"rows": updated, "elapsed_s": elapsed, "model_version": model_version, "rows_fixed": rows_fixed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rescore the whole dataset with the current models")
+    parser.add_argument("--data", default=DATA_FILE)
+    parser.add_argument("--models-dir", default=MODELS_ONNX_DIR)
+    parser.add_argument("--workers", type=int, default=None, help="default: number of CPUs")
+    parser.add_argument("--shard-size", type=int, default=20000)
+    parser.add_argument("--work-dir", default=WORK_DIR)
+    parser.add_argument("--resume", action="store_true", help="continue an interrupted run")
+    args = parser.parse_args(argv)
+
+    report = backfill(args.data, args.models_dir, args.workers, args.shard_size, args.work_dir, args.resume)
+    rate = report["rows"] / report["elapsed_s"] if report["elapsed_s"] > 0 else 0.0
+    print(f"Updated {report['rows']:,} rows in {report['elapsed_s']:.1f}s ({rate:,.0f} rows/sec) "
+          f"with model {report['model_version']}", file=sys.stderr)
+    if report["rows_fixed"]:
+        print(f"  {report['rows_fixed']:,} rows had missing or out-of-range features and were scored "
+              "with defaults / clipped values", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Credit-score risk bands, shared by scoring, storage, the dashboard and the
+report page so the thresholds live in one place, along with the band
+colours the dashboard tables use.
+
+Scores are binned with one np.searchsorted over BAND_EDGES; missing scores
+fall in the "Unknown" band.
+"""
+import numpy as np
+import pandas as pd
+
+LOW_RISK_MIN_SCORE = 70
+MEDIUM_RISK_MIN_SCORE = 40
+
+# Ascending score order; the fused ensemble graph indexes this list too
+RISK_BANDS = ["High Risk", "Medium Risk", "Low Risk"]
+BAND_EDGES = np.array([MEDIUM_RISK_MIN_SCORE, LOW_RISK_MIN_SCORE], dtype=np.float64)
+
+# Dashboard / summary spelling of the same bands
+SHORT_BANDS = ["High", "Medium", "Low"]
+UNKNOWN_BAND = "Unknown"
+BAND_RANGES = {
+    "Low": f"≥{LOW_RISK_MIN_SCORE}",
+    "Medium": f"{MEDIUM_RISK_MIN_SCORE}-{LOW_RISK_MIN_SCORE - 1}",
+    "High": f"<{MEDIUM_RISK_MIN_SCORE}",
+}
+
+_LONG_LOOKUP = np.array(RISK_BANDS + [UNKNOWN_BAND], dtype=object)
+_SHORT_LOOKUP = np.array(SHORT_BANDS + [UNKNOWN_BAND], dtype=object)
+
+
+def score_array(scores) -> np.ndarray:
+    """float64 array of scores; anything non-numeric becomes NaN."""
+    arr = np.asarray(scores)
+    if arr.dtype.kind in ("f", "i", "u", "b"):
+        return arr.astype(np.float64, copy=False)
+    return pd.to_numeric(pd.Series(arr.reshape(-1)), errors="coerce").to_numpy(dtype=np.float64)
+
+def band_index(scores) -> np.ndarray:
+    """0 = High, 1 = Medium, 2 = Low risk, 3 = Unknown (missing score)."""
+    s = score_array(scores)
+    idx = np.searchsorted(BAND_EDGES, s, side="right")
+    idx[np.isnan(s)] = len(RISK_BANDS)
+    return idx
+
+def band_labels(scores, short: bool = False) -> np.ndarray:
+    """Vectorized band of each score ("Low Risk" ..., or "Low" ... with short=True)."""
+    return (_SHORT_LOOKUP if short else _LONG_LOOKUP)[band_index(scores)]
+
+def band_counts(scores) -> dict:
+    """{"Low": n, "Medium": n, "High": n, "Unknown": n} in one bincount."""
+    counts = np.bincount(band_index(scores), minlength=len(_SHORT_LOOKUP))
+    return {label: int(c) for label, c in zip(_SHORT_LOOKUP, counts)}
+
+def risk_band(score: float) -> str:
+    """Band of a single model score (never missing on the scoring path)."""
+    if score >= LOW_RISK_MIN_SCORE:
+        return "Low Risk"
+    elif score >= MEDIUM_RISK_MIN_SCORE:
+        return "Medium Risk"
+    return "High Risk"
+
+
+# -----------------------------
+# Table styling (dashboard, bench)
+# -----------------------------
+BAND_COLORS = {"Low": "#6bcf7f", "Medium": "#ffd93d", "High": "#ff6b6b"}
+
+def color_risk(val):
+    if val == "Low":
+        return "background-color: #6bcf7f; color: white; font-weight: bold;"
+    elif val == "Medium":
+        return "background-color: #ffd93d; color: black; font-weight: bold;"
+    elif val == "High":
+        return "background-color: #ff6b6b; color: white; font-weight: bold;"
+    return ""
+
+RISK_STYLES = {
+    "Low": color_risk("Low"),
+    "Medium": color_risk("Medium"),
+    "High": color_risk("High"),
+}
+
+def risk_styles(col: pd.Series) -> pd.Series:
+    # One vectorized lookup per column instead of one Python call per cell
+    return col.map(RISK_STYLES).fillna("")
+
+def color_lr_risk(val):
+    if val in ("High Risk", "High"):
+        return "background-color: #ff6b6b; color: white; font-weight: bold;"
+    if val in ("Medium Risk", "Medium"):
+        return "background-color: #ffd93d; color: black; font-weight: bold;"
+    if val in ("Low Risk", "Low"):
+        return "background-color: #6bcf7f; color: white; font-weight: bold;"
+    return ""
@@ -0,0 +1,184 @@
+"""
+Headless streaming batch scorer.
+
+Reads applicants as CSV or JSONL from a file or stdin in fixed-size chunks,
+scores each chunk with the ONNX sessions and the predict_all ensemble rule,
+and streams the results to stdout or a file. Memory stays bounded by the
+chunk size regardless of input size. Input features are cleaned with
+preprocess.clean_features (defaults for blank or malformed values, clipping
+to valid ranges) and every output row says what was fixed in input_issues.
+Duplicate rows within a chunk are scored once. Throughput and per-stage timings are printed to stderr.
+
+Usage:
+    python score_cli.py applicants.csv -o scored.csv
+    cat applicants.jsonl | python score_cli.py - --input-format jsonl --output-format jsonl
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from onnx_utils import (
+    MODELS_ONNX_DIR, LR_CLASSES, ELIGIBILITY, CATEGORICAL_FEATURES, build_onnx_inputs_batch, score_inputs,
+    apply_ensemble_rule, ensemble_from_inputs, dedupe_inputs,
+)
+from model_registry import ModelRegistry
+from preprocess import clean_features
+
+STAGES = ["read", "clean", "build_inputs", "inference", "ensemble", "write"]
+
+SCORE_COLUMNS = [
+    "lr_risk", "lr_score", "lr_prob_high", "lr_prob_low", "lr_prob_medium",
+    "xgb_score", "rf_score", "final_score", "risk_level", "eligibility", "input_issues",
+]
+
+
+def _detect_format(path: str, explicit: str) -> str:
+    if explicit:
+        return explicit
+    if path and path != "-" and path.lower().endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    return "csv"
+
+def iter_chunks(path: str, fmt: str, chunk_size: int):
+    src = sys.stdin if path == "-" else path
+    if fmt == "jsonl":
+        reader = pd.read_json(src, lines=True, chunksize=chunk_size)
+    else:
+        reader = pd.read_csv(src, chunksize=chunk_size)
+    with reader:
+        yield from reader
+
+def score_chunk(chunk: pd.DataFrame, models, use_ensemble: bool, timings: dict, issues: dict) -> pd.DataFrame:
+    n = len(chunk)
+
+    t0 = time.perf_counter()
+    cleaned = clean_features(chunk)
+    issues["rows_fixed"] += int(cleaned.error_mask.sum())
+    issues["unknown_category"] += int(cleaned.unknown_category_mask.sum())
+    timings["clean"] += time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    inputs = build_onnx_inputs_batch(cleaned.frame)
+    # Duplicate applicants in the file are scored once
+    inputs, inverse = dedupe_inputs(inputs, n) if n else (inputs, np.empty(0, dtype=np.int64))
+    unique = len(inputs[CATEGORICAL_FEATURES[0]])
+    timings["build_inputs"] += time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    if use_ensemble and models.ensemble is not None:
+        # Fused graph already applies the ensemble rule in the same run
+        out = ensemble_from_inputs(models.ensemble, inputs, unique)
+        timings["inference"] += time.perf_counter() - t0
+        t0 = time.perf_counter()
+        out["eligibility"] = np.array([ELIGIBILITY[r] for r in out["risk_level"]], dtype=object)
+    else:
+        raw = score_inputs(inputs, unique, *models.sessions())
+        timings["inference"] += time.perf_counter() - t0
+        t0 = time.perf_counter()
+        out = apply_ensemble_rule(raw)
+    if unique < n:
+        out = {key: np.asarray(values)[inverse] for key, values in out.items()}
+
+    probs = out["lr_probs"]
+    result = chunk.assign(
+        lr_risk=out["lr_risk"],
+        lr_score=out["lr_score"],
+        lr_prob_high=probs[:, LR_CLASSES.index("High Risk")],
+        lr_prob_low=probs[:, LR_CLASSES.index("Low Risk")],
+        lr_prob_medium=probs[:, LR_CLASSES.index("Medium Risk")],
+        xgb_score=np.round(out["xgb_score"], 2),
+        rf_score=np.round(out["rf_score"], 2),
+        final_score=np.round(out["final_score"], 2),
+        risk_level=out["risk_level"],
+        eligibility=out["eligibility"],
+        input_issues=cleaned.describe(),
+    )
+    timings["ensemble"] += time.perf_counter() - t0
+    return result
+
+def write_chunk(df: pd.DataFrame, out, fmt: str, first: bool) -> None:
+    if fmt == "jsonl":
+        text = df.to_json(orient="records", lines=True, force_ascii=False)
+        if text:
+            out.write(text if text.endswith("\n") else text + "\n")
+    else:
+        df.to_csv(out, index=False, header=first)
+    out.flush()
+
+def run(input_path: str, output_path: str, input_format: str, output_format: str,
+        chunk_size: int, models_dir: str, use_ensemble: bool, keep_columns) -> dict:
+    models = ModelRegistry(models_dir).current()
+    timings = {stage: 0.0 for stage in STAGES}
+    issues = {"rows_fixed": 0, "unknown_category": 0}
+    rows = 0
+    start = time.perf_counter()
+
+    out = sys.stdout if output_path in (None, "-") else open(output_path, "w", newline="", encoding="utf-8")
+    try:
+        chunks = iter_chunks(input_path, input_format, chunk_size)
+        first = True
+        while True:
+            t0 = time.perf_counter()
+            chunk = next(chunks, None)
+            timings["read"] += time.perf_counter() - t0
+            if chunk is None:
+                break
+
+            result = score_chunk(chunk, models, use_ensemble, timings, issues)
+            if keep_columns is not None:
+                result = result[[c for c in keep_columns if c in result.columns] + SCORE_COLUMNS]
+
+            t0 = time.perf_counter()
+            write_chunk(result, out, output_format, first)
+            timings["write"] += time.perf_counter() - t0
+
+            first = False
+            rows += len(chunk)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    return {"rows": rows, "elapsed_s": elapsed, "model_version": models.version, "stages_s": timings, **issues}
+
+def print_report(report: dict) -> None:
+    rows, elapsed = report["rows"], report["elapsed_s"]
+    rate = rows / elapsed if elapsed > 0 else 0.0
+    print(f"Scored {rows} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec) "
+          f"with model {report['model_version']}", file=sys.stderr)
+    for stage in STAGES:
+        secs = report["stages_s"][stage]
+        share = 100.0 * secs / elapsed if elapsed > 0 else 0.0
+        print(f"  {stage:<13}{secs:8.3f}s  {share:5.1f}%", file=sys.stderr)
+    if report["rows_fixed"] or report["unknown_category"]:
+        print(f"  {report['rows_fixed']} rows scored with defaulted/clipped features, "
+              f"{report['unknown_category']} with unknown categories (see input_issues)", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream-score applicants with the AltScore ONNX models")
+    parser.add_argument("input", nargs="?", default="-", help="CSV/JSONL file, or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="output file, or - for stdout")
+    parser.add_argument("--input-format", choices=["csv", "jsonl"])
+    parser.add_argument("--output-format", choices=["csv", "jsonl"])
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--models-dir", default=MODELS_ONNX_DIR)
+    parser.add_argument("--no-ensemble", action="store_true",
+                        help="always use the three separate sessions, even if the fused model exists")
+    parser.add_argument("--keep-columns", help="comma-separated input columns to copy to the output (default: all)")
+    args = parser.parse_args(argv)
+
+    input_format = _detect_format(args.input, args.input_format)
+    output_format = args.output_format or _detect_format(args.output, None)
+    keep = args.keep_columns.split(",") if args.keep_columns else None
+
+    report = run(args.input, args.output, input_format, output_format, args.chunk_size,
+                 args.models_dir, not args.no_ensemble, keep)
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Score-ordered index over the dataset.
+
+Keeps credit scores in a sorted array (maintained by bisection on insert and
+delete) alongside each row's label in the dataset snapshot, i.e. its position
+in the journal, which deletes and undos do not shift. A score-sorted page
+costs O(page size), so the dashboard never sorts the population.
+"""
+import threading
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+import pandas as pd
+
+from data_store import DATA_FILE, get_snapshot
+
+
+class ScoreIndex:
+    def __init__(self):
+        self._scores = []      # ascending
+        self._positions = []   # journal position (row label) for each entry of _scores
+        self._unscored = []    # positions of rows without a numeric score (always ordered last)
+
+    def __len__(self):
+        return len(self._scores)
+
+    def insert(self, score, position: int) -> None:
+        if score is None or pd.isna(score):
+            self._unscored.append(position)
+            return
+        i = bisect_right(self._scores, score)
+        self._scores.insert(i, float(score))
+        self._positions.insert(i, position)
+
+    def remove(self, score, position: int) -> bool:
+        if score is None or pd.isna(score):
+            if position in self._unscored:
+                self._unscored.remove(position)
+                return True
+            return False
+        i = bisect_left(self._scores, score)
+        while i < len(self._scores) and self._scores[i] == score:
+            if self._positions[i] == position:
+                del self._scores[i]
+                del self._positions[i]
+                return True
+            i += 1
+        return False
+
+    def page(self, start: int, end: int, descending: bool = True) -> np.ndarray:
+        """Positions for rows [start, end) in score order; unscored rows come last."""
+        scored = len(self._positions)
+        out = []
+        if start < scored:
+            stop = min(end, scored)
+            if descending:
+                out = self._positions[scored - stop:scored - start][::-1]
+            else:
+                out = self._positions[start:stop]
+        if end > scored:
+            out = list(out) + self._unscored[max(start - scored, 0):end - scored]
+        return np.asarray(out, dtype=np.int64)
+
+    def total(self) -> int:
+        return len(self._scores) + len(self._unscored)
+
+    def copy(self) -> "ScoreIndex":
+        index = ScoreIndex()
+        index._scores = list(self._scores)
+        index._positions = list(self._positions)
+        index._unscored = list(self._unscored)
+        return index
+
+
+class _IndexState:
+    def __init__(self, index: ScoreIndex, inode, tombstones, rows: int):
+        self.index = index
+        self.inode = inode
+        self.tombstones = tombstones
+        self.rows = rows               # journal rows covered by the index
+        self._row_ids = None           # user_id -> journal positions, built on the first delete / undo
+
+    def positions_of(self, journal: pd.DataFrame, user_id: str) -> list:
+        if self._row_ids is None:
+            self._row_ids = {}
+            for position, uid in enumerate(journal["user_id"].iloc[:self.rows].astype(str)):
+                self._row_ids.setdefault(uid, []).append(position)
+        return self._row_ids.get(user_id, [])
+
+    def add_rows(self, user_ids) -> None:
+        if self._row_ids is not None:
+            for position, uid in enumerate(user_ids, start=self.rows):
+                self._row_ids.setdefault(uid, []).append(position)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def _scores_of(frame: pd.DataFrame) -> np.ndarray:
+    if "alt_credit_score" not in frame.columns:
+        return np.full(len(frame), np.nan)
+    return pd.to_numeric(frame["alt_credit_score"], errors="coerce").to_numpy(dtype=float)
+
+def _build(frame: pd.DataFrame) -> ScoreIndex:
+    scores = _scores_of(frame)
+    labels = frame.index.to_numpy()
+    valid = ~np.isnan(scores)
+    order = np.flatnonzero(valid)[np.argsort(scores[valid], kind="stable")]
+    index = ScoreIndex()
+    index._scores = scores[order].tolist()
+    index._positions = labels[order].tolist()
+    index._unscored = labels[~valid].tolist()
+    return index
+
+def _apply_tombstones(index: ScoreIndex, state: _IndexState, journal: pd.DataFrame, tombstones) -> None:
+    # Newly deleted users leave the index and newly undone ones come back, by bisection
+    if "user_id" not in journal.columns:
+        return
+    before, after = state.tombstones.active, tombstones.active
+    for user_id in after.keys() - before.keys():
+        for position in state.positions_of(journal, user_id):
+            index.remove(_scores_of(journal.iloc[[position]])[0], position)
+    for user_id in before.keys() - after.keys():
+        for position in state.positions_of(journal, user_id):
+            index.insert(_scores_of(journal.iloc[[position]])[0], position)
+
+def get_score_index(data_path: str = DATA_FILE) -> ScoreIndex:
+    """
+    Process-wide index over the live rows of the current dataset snapshot.
+    Rows appended, deleted or restored since the last call are inserted or
+    removed by bisection in a fresh copy, so an index that was returned is
+    never modified afterwards; treat it as read-only. Only a rewritten file
+    (compaction, rescore) triggers a rebuild.
+    """
+    snap = get_snapshot(data_path)
+    journal = snap.journal
+    inode = snap.key[0] if snap.key else None
+    tombstones = snap.tombstones
+    with _indexes_lock:
+        state = _indexes.get(data_path)
+        if state is not None and state.inode == inode and len(journal) >= state.rows:
+            if len(journal) > state.rows or state.tombstones.key != tombstones.key:
+                # Copy-on-write: readers keep the index they were handed, consistent with their frame
+                index = state.index.copy()
+                _apply_tombstones(index, state, journal, tombstones)
+                new_rows = journal.iloc[state.rows:]
+                new_ids = new_rows["user_id"].astype(str).tolist() if "user_id" in new_rows.columns else []
+                for offset, score in enumerate(_scores_of(new_rows)):
+                    if not new_ids or new_ids[offset] not in tombstones:
+                        index.insert(score, state.rows + offset)
+                state.add_rows(new_ids)
+                state.index = index
+                state.tombstones = tombstones
+                state.rows = len(journal)
+            return state.index
+        index = _build(snap.frame)
+        _indexes[data_path] = _IndexState(index, inode, tombstones, len(journal))
+        return index
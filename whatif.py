@@ -0,0 +1,102 @@
+"""
+What-if sensitivity of one applicant's score to a single feature.
+
+sweep_feature() repeats the applicant's feature vector once per grid value,
+replaces the swept feature, and scores the whole grid in one batch: one
+sess.run on the fused ensemble model, or one per model (score_inputs +
+apply_ensemble_rule) when it is not loaded. The input tensors are filled
+directly with np.full, no DataFrame per variant, so a few hundred variants
+cost about as much as a couple of single-row predictions.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+from onnx_utils import (
+    CATEGORICAL_FEATURES, INT_FEATURES, FLOAT_FEATURES, FeatureVector,
+    score_inputs, apply_ensemble_rule, ensemble_from_inputs,
+)
+from metrics import timed, inc
+
+# Default sweep ranges cover the registration form and the stored population;
+# a range is always widened to include the applicant's own value
+SWEEP_FEATURES = {
+    "utility_delay_days":      {"label": "Utility delay (days)", "min": 0.0, "max": 30.0},
+    "rent_paid_on_time":       {"label": "Rent paid on time (share)", "min": 0.0, "max": 1.0},
+    "avg_month_end_balance":   {"label": "Avg. month-end balance (₹)", "min": 0.0, "max": 25000.0},
+    "monthly_income":          {"label": "Monthly income (₹)", "min": 0.0, "max": 100000.0},
+    "upi_txn_count":           {"label": "Monthly UPI transactions", "min": 0.0, "max": 150.0},
+    "bank_account_age_months": {"label": "Bank account age (months)", "min": 0, "max": 240},
+    "num_bank_accounts":       {"label": "Number of bank accounts", "min": 1, "max": 15},
+    "overdraft_event":         {"label": "Overdraft events", "min": 0, "max": 5},
+}
+DEFAULT_POINTS = 200
+MAX_POINTS = 1000
+
+
+def sweep_range(fv: FeatureVector, feature: str) -> tuple:
+    """(low, high) default range of a swept feature for this applicant."""
+    spec = SWEEP_FEATURES[feature]
+    current = getattr(fv, feature)
+    return min(spec["min"], current), max(spec["max"], current)
+
+def sweep_grid(fv: FeatureVector, feature: str, low, high, points: int = DEFAULT_POINTS) -> np.ndarray:
+    """
+    Ascending grid over [low, high], plus the applicant's current value when
+    it lies in range. Integer features take every integer in range,
+    subsampled to at most `points`.
+    """
+    points = max(2, min(int(points), MAX_POINTS))
+    if feature in INT_FEATURES:
+        grid = np.arange(math.ceil(low), math.floor(high) + 1, dtype=np.int64)
+        if len(grid) > points:
+            grid = np.unique(np.linspace(grid[0], grid[-1], points).round().astype(np.int64))
+    else:
+        grid = np.linspace(float(low), float(high), points)
+    current = getattr(fv, feature)
+    return np.union1d(grid, [current]) if low <= current <= high else grid
+
+def variant_inputs(fv: FeatureVector, feature: str, values: np.ndarray) -> dict:
+    """(N, 1) input tensors: fv repeated N times with `feature` set to each of values."""
+    n = len(values)
+    inputs = {}
+    for col in CATEGORICAL_FEATURES:
+        inputs[col] = np.full((n, 1), getattr(fv, col), dtype=object)
+    for col in INT_FEATURES:
+        inputs[col] = np.full((n, 1), getattr(fv, col), dtype=np.int64)
+    for col in FLOAT_FEATURES:
+        inputs[col] = np.full((n, 1), getattr(fv, col), dtype=np.float32)
+    inputs[feature][:, 0] = values
+    return inputs
+
+def sweep_feature(fv: FeatureVector, feature: str, values, lr_sess, xgb_sess, rf_sess,
+                  ensemble_sess=None) -> pd.DataFrame:
+    """
+    Scores every variant of fv in one batch. One row per value of the swept
+    feature, with final_score, xgb_score, rf_score, lr_risk and risk_level.
+    """
+    values = np.asarray(values)
+    n = len(values)
+    inputs = variant_inputs(fv, feature, values)
+    with timed("whatif.sweep"):
+        if ensemble_sess is not None:
+            out = ensemble_from_inputs(ensemble_sess, inputs, n)
+        else:
+            out = apply_ensemble_rule(score_inputs(inputs, n, lr_sess, xgb_sess, rf_sess))
+    inc("whatif.variants", n)
+    return pd.DataFrame({
+        feature: values,
+        "final_score": out["final_score"],
+        "xgb_score": out["xgb_score"],
+        "rf_score": out["rf_score"],
+        "lr_risk": out["lr_risk"],
+        "risk_level": out["risk_level"],
+    })
+
+def nearest_in_band(sweep: pd.DataFrame, feature: str, current, band: str):
+    """Swept value closest to `current` whose score falls in `band`, or None."""
+    values = sweep.loc[sweep["risk_level"] == band, feature].to_numpy()
+    if not len(values):
+        return None
+    return values[np.argmin(np.abs(values - current))].item()